@@ -1,12 +1,33 @@
 import re
-from typing import Dict, List
-from sklearn.feature_extraction.text import TfidfVectorizer
+from typing import Dict, List, Tuple
+from sklearn.feature_extraction.text import HashingVectorizer, TfidfVectorizer
 from sklearn.naive_bayes import MultinomialNB
+import copy
 import pickle
 import os
+from ai_engine.cache import LRUCache
+from ai_engine.keyword_matcher import KeywordMatcher
+import metrics
+
+CATEGORIZATION_CACHE_SIZE = int(os.getenv("CATEGORIZATION_CACHE_SIZE", "10000"))
+
+# Hashed feature space for the incremental model; no vocabulary to refit
+INCREMENTAL_FEATURES = 2 ** 16
+
+MERCHANT_DATE_PATTERN = re.compile(r'\b\d{1,4}[/.-]\d{1,2}(?:[/.-]\d{1,4})?\b')
+# A reference marker is only stripped together with the id-like value after it
+MERCHANT_REFERENCE_PATTERN = re.compile(r'\b(?:ref|txn|trx|auth|inv)\b[\s:#.]*[a-z]*\d\w*')
+MERCHANT_CODE_PATTERN = re.compile(r'\S*\d\S*')
+MERCHANT_DIGITS_PATTERN = re.compile(r'\d+')
+# Tokens left with fewer letters once their digits are gone are codes, e.g. the 'fx' of '4f2x'
+MERCHANT_MIN_LETTERS = 3
+
+def _strip_digits(match: re.Match) -> str:
+    letters = MERCHANT_DIGITS_PATTERN.sub('', match.group())
+    return letters if sum(c.isalpha() for c in letters) >= MERCHANT_MIN_LETTERS else ' '
 
 class ExpenseCategorizer:
-    def __init__(self):
+    def __init__(self, train: bool = True, incremental: bool = False):
         self.categories = {
             'food': ['restaurant', 'grocery', 'food', 'cafe', 'pizza', 'burger', 'coffee', 'lunch', 'dinner'],
             'transport': ['uber', 'taxi', 'bus', 'fuel', 'gas', 'parking', 'metro', 'train'],
@@ -20,7 +41,21 @@ class ExpenseCategorizer:
         
         self.model = None
         self.vectorizer = None
-        self._train_model()
+        self.version = None
+        
+        # Incremental mode uses a stateless featurizer so the model can learn from corrections
+        self.incremental = incremental
+        self.updates = 0
+        
+        # Categorization results per normalized merchant, tied to a model version
+        self.cache = LRUCache(maxsize=CATEGORIZATION_CACHE_SIZE)
+        self._cache_version = None
+        
+        # Compiled on first keyword fallback
+        self._keyword_matcher = None
+        
+        if train:
+            self._train_model()
     
     def _train_model(self):
         """Train the categorization model with sample data"""
@@ -38,33 +73,154 @@ class ExpenseCategorizer:
                     training_labels.append(category)
         
         # Train the model
+        if self.incremental:
+            self.vectorizer = HashingVectorizer(
+                n_features=INCREMENTAL_FEATURES, alternate_sign=False, stop_words='english'
+            )
+            X = self.vectorizer.transform(training_data)
+            
+            self.model = MultinomialNB()
+            self.model.partial_fit(X, training_labels, classes=list(self.categories))
+            return
+        
         self.vectorizer = TfidfVectorizer(max_features=1000, stop_words='english')
         X = self.vectorizer.fit_transform(training_data)
         
         self.model = MultinomialNB()
         self.model.fit(X, training_labels)
     
+    def learn(self, corrections: List[Tuple[str, str]]) -> int:
+        """Update the incremental model with (description, category) corrections"""
+        if not self.incremental:
+            raise ValueError("Online learning requires an incremental categorizer")
+        
+        samples = [
+            (self.normalize_merchant(description), category)
+            for description, category in corrections
+            if category in self.categories
+        ]
+        samples = [(merchant, category) for merchant, category in samples if merchant]
+        if not samples:
+            return 0
+        
+        # Update a copy and swap it in, so concurrent predictions never see a half-updated model
+        model = copy.deepcopy(self.model)
+        model.partial_fit(
+            self.vectorizer.transform([merchant for merchant, _ in samples]),
+            [category for _, category in samples]
+        )
+        self.model = model
+        
+        # A new version invalidates cached categorizations
+        self.updates += 1
+        base_version = (self.version or 'incremental').split('+')[0]
+        self.version = f"{base_version}+u{self.updates}"
+        
+        return len(samples)
+    
+    def save(self, path: str):
+        """Serialize the trained vectorizer and classifier to disk"""
+        # Write to a temp file first so concurrent workers never read a partial artifact
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump({
+                'version': self.version,
+                'incremental': self.incremental,
+                'updates': self.updates,
+                'categories': self.categories,
+                'vectorizer': self.vectorizer,
+                'model': self.model
+            }, f)
+        os.replace(tmp_path, path)
+    
+    @classmethod
+    def load(cls, path: str) -> 'ExpenseCategorizer':
+        """Load a categorizer from a serialized artifact without retraining"""
+        with open(path, 'rb') as f:
+            state = pickle.load(f)
+        
+        categorizer = cls(train=False, incremental=state.get('incremental', False))
+        categorizer.version = state['version']
+        categorizer.updates = state.get('updates', 0)
+        categorizer.categories = state['categories']
+        categorizer.vectorizer = state['vectorizer']
+        categorizer.model = state['model']
+        return categorizer
+    
     def categorize(self, description: str, amount: float = None) -> Dict:
         """Categorize expense using AI"""
-        description_clean = self._clean_description(description)
+        return self.categorize_batch([description])[0]
+    
+    def categorize_batch(self, descriptions: List[str]) -> List[Dict]:
+        """Categorize many expenses with a single vectorized model pass"""
+        self._check_cache_version()
+        version = self.version
+        
+        merchants = [self.normalize_merchant(d) for d in descriptions]
+        results = {}
+        misses = []
+        
+        # Repeat merchants are answered from the cache
+        for merchant in merchants:
+            if merchant in results:
+                continue
+            cached = self.cache.get(merchant)
+            if cached is not None:
+                results[merchant] = cached
+            else:
+                results[merchant] = None
+                misses.append(merchant)
+        
+        if misses:
+            with metrics.CATEGORIZER_INFERENCE.time():
+                predicted = self._model_categorize(misses)
+            for merchant, result in zip(misses, predicted):
+                results[merchant] = result
+                # Skip caching if the model was updated while predicting
+                if self.version == version:
+                    self.cache.put(merchant, result)
+        
+        return [dict(results[merchant]) for merchant in merchants]
+    
+    def _model_categorize(self, descriptions_clean: List[str]) -> List[Dict]:
+        """Run the model over cleaned descriptions, falling back to keywords"""
+        model, vectorizer = self.model, self.vectorizer
         
-        # Use ML model for prediction
-        if self.model and self.vectorizer:
+        # One transform / predict_proba call for the whole batch
+        if model and vectorizer:
             try:
-                X = self.vectorizer.transform([description_clean])
-                predicted_category = self.model.predict(X)[0]
-                confidence = max(self.model.predict_proba(X)[0])
+                X = vectorizer.transform(descriptions_clean)
+                probabilities = model.predict_proba(X)
+                best = probabilities.argmax(axis=1)
                 
-                return {
-                    'category': predicted_category,
-                    'confidence': float(confidence),
-                    'method': 'ml_model'
-                }
+                return [
+                    {
+                        'category': str(model.classes_[col]),
+                        'confidence': float(probabilities[row, col]),
+                        'method': 'ml_model'
+                    }
+                    for row, col in enumerate(best)
+                ]
             except:
                 pass
         
         # Fallback to keyword matching
-        return self._keyword_categorize(description_clean)
+        return [self._keyword_categorize(d) for d in descriptions_clean]
+    
+    def _check_cache_version(self):
+        """Drop cached results computed by a different model version"""
+        if self._cache_version != self.version:
+            self.cache.clear()
+            self._cache_version = self.version
+    
+    def normalize_merchant(self, description: str) -> str:
+        """Reduce a raw description to a merchant key, e.g. 'UBER *TRIP 4F2X' -> 'uber trip'"""
+        text = description.lower()
+        text = MERCHANT_DATE_PATTERN.sub(' ', text)
+        text = MERCHANT_REFERENCE_PATTERN.sub(' ', text)
+        # Digits are store numbers and reference codes; '7-eleven #1234' keeps 'eleven'
+        text = MERCHANT_CODE_PATTERN.sub(_strip_digits, text)
+        return ' '.join(self._clean_description(text.replace('*', ' ')).split())
     
     def _clean_description(self, description: str) -> str:
         """Clean and normalize description"""
@@ -74,15 +230,17 @@ class ExpenseCategorizer:
         """Fallback keyword-based categorization"""
         description_lower = description.lower()
         
-        for category, keywords in self.categories.items():
-            if category != 'other':
-                for keyword in keywords:
-                    if keyword in description_lower:
-                        return {
-                            'category': category,
-                            'confidence': 0.8,
-                            'method': 'keyword_match'
-                        }
+        if self._keyword_matcher is None:
+            self._keyword_matcher = KeywordMatcher.from_categories(self.categories)
+        
+        # Every keyword is found in one pass; the heaviest category wins, ties by category order
+        scores = self._keyword_matcher.scores(description_lower)
+        if scores:
+            return {
+                'category': max((c for c in self.categories if c in scores), key=scores.get),
+                'confidence': 0.8,
+                'method': 'keyword_match'
+            }
         
         return {
             'category': 'other',
@@ -0,0 +1,144 @@
+import math
+import os
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+from ai_engine.categorizer import ExpenseCategorizer
+
+# A merchant needs this many charges before its amounts are judged, and a deviation of this many standard deviations
+ANOMALY_MIN_HISTORY = int(os.getenv("ANOMALY_MIN_HISTORY", "5"))
+ANOMALY_Z_THRESHOLD = float(os.getenv("ANOMALY_Z_THRESHOLD", "3.0"))
+# Spread floor as a fraction of the mean, so identical past charges do not flag every cent of change
+ANOMALY_MIN_SPREAD = float(os.getenv("ANOMALY_MIN_SPREAD", "0.1"))
+# Flagged amounts stay out of the statistics; this many in a row are a price change and become the new normal
+ANOMALY_LEVEL_SHIFT_RUN = int(os.getenv("ANOMALY_LEVEL_SHIFT_RUN", "3"))
+
+# Recurring means at least this many gaps between charges, at least a week apart, with little variation in timing and amount
+RECURRING_MIN_INTERVALS = int(os.getenv("RECURRING_MIN_INTERVALS", "2"))
+RECURRING_MIN_PERIOD_DAYS = float(os.getenv("RECURRING_MIN_PERIOD_DAYS", "6"))
+RECURRING_MAX_VARIATION = float(os.getenv("RECURRING_MAX_VARIATION", "0.25"))
+
+PERIODS = (('weekly', 7.0), ('biweekly', 14.0), ('monthly', 30.44), ('quarterly', 91.3), ('yearly', 365.25))
+PERIOD_TOLERANCE = 0.2
+
+# Merchant keys only need the categorizer's regex normalization, not a trained model
+_normalizer = ExpenseCategorizer(train=False)
+
+def merchant_key(description: str) -> Optional[str]:
+    """Normalized merchant name, or None when nothing in the description identifies one"""
+    key = _normalizer.normalize_merchant(description or '')
+    return key if key and key != 'unknown' else None
+
+class MerchantChargeState:
+    """Running statistics of one user's charges at a merchant; rows of the merchant stats table have the same attributes"""
+    
+    def __init__(self, user_id: str, merchant: str):
+        self.user_id = user_id
+        self.merchant = merchant
+        self.category = None
+        self.charge_count = 0  # charges in the amount statistics; flagged amounts are kept apart
+        self.mean_amount = 0.0
+        self.m2_amount = 0.0  # Welford sum of squared deviations from the mean
+        self.outlier_count = 0  # flagged amounts in a row since the last usual one, same statistics
+        self.outlier_mean = 0.0
+        self.outlier_m2 = 0.0
+        self.last_date: Optional[date] = None
+        self.interval_count = 0
+        self.interval_mean = 0.0
+        self.interval_m2 = 0.0
+        self.recurring = False
+
+def _welford_add(count: int, mean: float, m2: float, value: float) -> Tuple[int, float, float]:
+    count += 1
+    delta = value - mean
+    mean += delta / count
+    return count, mean, m2 + delta * (value - mean)
+
+def _welford_remove(count: int, mean: float, m2: float, value: float) -> Tuple[int, float, float]:
+    if count <= 1:
+        return 0, 0.0, 0.0
+    new_mean = (mean * count - value) / (count - 1)
+    return count - 1, new_mean, max(m2 - (value - mean) * (value - new_mean), 0.0)
+
+def _stddev(count: int, m2: float) -> float:
+    return math.sqrt(max(m2, 0.0) / (count - 1)) if count > 1 else 0.0
+
+def amount_stddev(state) -> float:
+    return _stddev(state.charge_count, state.m2_amount)
+
+def interval_stddev(state) -> float:
+    return _stddev(state.interval_count, state.interval_m2)
+
+def period_label(interval_days: float) -> str:
+    for label, days in PERIODS:
+        if abs(interval_days - days) <= PERIOD_TOLERANCE * days:
+            return label
+    return f"every {round(interval_days)} days"
+
+class ChargeDetector:
+    """Flags amount outliers and newly recurring merchants as each expense arrives, in O(1) per expense"""
+    
+    def is_recurring(self, state) -> bool:
+        if state.interval_count < RECURRING_MIN_INTERVALS or state.interval_mean < RECURRING_MIN_PERIOD_DAYS:
+            return False
+        if interval_stddev(state) > RECURRING_MAX_VARIATION * state.interval_mean:
+            return False
+        return amount_stddev(state) <= RECURRING_MAX_VARIATION * abs(state.mean_amount)
+    
+    def z_score(self, state, amount: float) -> Optional[float]:
+        """Deviation of an amount from the merchant's history in standard deviations, or None with too little history"""
+        if state.charge_count < ANOMALY_MIN_HISTORY:
+            return None
+        spread = max(amount_stddev(state), ANOMALY_MIN_SPREAD * abs(state.mean_amount), 0.01)
+        return (amount - state.mean_amount) / spread
+    
+    def observe(self, state, day: date, amount: float) -> List[Dict]:
+        """Fold one charge into the merchant state; returns alerts as dicts of kind, expected_amount and z_score"""
+        alerts = []
+        
+        # Judge the amount against history before it becomes part of it
+        z = self.z_score(state, amount)
+        if z is not None and abs(z) >= ANOMALY_Z_THRESHOLD:
+            alerts.append({'kind': 'amount_anomaly', 'expected_amount': state.mean_amount, 'z_score': z})
+            # One-off outliers would widen the spread and hide the next one, so they are only counted aside
+            state.outlier_count, state.outlier_mean, state.outlier_m2 = _welford_add(
+                state.outlier_count, state.outlier_mean, state.outlier_m2, amount
+            )
+            if state.outlier_count >= ANOMALY_LEVEL_SHIFT_RUN:
+                state.charge_count, state.mean_amount, state.m2_amount = state.outlier_count, state.outlier_mean, state.outlier_m2
+                state.outlier_count, state.outlier_mean, state.outlier_m2 = 0, 0.0, 0.0
+        else:
+            state.charge_count, state.mean_amount, state.m2_amount = _welford_add(
+                state.charge_count, state.mean_amount, state.m2_amount, amount
+            )
+            state.outlier_count, state.outlier_mean, state.outlier_m2 = 0, 0.0, 0.0
+        
+        # Backdated charges count towards amounts only; gaps are measured between charges arriving in date order
+        if state.last_date is None or day >= state.last_date:
+            if state.last_date is not None:
+                state.interval_count, state.interval_mean, state.interval_m2 = _welford_add(
+                    state.interval_count, state.interval_mean, state.interval_m2, float((day - state.last_date).days)
+                )
+            state.last_date = day
+        
+        was_recurring = state.recurring
+        state.recurring = self.is_recurring(state)
+        if state.recurring and not was_recurring:
+            alerts.append({'kind': 'new_recurring', 'expected_amount': state.mean_amount, 'z_score': None})
+        
+        return alerts
+    
+    def forget(self, state, amount: float, flagged: bool = False):
+        """Take a deleted charge's amount back out of the running mean and variance; gaps are kept.
+        
+        Flagged charges come out of the open outlier run, if any; one that a level shift already
+        folded into the statistics stays there.
+        """
+        if not flagged:
+            state.charge_count, state.mean_amount, state.m2_amount = _welford_remove(
+                state.charge_count, state.mean_amount, state.m2_amount, amount
+            )
+        elif state.outlier_count:
+            state.outlier_count, state.outlier_mean, state.outlier_m2 = _welford_remove(
+                state.outlier_count, state.outlier_mean, state.outlier_m2, amount
+            )
+        state.recurring = self.is_recurring(state)
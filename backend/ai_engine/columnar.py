@@ -0,0 +1,153 @@
+import numpy as np
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Tuple
+
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+# date(1970, 1, 1) was a Thursday; Monday is weekday 0 as in date.weekday()
+EPOCH_WEEKDAY = 3
+
+def epoch_day(day: date) -> int:
+    return day.toordinal() - EPOCH_ORDINAL
+
+def from_epoch_day(day: int) -> date:
+    return date.fromordinal(int(day) + EPOCH_ORDINAL)
+
+class ColumnarExpenses:
+    """Compact columnar copy of expenses: id, epoch day, amount and a small-int category code per row.
+    
+    Rows are kept in id order so single rows can be found by binary search;
+    deleted rows keep their slot with code -1 until the next reload.
+    """
+    
+    def __init__(self, start_day: int, capacity: int = 1024):
+        self.start_day = start_day  # rows are complete from this epoch day on
+        self.size = 0
+        self.ids = np.empty(capacity, dtype=np.int64)
+        self.days = np.empty(capacity, dtype=np.int32)
+        self.amounts = np.empty(capacity, dtype=np.float64)
+        self.codes = np.empty(capacity, dtype=np.int16)
+        self.categories: List[str] = []
+        self._category_codes: Dict[str, int] = {}
+    
+    def _code(self, category: Optional[str]) -> int:
+        category = category or 'other'
+        code = self._category_codes.get(category)
+        if code is None:
+            code = self._category_codes[category] = len(self.categories)
+            self.categories.append(category)
+        return code
+    
+    def _reserve(self, extra: int):
+        needed = self.size + extra
+        if needed <= len(self.ids):
+            return
+        capacity = max(needed, 2 * len(self.ids))
+        for name in ('ids', 'days', 'amounts', 'codes'):
+            column = getattr(self, name)
+            grown = np.empty(capacity, dtype=column.dtype)
+            grown[:self.size] = column[:self.size]
+            setattr(self, name, grown)
+    
+    def _find(self, expense_id: int) -> Optional[int]:
+        index = int(np.searchsorted(self.ids[:self.size], expense_id))
+        if index < self.size and self.ids[index] == expense_id:
+            return index
+        return None
+    
+    def extend(self, ids: np.ndarray, days: np.ndarray, amounts: np.ndarray, categories: Iterable[Optional[str]]):
+        """Bulk-append rows already sorted by id, e.g. one chunk of a load"""
+        codes = np.fromiter((self._code(category) for category in categories), dtype=np.int16, count=len(ids))
+        self._reserve(len(ids))
+        end = self.size + len(ids)
+        self.ids[self.size:end] = ids
+        self.days[self.size:end] = days
+        self.amounts[self.size:end] = amounts
+        self.codes[self.size:end] = codes
+        self.size = end
+    
+    def add(self, expense_id: int, day: int, amount: float, category: Optional[str]):
+        """Insert one row; rows before start_day and ids already present are ignored"""
+        if day < self.start_day:
+            return
+        
+        index = int(np.searchsorted(self.ids[:self.size], expense_id))
+        if index < self.size and self.ids[index] == expense_id:
+            return
+        
+        self._reserve(1)
+        # New ids almost always sort last; the shift only happens for out-of-order commits
+        if index < self.size:
+            for column in (self.ids, self.days, self.amounts, self.codes):
+                column[index + 1:self.size + 1] = column[index:self.size].copy()
+        self.ids[index] = expense_id
+        self.days[index] = day
+        self.amounts[index] = amount
+        self.codes[index] = self._code(category)
+        self.size += 1
+    
+    def remove(self, expense_id: int):
+        index = self._find(expense_id)
+        if index is not None:
+            self.codes[index] = -1
+            self.amounts[index] = 0.0
+    
+    def set_category(self, expense_id: int, category: Optional[str]):
+        index = self._find(expense_id)
+        if index is not None and self.codes[index] >= 0:
+            self.codes[index] = self._code(category)
+    
+    def covers(self, since: int) -> bool:
+        return since >= self.start_day
+    
+    def _window(self, since: int, until: int, category: Optional[str] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Days, amounts and codes of live rows in [since, until], optionally one category only"""
+        size = self.size
+        days, amounts, codes = self.days[:size], self.amounts[:size], self.codes[:size]
+        mask = (days >= since) & (days <= until) & (codes >= 0)
+        if category is not None:
+            mask &= codes == self._category_codes.get(category or 'other', -2)
+        return days[mask], amounts[mask], codes[mask]
+    
+    def daily_totals(self, since: int, until: int, category: Optional[str] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Spending and transaction count for every day in [since, until]"""
+        days, amounts, _ = self._window(since, until, category)
+        offsets = days - since
+        n_days = until - since + 1
+        return (
+            np.bincount(offsets, weights=amounts, minlength=n_days),
+            np.bincount(offsets, minlength=n_days)
+        )
+    
+    def weekday_totals(self, since: int, until: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Spending and transaction count per weekday in [since, until], Monday first"""
+        days, amounts, _ = self._window(since, until)
+        weekdays = (days + EPOCH_WEEKDAY) % 7
+        return np.bincount(weekdays, weights=amounts, minlength=7), np.bincount(weekdays, minlength=7)
+    
+    def category_totals(self, since: int, until: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Spending and transaction count per category code in [since, until]"""
+        _, amounts, codes = self._window(since, until)
+        n_categories = len(self.categories)
+        return (
+            np.bincount(codes, weights=amounts, minlength=n_categories),
+            np.bincount(codes, minlength=n_categories)
+        )
+    
+    def daily_category_totals(self, since: int, until: int) -> Tuple[np.ndarray, np.ndarray]:
+        """(day x category code) spending and transaction count matrices for [since, until]"""
+        days, amounts, codes = self._window(since, until)
+        n_days, n_categories = until - since + 1, len(self.categories)
+        cells = (days - since) * n_categories + codes
+        shape = (n_days, n_categories)
+        return (
+            np.bincount(cells, weights=amounts, minlength=n_days * n_categories).reshape(shape),
+            np.bincount(cells, minlength=n_days * n_categories).reshape(shape)
+        )
+    
+    def window_sum(self, since: int, until: int) -> float:
+        _, amounts, _ = self._window(since, until)
+        return float(amounts.sum())
+    
+    def nbytes(self) -> int:
+        return sum(column.nbytes for column in (self.ids, self.days, self.amounts, self.codes))
@@ -0,0 +1,236 @@
+"""Bounded process pool for CPU-bound model work: forecast fits, batch categorization and training.
+
+Work runs outside the API worker's GIL, so cheap CRUD requests are not
+stalled by concurrent analytics. The pool admits at most
+COMPUTE_POOL_MAX_PENDING tasks and waits COMPUTE_TASK_TIMEOUT seconds for
+each; callers fall back to a cheaper path when either limit is hit.
+COMPUTE_POOL_WORKERS=0 disables the pool and runs work in the thread pool.
+"""
+import asyncio
+import concurrent.futures
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, List, Optional
+import numpy as np
+from ai_engine import model_registry
+from ai_engine.predictor import SpendingPredictor
+import metrics
+
+logger = logging.getLogger(__name__)
+
+COMPUTE_POOL_WORKERS = int(os.getenv("COMPUTE_POOL_WORKERS", str(min(2, os.cpu_count() or 1))))
+COMPUTE_POOL_MAX_PENDING = int(os.getenv("COMPUTE_POOL_MAX_PENDING", str(4 * max(COMPUTE_POOL_WORKERS, 1))))
+COMPUTE_TASK_TIMEOUT = float(os.getenv("COMPUTE_TASK_TIMEOUT", "10"))
+COMPUTE_TRAIN_TIMEOUT = float(os.getenv("COMPUTE_TRAIN_TIMEOUT", "300"))
+# Smaller categorization batches cost less inline than the round trip to a worker
+COMPUTE_POOL_MIN_BATCH = int(os.getenv("COMPUTE_POOL_MIN_BATCH", "256"))
+
+class PoolSaturated(Exception):
+    """Raised when the pool already has its maximum number of tasks in flight"""
+
+class ComputePool:
+    """Process pool with an in-flight task limit and per-task timeouts"""
+    
+    def __init__(self, workers: int, max_pending: int, timeout: float):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        
+        self._executor: Optional[concurrent.futures.ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        
+        self.submitted = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.failures = 0
+    
+    def _get_executor(self) -> concurrent.futures.ProcessPoolExecutor:
+        if self._executor is None:
+            # Spawned workers do not inherit the API process's threads, locks or open connections
+            self._executor = concurrent.futures.ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+    
+    def submit(self, fn: Callable, *args) -> concurrent.futures.Future:
+        """Queue fn(*args) on a worker, or raise PoolSaturated if too much is already in flight"""
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.rejected += 1
+                metrics.COMPUTE_TASKS_REJECTED.inc(task=fn.__name__, reason='saturated')
+                raise PoolSaturated(f"{self._pending} compute tasks already pending")
+            self._pending += 1
+            
+            try:
+                future = self._get_executor().submit(fn, *args)
+            except BrokenProcessPool:
+                # A worker died (e.g. OOM killed); replace the pool once and retry
+                logger.warning("Compute pool was broken, restarting it")
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+                try:
+                    future = self._get_executor().submit(fn, *args)
+                except Exception:
+                    self._pending -= 1
+                    raise
+            except Exception:
+                self._pending -= 1
+                raise
+            
+            self.submitted += 1
+        
+        future.add_done_callback(self._task_done)
+        return future
+    
+    def _task_done(self, future: concurrent.futures.Future):
+        with self._lock:
+            self._pending -= 1
+            if future.cancelled() or future.exception() is not None:
+                self.failures += 1
+            else:
+                self.completed += 1
+    
+    async def run(self, fn: Callable, *args, timeout: Optional[float] = None) -> Any:
+        """Await fn(*args) from a worker; raises asyncio.TimeoutError after the task timeout"""
+        future = self.submit(fn, *args)
+        try:
+            with metrics.COMPUTE_TASK_DURATION.time(task=fn.__name__):
+                return await asyncio.wait_for(asyncio.wrap_future(future), timeout or self.timeout)
+        except asyncio.TimeoutError:
+            # A task that already started keeps its worker until it finishes
+            self.timeouts += 1
+            metrics.COMPUTE_TASKS_REJECTED.inc(task=fn.__name__, reason='timeout')
+            raise
+    
+    def call(self, fn: Callable, *args, timeout: Optional[float] = None) -> Any:
+        """Blocking variant of run for sync code paths"""
+        future = self.submit(fn, *args)
+        try:
+            with metrics.COMPUTE_TASK_DURATION.time(task=fn.__name__):
+                return future.result(timeout or self.timeout)
+        except concurrent.futures.TimeoutError:
+            self.timeouts += 1
+            metrics.COMPUTE_TASKS_REJECTED.inc(task=fn.__name__, reason='timeout')
+            future.cancel()
+            raise
+    
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+    
+    def stats(self) -> Dict:
+        return {
+            'workers': self.workers,
+            'pending': self._pending,
+            'max_pending': self.max_pending,
+            'submitted': self.submitted,
+            'completed': self.completed,
+            'rejected': self.rejected,
+            'timeouts': self.timeouts,
+            'failures': self.failures
+        }
+
+_pool: Optional[ComputePool] = None
+_pool_lock = threading.Lock()
+
+def get_compute_pool() -> Optional[ComputePool]:
+    """Process-wide compute pool, or None when COMPUTE_POOL_WORKERS is 0"""
+    global _pool
+    
+    if COMPUTE_POOL_WORKERS <= 0:
+        return None
+    
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ComputePool(COMPUTE_POOL_WORKERS, COMPUTE_POOL_MAX_PENDING, COMPUTE_TASK_TIMEOUT)
+    
+    return _pool
+
+def shutdown_compute_pool():
+    if _pool is not None:
+        _pool.shutdown()
+
+def compute_pool_stats() -> Optional[Dict]:
+    return _pool.stats() if _pool is not None else None
+
+async def run_or_fallback(fn: Callable, *args, fallback: Callable[[], Any], timeout: Optional[float] = None) -> Any:
+    """Run fn(*args) in the pool, or fallback() when the pool is saturated, broken or the task times out"""
+    pool = get_compute_pool()
+    if pool is None:
+        return await asyncio.to_thread(fn, *args)
+    
+    try:
+        return await pool.run(fn, *args, timeout=timeout)
+    except (PoolSaturated, BrokenProcessPool, asyncio.TimeoutError):
+        return fallback()
+
+def call_or_fallback(fn: Callable, *args, fallback: Callable[[], Any], timeout: Optional[float] = None) -> Any:
+    """Blocking variant of run_or_fallback for sync routes"""
+    pool = get_compute_pool()
+    if pool is None:
+        return fn(*args)
+    
+    try:
+        return pool.call(fn, *args, timeout=timeout)
+    except (PoolSaturated, BrokenProcessPool, concurrent.futures.TimeoutError):
+        return fallback()
+
+async def categorize_batch(descriptions: List[str]) -> List[Dict]:
+    """Categorize descriptions in a worker when the batch is large, otherwise (or when busy) in a thread"""
+    categorizer = await asyncio.to_thread(model_registry.get_categorizer)
+    pool = get_compute_pool()
+    
+    if pool is not None and len(descriptions) >= COMPUTE_POOL_MIN_BATCH:
+        try:
+            return await pool.run(categorize_descriptions, descriptions, categorizer.version)
+        except (PoolSaturated, BrokenProcessPool, asyncio.TimeoutError):
+            pass
+    
+    return await asyncio.to_thread(categorizer.categorize_batch, descriptions)
+
+def categorize_batch_sync(descriptions: List[str]) -> List[Dict]:
+    """Blocking variant of categorize_batch for sync routes"""
+    categorizer = model_registry.get_categorizer()
+    pool = get_compute_pool()
+    
+    if pool is not None and len(descriptions) >= COMPUTE_POOL_MIN_BATCH:
+        try:
+            return pool.call(categorize_descriptions, descriptions, categorizer.version)
+        except (PoolSaturated, BrokenProcessPool, concurrent.futures.TimeoutError):
+            pass
+    
+    return categorizer.categorize_batch(descriptions)
+
+# Task functions below run inside pool workers and must stay importable at module level
+
+def forecast_daily_totals(daily_totals: List) -> Dict:
+    return SpendingPredictor().predict_from_daily_totals(daily_totals)
+
+def forecast_all_categories(categories: List[str], daily_matrix: np.ndarray) -> Dict[str, Dict]:
+    return SpendingPredictor().predict_all_categories(categories, daily_matrix)
+
+_reloaded_for: Optional[str] = None
+
+def categorize_descriptions(descriptions: List[str], model_version: Optional[str] = None) -> List[Dict]:
+    """Batch categorization in a worker, reloading the artifact when the API's model has moved on"""
+    global _reloaded_for
+    
+    categorizer = model_registry.get_categorizer()
+    # Online learning checkpoints newer versions; reload at most once per version seen
+    if model_version and categorizer.version != model_version and _reloaded_for != model_version:
+        _reloaded_for = model_version
+        categorizer = model_registry.reload_categorizer()
+    
+    return categorizer.categorize_batch(descriptions)
+
+def ensure_categorizer_artifact() -> str:
+    """Train and persist the categorizer if no artifact exists yet; returns its version"""
+    return model_registry.get_categorizer().version
@@ -0,0 +1,172 @@
+import threading
+import numpy as np
+from datetime import date
+from typing import Dict, Iterable, Optional, Tuple
+from ai_engine.predictor import SpendingPredictor
+import metrics
+
+# Re-center day indices once the window has drifted this far from the origin
+REBASE_DAYS = 365
+
+class RunningPolynomialFit:
+    """Normal-equation sums for a polynomial fit of daily totals over a sliding window of calendar days"""
+    
+    def __init__(self, window_days: int, degree: int = 2):
+        self.window_days = window_days
+        self.degree = degree
+        self.daily: Dict[int, float] = {}  # ordinal day -> total, days inside the window only
+        self.counts: Dict[int, int] = {}  # ordinal day -> transactions, same days
+        self.transaction_count = 0
+        self.origin = None
+        self.end_day = None
+        self.sum_ty = np.zeros(degree + 1)  # sum of t^k * y
+        self.sum_yy = 0.0
+    
+    @property
+    def start_day(self) -> int:
+        return self.end_day - self.window_days + 1
+    
+    def _powers(self, day: int) -> np.ndarray:
+        return float(day - self.origin) ** np.arange(self.degree + 1)
+    
+    def advance(self, today: int):
+        """Slide the window so it ends today, expiring days that fell out of it"""
+        if self.end_day is None or today - self.end_day >= self.window_days:
+            self.daily.clear()
+            self.counts.clear()
+            self.transaction_count = 0
+            self.sum_ty[:] = 0.0
+            self.sum_yy = 0.0
+            self.end_day = today
+            self.origin = self.start_day
+            return
+        
+        if today <= self.end_day:
+            return
+        
+        new_start = today - self.window_days + 1
+        for day in range(self.start_day, new_start):
+            total = self.daily.pop(day, 0.0)
+            self.transaction_count -= self.counts.pop(day, 0)
+            if total:
+                self.sum_ty -= self._powers(day) * total
+                self.sum_yy -= total * total
+        self.end_day = today
+        
+        if self.start_day - self.origin > REBASE_DAYS:
+            self._rebase()
+    
+    def _rebase(self):
+        self.origin = self.start_day
+        self.sum_ty[:] = 0.0
+        for day, total in self.daily.items():
+            self.sum_ty += self._powers(day) * total
+    
+    def add(self, day: int, amount: float, count: int = 1):
+        """Add (or with a negative amount and count, remove) spending on a day in O(1)"""
+        if self.end_day is None or not self.start_day <= day <= self.end_day:
+            return
+        
+        self.transaction_count += count
+        day_count = self.counts.get(day, 0) + count
+        if day_count:
+            self.counts[day] = day_count
+        else:
+            self.counts.pop(day, None)
+        
+        old = self.daily.get(day, 0.0)
+        new = old + amount
+        self.sum_ty += self._powers(day) * amount
+        self.sum_yy += new * new - old * old
+        
+        if abs(new) < 1e-9:
+            self.daily.pop(day, None)
+        else:
+            self.daily[day] = new
+    
+    def coefficients(self) -> np.ndarray:
+        """Solve the (degree+1)x(degree+1) normal equations for t = day - origin"""
+        t = np.arange(self.start_day - self.origin, self.end_day - self.origin + 1, dtype=float)
+        power_sums = np.array([np.sum(t ** k) for k in range(2 * self.degree + 1)])
+        xtx = np.array([[power_sums[i + j] for j in range(self.degree + 1)] for i in range(self.degree + 1)])
+        return np.linalg.lstsq(xtx, self.sum_ty, rcond=None)[0]
+    
+    def predict(self, horizon: int) -> np.ndarray:
+        coefficients = self.coefficients()
+        t = np.arange(self.end_day + 1, self.end_day + horizon + 1, dtype=float) - self.origin
+        return np.vander(t, self.degree + 1, increasing=True) @ coefficients
+
+class IncrementalSpendingPredictor(SpendingPredictor):
+    """Forecasts from running regression sums that expense writes update in O(1)"""
+    
+    def __init__(self, windows: Tuple[int, ...] = (30, 60), degree: int = 2):
+        super().__init__()
+        self.windows = windows
+        self.degree = degree
+        self._fits: Dict[Tuple[Optional[str], int], RunningPolynomialFit] = {}
+        self._lock = threading.Lock()
+    
+    def _fit(self, category: Optional[str], window_days: int, today: int) -> RunningPolynomialFit:
+        key = (category, window_days)
+        fit = self._fits.get(key)
+        if fit is None:
+            fit = self._fits[key] = RunningPolynomialFit(window_days, self.degree)
+        fit.advance(today)
+        return fit
+    
+    def add_expense(self, day: date, amount: float, category: Optional[str] = None, today: Optional[date] = None, count: int = 1):
+        """Apply an expense (negative amount and count to remove it) to the total and category series"""
+        with self._lock:
+            self._apply(day, amount, category, (today or date.today()).toordinal(), count)
+    
+    def _apply(self, day: date, amount: float, category: Optional[str], today: int, count: int):
+        for window_days in self.windows:
+            self._fit(None, window_days, today).add(day.toordinal(), amount, count)
+            if category:
+                self._fit(category, window_days, today).add(day.toordinal(), amount, count)
+    
+    def load(self, rows: Iterable[Tuple[date, str, float, int]], today: Optional[date] = None):
+        """Reset all series from (day, category, total, count) rows, e.g. the daily rollups"""
+        today = (today or date.today()).toordinal()
+        with self._lock:
+            self._fits.clear()
+            for day, category, total, count in rows:
+                self._apply(day, total, category, today, count)
+    
+    def transaction_count(self, window_days: int = 60, category: Optional[str] = None, today: Optional[date] = None) -> int:
+        """Transactions in the series' window, kept with the running sums"""
+        with self._lock:
+            return self._fit(category, window_days, (today or date.today()).toordinal()).transaction_count
+    
+    def forecast(self, window_days: int = 60, category: Optional[str] = None, today: Optional[date] = None) -> Dict:
+        """Predict the next 30 days from the series' running sums"""
+        with self._lock:
+            fit = self._fit(category, window_days, (today or date.today()).toordinal())
+            days_with_data = len(fit.daily)
+            total = float(fit.sum_ty[0])
+            
+            if days_with_data == 0:
+                return self._default_prediction()
+            if days_with_data < 7:  # Need at least a week of data
+                return self._average_prediction(total, days_with_data)
+            
+            with metrics.PREDICTOR_FIT.time(model='incremental'):
+                predictions = np.maximum(fit.predict(30), 0)
+            recent_avg = sum(fit.daily.get(day, 0.0) for day in range(fit.end_day - 6, fit.end_day + 1)) / 7
+            
+            # Variance over days with spending; zero days add nothing to either sum
+            mean = total / days_with_data
+            variance = (fit.sum_yy - days_with_data * mean * mean) / (days_with_data - 1)
+        
+        daily_average = float(np.mean(predictions))
+        data_confidence = min(days_with_data / 30, 1.0)
+        variance_confidence = 1.0 / (1.0 + max(variance, 0.0) / 1000)
+        
+        return {
+            'predicted_total': float(np.sum(predictions)),
+            'daily_average': daily_average,
+            'trend': "increasing" if daily_average > recent_avg else "decreasing",
+            'confidence': float((data_confidence + variance_confidence) / 2),
+            'method': 'incremental_regression',
+            'daily_predictions': predictions.tolist()[:7]  # First week
+        }
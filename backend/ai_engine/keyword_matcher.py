@@ -0,0 +1,86 @@
+from collections import deque
+from typing import Dict, List, Tuple
+
+class KeywordMatcher:
+    """Aho-Corasick automaton that finds every keyword in a single pass over the text"""
+    
+    def __init__(self):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._terminal: List[List[Tuple[str, float]]] = [[]]
+        self._output: List[List[Tuple[str, float]]] = [[]]
+        self._built = True
+        self.keyword_count = 0
+    
+    @classmethod
+    def from_categories(cls, categories: Dict[str, List[str]]) -> 'KeywordMatcher':
+        """Build a matcher where each keyword weighs its length, so specific terms win"""
+        matcher = cls()
+        for category, keywords in categories.items():
+            for keyword in keywords:
+                matcher.add(keyword.lower(), category, float(len(keyword)))
+        matcher.build()
+        return matcher
+    
+    def add(self, keyword: str, label: str, weight: float = 1.0):
+        """Add a keyword; call build() before matching"""
+        if not keyword:
+            return
+        
+        node = 0
+        for char in keyword:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][char] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._terminal.append([])
+            node = next_node
+        
+        self._terminal[node].append((label, weight))
+        self.keyword_count += 1
+        self._built = False
+    
+    def build(self):
+        """Compute failure links breadth-first"""
+        self._output = [list(keywords) for keywords in self._terminal]
+        queue = deque()
+        for node in self._goto[0].values():
+            self._fail[node] = 0
+            queue.append(node)
+        
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(char, 0)
+                
+                # A node also reports every keyword that is a suffix of its path
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+        
+        self._built = True
+    
+    def scores(self, text: str) -> Dict[str, float]:
+        """Sum the weights of all keyword occurrences in text, per label"""
+        if not self._built:
+            self.build()
+        
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+        scores = {}
+        node = 0
+        
+        for char in text:
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            for label, weight in output[node]:
+                scores[label] = scores.get(label, 0.0) + weight
+        
+        return scores
@@ -0,0 +1,126 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from typing import Dict, Optional
+import sklearn
+from ai_engine.categorizer import ExpenseCategorizer
+from ai_engine.online_learning import CorrectionQueue
+
+logger = logging.getLogger(__name__)
+
+# Bump when the artifact layout or training procedure changes
+ARTIFACT_FORMAT = 1
+
+MODEL_DIR = os.getenv("MODEL_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "artifacts"))
+
+# "incremental" enables online learning from user corrections
+CATEGORIZER_MODE = os.getenv("CATEGORIZER_MODE", "batch")
+CORRECTION_BATCH_SIZE = int(os.getenv("CORRECTION_BATCH_SIZE", "32"))
+CHECKPOINT_INTERVAL = float(os.getenv("CHECKPOINT_INTERVAL", "300"))
+
+_categorizer: Optional[ExpenseCategorizer] = None
+_correction_queue: Optional[CorrectionQueue] = None
+_lock = threading.Lock()
+
+def categorizer_version(categorizer: ExpenseCategorizer) -> str:
+    """Version derived from the training data and library, so stale artifacts are never loaded"""
+    fingerprint = json.dumps({
+        'format': ARTIFACT_FORMAT,
+        'incremental': categorizer.incremental,
+        'categories': categorizer.categories,
+        'sklearn': sklearn.__version__
+    }, sort_keys=True)
+    return f"{ARTIFACT_FORMAT}.{hashlib.sha1(fingerprint.encode()).hexdigest()[:12]}"
+
+def artifact_path(version: str) -> str:
+    return os.path.join(MODEL_DIR, f"categorizer-{version}.pkl")
+
+def load_or_train_categorizer() -> ExpenseCategorizer:
+    """Load the current categorizer artifact, training and persisting it if missing"""
+    incremental = CATEGORIZER_MODE == "incremental"
+    version = categorizer_version(ExpenseCategorizer(train=False, incremental=incremental))
+    path = artifact_path(version)
+    
+    if os.path.exists(path):
+        try:
+            categorizer = ExpenseCategorizer.load(path)
+            logger.info("Loaded categorizer model %s", version)
+            return categorizer
+        except Exception:
+            logger.exception("Failed to load categorizer artifact %s, retraining", path)
+    
+    categorizer = ExpenseCategorizer(incremental=incremental)
+    categorizer.version = version
+    
+    try:
+        os.makedirs(MODEL_DIR, exist_ok=True)
+        categorizer.save(path)
+        logger.info("Trained and saved categorizer model %s", version)
+    except OSError:
+        # A read-only deployment still works, it just retrains per process
+        logger.exception("Could not persist categorizer artifact to %s", path)
+    
+    return categorizer
+
+def get_categorizer() -> ExpenseCategorizer:
+    """Process-wide categorizer, loaded lazily on first use"""
+    global _categorizer
+    
+    if _categorizer is None:
+        with _lock:
+            if _categorizer is None:
+                _categorizer = load_or_train_categorizer()
+    
+    return _categorizer
+
+def reload_categorizer() -> ExpenseCategorizer:
+    """Reload the latest artifact from disk; used by compute pool workers, not the online learner"""
+    global _categorizer
+    
+    with _lock:
+        _categorizer = load_or_train_categorizer()
+    
+    return _categorizer
+
+def loaded_model_version() -> Optional[str]:
+    """Version of the loaded categorizer, or None if it has not been used yet"""
+    return _categorizer.version if _categorizer is not None else None
+
+def categorizer_cache_stats() -> Optional[Dict]:
+    """Merchant categorization cache counters, or None if the model is not loaded"""
+    return _categorizer.cache.stats() if _categorizer is not None else None
+
+def get_correction_queue() -> Optional[CorrectionQueue]:
+    """Background learner for the incremental categorizer, or None in batch mode"""
+    global _correction_queue
+    
+    if CATEGORIZER_MODE != "incremental":
+        return None
+    
+    if _correction_queue is None:
+        categorizer = get_categorizer()
+        with _lock:
+            if _correction_queue is None:
+                _correction_queue = CorrectionQueue(
+                    categorizer,
+                    # Checkpoints overwrite the artifact so restarts resume the learned model
+                    checkpoint_path=artifact_path(categorizer.version.split('+')[0]),
+                    batch_size=CORRECTION_BATCH_SIZE,
+                    checkpoint_interval=CHECKPOINT_INTERVAL
+                )
+                _correction_queue.start()
+    
+    return _correction_queue
+
+def record_correction(description: str, category: str):
+    """Feed a user override of the AI category to online learning, if enabled"""
+    correction_queue = get_correction_queue()
+    if correction_queue is not None:
+        correction_queue.submit(description, category)
+
+def shutdown_online_learning():
+    """Flush pending corrections and write a final checkpoint"""
+    if _correction_queue is not None:
+        _correction_queue.stop()
@@ -0,0 +1,117 @@
+import logging
+import queue
+import threading
+import time
+from typing import Dict, Optional
+from ai_engine.categorizer import ExpenseCategorizer
+
+logger = logging.getLogger(__name__)
+
+class CorrectionQueue:
+    """Applies user category corrections to an incremental categorizer in background mini-batches"""
+    
+    def __init__(
+        self,
+        categorizer: ExpenseCategorizer,
+        checkpoint_path: Optional[str] = None,
+        batch_size: int = 32,
+        flush_interval: float = 5.0,
+        checkpoint_interval: float = 300.0,
+        maxsize: int = 10000
+    ):
+        self.categorizer = categorizer
+        self.checkpoint_path = checkpoint_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.checkpoint_interval = checkpoint_interval
+        
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._stop = threading.Event()
+        self._thread = None
+        self._last_checkpoint = time.monotonic()
+        self._dirty = False
+        
+        self.submitted = 0
+        self.dropped = 0
+        self.applied = 0
+        self.batches = 0
+        self.checkpoints = 0
+    
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="categorizer-online-learning", daemon=True)
+            self._thread.start()
+    
+    def stop(self, timeout: float = 10.0):
+        """Apply whatever is queued, write a final checkpoint and stop the worker"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+    
+    def submit(self, description: str, category: str) -> bool:
+        """Queue a correction without blocking the request; drops it if the queue is full"""
+        try:
+            self._queue.put_nowait((description, category))
+            self.submitted += 1
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+    
+    def _next_batch(self):
+        batch = []
+        try:
+            batch.append(self._queue.get(timeout=self.flush_interval))
+        except queue.Empty:
+            return batch
+        
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+    
+    def _run(self):
+        while not self._stop.is_set() or not self._queue.empty():
+            batch = self._next_batch()
+            
+            if batch:
+                try:
+                    self.applied += self.categorizer.learn(batch)
+                    self.batches += 1
+                    self._dirty = True
+                except Exception:
+                    logger.exception("Failed to apply %d categorizer corrections", len(batch))
+            
+            if self._dirty and time.monotonic() - self._last_checkpoint >= self.checkpoint_interval:
+                self.checkpoint()
+        
+        if self._dirty:
+            self.checkpoint()
+    
+    def checkpoint(self):
+        """Persist the current model so learned corrections survive restarts"""
+        self._last_checkpoint = time.monotonic()
+        if not self.checkpoint_path:
+            return
+        
+        try:
+            self.categorizer.save(self.checkpoint_path)
+            self._dirty = False
+            self.checkpoints += 1
+            logger.info("Checkpointed categorizer model %s", self.categorizer.version)
+        except OSError:
+            logger.exception("Could not checkpoint categorizer to %s", self.checkpoint_path)
+    
+    def stats(self) -> Dict:
+        return {
+            'queued': self._queue.qsize(),
+            'submitted': self.submitted,
+            'dropped': self.dropped,
+            'applied': self.applied,
+            'batches': self.batches,
+            'checkpoints': self.checkpoints,
+            'model_version': self.categorizer.version
+        }
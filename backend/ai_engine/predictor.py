@@ -1,9 +1,10 @@
 import numpy as np
 from datetime import datetime, timedelta
-from typing import List, Dict
+from typing import List, Dict, Tuple
 from sklearn.linear_model import LinearRegression
 from sklearn.preprocessing import PolynomialFeatures
 import pandas as pd
+import metrics
 
 class SpendingPredictor:
     def __init__(self):
@@ -29,6 +30,24 @@ class SpendingPredictor:
         except Exception as e:
             return self._simple_prediction(expenses)
     
+    def predict_from_daily_totals(self, daily_totals: List[Tuple]) -> Dict:
+        """Predict next month's spending from (date, total) pairs, e.g. a SQL GROUP BY date result"""
+        if not daily_totals:
+            return self._default_prediction()
+        
+        df = pd.DataFrame(daily_totals, columns=['date', 'amount'])
+        df['amount'] = df['amount'].astype(float)
+        df = df.sort_values('date').reset_index(drop=True)
+        df['day_number'] = range(len(df))
+        
+        if len(df) < 7:  # Need at least a week of data
+            return self._average_prediction(float(df['amount'].sum()), len(df))
+        
+        try:
+            return self._ml_prediction(df)
+        except Exception:
+            return self._average_prediction(float(df['amount'].sum()), len(df))
+    
     def _prepare_data(self, expenses: List[Dict]) -> pd.DataFrame:
         """Prepare expense data for ML model"""
         data = []
@@ -55,17 +74,22 @@ class SpendingPredictor:
         X = df[['day_number']].values
         y = df['amount'].values
         
+        # Request-local estimators; fitting the shared ones would race between concurrent requests
+        poly_features = PolynomialFeatures(degree=self.poly_features.degree)
+        model = LinearRegression()
+        
         # Apply polynomial features for better fitting
-        X_poly = self.poly_features.fit_transform(X)
+        X_poly = poly_features.fit_transform(X)
         
         # Train the model
-        self.model.fit(X_poly, y)
+        with metrics.PREDICTOR_FIT.time(model='polynomial'):
+            model.fit(X_poly, y)
         self.is_trained = True
         
         # Predict next 30 days
         future_days = np.array([[len(df) + i] for i in range(30)])
-        future_days_poly = self.poly_features.transform(future_days)
-        predictions = self.model.predict(future_days_poly)
+        future_days_poly = poly_features.transform(future_days)
+        predictions = model.predict(future_days_poly)
         
         # Ensure predictions are positive
         predictions = np.maximum(predictions, 0)
@@ -91,6 +115,10 @@ class SpendingPredictor:
         total_amount = sum(exp.get('amount', 0) for exp in expenses)
         days_of_data = len(set(exp.get('date', '')[:10] for exp in expenses))
         
+        return self._average_prediction(total_amount, days_of_data)
+    
+    def _average_prediction(self, total_amount: float, days_of_data: int) -> Dict:
+        """Average-based prediction from a spending total over a number of days"""
         if days_of_data == 0:
             return self._default_prediction()
         
@@ -154,4 +182,48 @@ class SpendingPredictor:
             'predicted_amount': predicted_monthly,
             'confidence': min(days / 30, 1.0),
             'trend': 'stable'
-        }
\ No newline at end of file
+        }
+    
+    def predict_all_categories(self, categories: List[str], daily_matrix: np.ndarray, horizon: int = 30) -> Dict[str, Dict]:
+        """Forecast every category at once from a (day x category) matrix of daily totals"""
+        # Rows are consecutive calendar days (zero-filled), columns follow `categories`
+        results = {}
+        if daily_matrix.size == 0 or not categories:
+            return {category: {'predicted_amount': 0.0, 'confidence': 0.0, 'trend': 'no_data'} for category in categories}
+        
+        n_days = daily_matrix.shape[0]
+        day_index = np.arange(n_days, dtype=float)
+        X = np.column_stack([np.ones(n_days), day_index])
+        
+        # One solve for all categories: coefficients has shape (2, n_categories)
+        with metrics.PREDICTOR_FIT.time(model='batched_linear'):
+            coefficients, *_ = np.linalg.lstsq(X, daily_matrix, rcond=None)
+        
+        future_index = np.arange(n_days, n_days + horizon, dtype=float)
+        future_X = np.column_stack([np.ones(horizon), future_index])
+        forecasts = np.maximum(future_X @ coefficients, 0)
+        
+        predicted_totals = forecasts.sum(axis=0)
+        daily_averages = forecasts.mean(axis=0)
+        recent_averages = daily_matrix[-7:].mean(axis=0)
+        active_days = (daily_matrix > 0).sum(axis=0)
+        
+        for i, category in enumerate(categories):
+            if active_days[i] == 0:
+                results[category] = {'predicted_amount': 0.0, 'confidence': 0.0, 'trend': 'no_data'}
+                continue
+            
+            if abs(daily_averages[i] - recent_averages[i]) <= 0.05 * max(recent_averages[i], 1e-9):
+                trend = 'stable'
+            else:
+                trend = 'increasing' if daily_averages[i] > recent_averages[i] else 'decreasing'
+            
+            results[category] = {
+                'predicted_amount': float(predicted_totals[i]),
+                'daily_average': float(daily_averages[i]),
+                'confidence': float(min(active_days[i] / 30, 1.0)),
+                'trend': trend,
+                'method': 'batched_linear_trend'
+            }
+        
+        return results
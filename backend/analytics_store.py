@@ -0,0 +1,227 @@
+"""Analytics reads answered from an in-memory columnar copy of recent expenses.
+
+Enabled with ANALYTICS_ENGINE=columnar; otherwise, and while a shard's copy
+is still loading, every function reads the daily rollups instead. A copy
+is loaded per user on their first read, kept in step with committed
+expense writes, and reloaded every resync interval to pick up writes from
+other workers. At most ANALYTICS_MAX_STORES users are kept in memory.
+"""
+from sqlalchemy import Integer, cast, event, func, select
+from sqlalchemy.orm import Session
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, TypeVar
+from datetime import date, datetime, timedelta
+from ai_engine.columnar import ColumnarExpenses, epoch_day, from_epoch_day
+from models.expense import DBExpense
+from database import session_user
+import numpy as np
+import os
+import threading
+import time
+import rollups
+
+ANALYTICS_ENGINE = os.getenv("ANALYTICS_ENGINE", "rollups")
+ANALYTICS_HISTORY_DAYS = int(os.getenv("ANALYTICS_HISTORY_DAYS", "120"))
+ANALYTICS_RESYNC_INTERVAL = float(os.getenv("ANALYTICS_RESYNC_INTERVAL", "300"))
+ANALYTICS_MAX_STORES = int(os.getenv("ANALYTICS_MAX_STORES", "1000"))
+LOAD_CHUNK_ROWS = 50000
+
+WEEKDAY_NAMES = ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday')
+
+# julianday() of 1970-01-01; SQLite turns stored datetimes into epoch days without Python date objects
+JULIAN_EPOCH = 2440587.5
+
+# Keyed by (shard, user id)
+_stores: Dict[Tuple[int, str], ColumnarExpenses] = {}
+_loaded_at: Dict[Tuple[int, str], float] = {}
+# Changes committed while a copy is loading, replayed onto it; adds are idempotent
+_replay: Dict[Tuple[int, str], List[Tuple]] = {}
+# Guards in-memory state only; never held across a query, which would block the event loop thread.
+# Reads of a copy hold it too, since committed writes shift and regrow the copy's arrays in place
+_lock = threading.Lock()
+
+T = TypeVar('T')
+
+def columnar_enabled() -> bool:
+    return ANALYTICS_ENGINE == "columnar"
+
+def _stage(db: Session, expense: DBExpense, change: Tuple):
+    if columnar_enabled():
+        db.info.setdefault('analytics_changes', []).append((expense.user_id, change))
+
+def stage_expenses_added(db: Session, expenses: Iterable[DBExpense]):
+    for expense in expenses:
+        _stage(db, expense, ('add', expense.id, epoch_day(expense.date.date()), expense.amount, expense.category))
+
+def stage_expense_removed(db: Session, expense: DBExpense):
+    _stage(db, expense, ('remove', expense.id))
+
+def stage_category_changed(db: Session, expense: DBExpense):
+    _stage(db, expense, ('category', expense.id, expense.category))
+
+def _apply(store: ColumnarExpenses, changes: Iterable[Tuple]):
+    for change in changes:
+        if change[0] == 'add':
+            store.add(*change[1:])
+        elif change[0] == 'remove':
+            store.remove(change[1])
+        else:
+            store.set_category(*change[1:])
+
+@event.listens_for(Session, "after_commit")
+def _apply_after_commit(session: Session):
+    changes = session.info.pop('analytics_changes', [])
+    if changes:
+        shard = session.info.get('shard', 0)
+        # A group commit may hold several users' rows
+        by_user: Dict[str, List[Tuple]] = {}
+        for user_id, change in changes:
+            by_user.setdefault(user_id, []).append(change)
+        with _lock:
+            for user_id, user_changes in by_user.items():
+                key = (shard, user_id)
+                store = _stores.get(key)
+                if store is not None:
+                    _apply(store, user_changes)
+                if key in _replay:
+                    _replay[key].extend(user_changes)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_on_rollback(session: Session):
+    session.info.pop('analytics_changes', None)
+
+def _load(db: Session, start_day: int) -> ColumnarExpenses:
+    store = ColumnarExpenses(start_day)
+    day = cast(func.julianday(DBExpense.date) - JULIAN_EPOCH, Integer)
+    result = db.execute(
+        select(DBExpense.id, day, DBExpense.amount, DBExpense.category)
+        .where(
+            DBExpense.user_id == session_user(db),
+            DBExpense.date >= datetime.combine(from_epoch_day(start_day), datetime.min.time())
+        )
+        .order_by(DBExpense.id)
+    )
+    for rows in result.partitions(LOAD_CHUNK_ROWS):
+        ids, days, amounts, categories = zip(*rows)
+        store.extend(np.array(ids), np.array(days), np.array(amounts, dtype=np.float64), categories)
+    return store
+
+def get_store(db: Session, since: date) -> Optional[ColumnarExpenses]:
+    """The session user's copy covering `since`, or None when disabled, loading elsewhere or too short"""
+    if not columnar_enabled():
+        return None
+    
+    key = (db.info.get('shard', 0), session_user(db))
+    with _lock:
+        store = _stores.get(key)
+        fresh = key in _loaded_at and time.monotonic() - _loaded_at[key] <= ANALYTICS_RESYNC_INTERVAL
+        if fresh or key in _replay:
+            # Another request is already (re)loading; keep serving the previous copy meanwhile
+            return store if store is not None and store.covers(epoch_day(since)) else None
+        _replay[key] = []
+    
+    try:
+        store = _load(db, epoch_day(date.today() - timedelta(days=ANALYTICS_HISTORY_DAYS - 1)))
+    except Exception:
+        with _lock:
+            _replay.pop(key, None)
+        raise
+    
+    with _lock:
+        _apply(store, _replay.pop(key))
+        if key not in _stores and len(_stores) >= ANALYTICS_MAX_STORES:
+            # Evict the copy loaded longest ago; that user reloads on their next read
+            oldest = min(_loaded_at, key=_loaded_at.get)
+            _stores.pop(oldest, None)
+            _loaded_at.pop(oldest, None)
+        _stores[key] = store
+        _loaded_at[key] = time.monotonic()
+    
+    return store if store.covers(epoch_day(since)) else None
+
+def _read(db: Session, since: date, read: Callable[[ColumnarExpenses, int, int], T]) -> Optional[T]:
+    """read(store, since, today) on the session user's copy under the lock, or None without a usable copy"""
+    store = get_store(db, since)
+    if store is None:
+        return None
+    with _lock:
+        return read(store, epoch_day(since), epoch_day(date.today()))
+
+def daily_totals(db: Session, since: date) -> List[Tuple[date, float, int]]:
+    """(day, total, count) for each day with spending from a given day through today"""
+    def read(store: ColumnarExpenses, start: int, today: int) -> List[Tuple[date, float, int]]:
+        totals, counts = store.daily_totals(start, today)
+        return [(from_epoch_day(start + i), float(totals[i]), int(counts[i])) for i in np.flatnonzero(counts)]
+    
+    rows = _read(db, since, read)
+    return rollups.daily_totals(db, since) if rows is None else rows
+
+def rollup_rows(db: Session, since: date, category: Optional[str] = None) -> List[Tuple[date, str, float, int]]:
+    """(day, category, total, count) rows from a given day through today, in day order"""
+    def read(store: ColumnarExpenses, start: int, today: int) -> List[Tuple[date, str, float, int]]:
+        totals, counts = store.daily_category_totals(start, today)
+        return [
+            (from_epoch_day(start + i), store.categories[j], float(totals[i, j]), int(counts[i, j]))
+            for i, j in zip(*np.nonzero(counts))
+            if category is None or store.categories[j] == category
+        ]
+    
+    rows = _read(db, since, read)
+    return rollups.rollup_rows(db, since, category=category) if rows is None else rows
+
+def category_totals(db: Session, since: date) -> List[Tuple[str, float, int]]:
+    """(category, total, count) per category from a given day through today"""
+    def read(store: ColumnarExpenses, start: int, today: int) -> List[Tuple[str, float, int]]:
+        totals, counts = store.category_totals(start, today)
+        return [(store.categories[j], float(totals[j]), int(counts[j])) for j in np.flatnonzero(counts)]
+    
+    rows = _read(db, since, read)
+    return rollups.category_totals(db, since) if rows is None else rows
+
+def weekday_totals(db: Session, since: date) -> Dict[str, Tuple[float, int]]:
+    """Weekday name -> (total, count) for weekdays with spending from a given day through today"""
+    result = _read(db, since, lambda store, start, today: store.weekday_totals(start, today))
+    if result is not None:
+        totals, counts = result
+    else:
+        totals, counts = np.zeros(7), np.zeros(7, dtype=np.int64)
+        for day, _, total, count in rollups.rollup_rows(db, since):
+            totals[day.weekday()] += total
+            counts[day.weekday()] += count
+    return {WEEKDAY_NAMES[i]: (float(totals[i]), int(counts[i])) for i in np.flatnonzero(counts)}
+
+def daily_category_matrices(db: Session, since: date) -> Tuple[List[str], np.ndarray, np.ndarray]:
+    """Sorted categories with spending and their (day x category) totals and counts, from since through today"""
+    def read(store: ColumnarExpenses, start: int, today: int) -> Tuple[List[str], np.ndarray, np.ndarray]:
+        totals, counts = store.daily_category_totals(start, today)
+        codes = sorted(np.flatnonzero(counts.sum(axis=0)), key=lambda code: store.categories[code])
+        return [store.categories[code] for code in codes], totals[:, codes], counts[:, codes]
+    
+    result = _read(db, since, read)
+    if result is not None:
+        return result
+    
+    # The rollup readers stop at today, so every row lands inside the matrix
+    today = date.today()
+    rows = rollups.rollup_rows(db, since)
+    categories = sorted({row[1] for row in rows})
+    column = {category: i for i, category in enumerate(categories)}
+    shape = ((today - since).days + 1, len(categories))
+    totals, counts = np.zeros(shape), np.zeros(shape, dtype=np.int64)
+    for day, category, total, count in rows:
+        totals[(day - since).days, column[category]] += total
+        counts[(day - since).days, column[category]] += count
+    return categories, totals, counts
+
+def daily_category_matrix(db: Session, since: date) -> Tuple[List[str], np.ndarray, Dict[str, int]]:
+    """Sorted categories with spending, their (day x category) totals up to today and transaction counts"""
+    categories, totals, counts = daily_category_matrices(db, since)
+    return categories, totals, dict(zip(categories, counts.sum(axis=0).tolist()))
+
+def store_stats() -> Dict:
+    with _lock:
+        return {
+            'engine': ANALYTICS_ENGINE,
+            'users_loaded': len(_stores),
+            'rows': sum(store.size for store in _stores.values()),
+            'bytes': sum(store.nbytes() for store in _stores.values())
+        }
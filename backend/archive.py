@@ -0,0 +1,239 @@
+"""Cold expense history moved out of SQLite into year/month Arrow partitions.
+
+Expenses older than the archive horizon are written per shard to
+EXPENSE_ARCHIVE_DIR/shard=<n>/year=<yyyy>/month=<mm>/part-<first id>-<last id>.arrow
+and deleted from the expenses table; their daily rollups are kept, so
+analytics over any range still read the rollups. Partitions are
+uncompressed Arrow IPC files, memory-mapped on read without copying.
+
+Each month's delete bumps the owners' persisted data versions, so API
+ETags and cached results see a run from the CLI at once.
+Run after backups, e.g. nightly:
+
+    python -m archive [--horizon-days 365] [--vacuum]
+"""
+from sqlalchemy import delete, func, select, text
+from sqlalchemy.orm import Session
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from datetime import date, datetime, timedelta
+from models.expense import DBExpense
+from database import DEFAULT_USER_ID
+import argparse
+import glob
+import os
+import pyarrow as pa
+import pyarrow.compute as pc
+import analytics_store
+import result_cache
+
+EXPENSE_ARCHIVE_DIR = os.getenv("EXPENSE_ARCHIVE_DIR", "expense_archive")
+ARCHIVE_HORIZON_DAYS = int(os.getenv("ARCHIVE_HORIZON_DAYS", "365"))
+
+# Analytics look back 90 days and the columnar store loads its own history; never archive inside either
+MIN_HORIZON_DAYS = max(90, analytics_store.ANALYTICS_HISTORY_DAYS)
+
+ARROW_TYPES = {
+    int: pa.int64(),
+    float: pa.float64(),
+    str: pa.string(),
+    bool: pa.bool_(),
+    datetime: pa.timestamp('us'),
+    date: pa.date32()
+}
+
+def _schema() -> pa.Schema:
+    return pa.schema([
+        pa.field(column.key, ARROW_TYPES.get(column.type.python_type, pa.string()))
+        for column in DBExpense.__table__.columns
+    ])
+
+def shard_dir(shard: int) -> str:
+    return os.path.join(EXPENSE_ARCHIVE_DIR, f"shard={shard}")
+
+def _month_dir(shard: int, year: int, month: int) -> str:
+    return os.path.join(shard_dir(shard), f"year={year:04d}", f"month={month:02d}")
+
+def _next_month(month_start: datetime) -> datetime:
+    return datetime(month_start.year + month_start.month // 12, month_start.month % 12 + 1, 1)
+
+def _write_partition(table: pa.Table, path: str):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Write then rename, so readers never map a half-written file
+    tmp_path = path + ".tmp"
+    with pa.OSFile(tmp_path, 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, path)
+
+def archive_expenses(db: Session, shard: int = 0, horizon_days: int = ARCHIVE_HORIZON_DAYS) -> int:
+    """Move expenses older than the horizon into Arrow partitions, one month per transaction; returns rows moved"""
+    if horizon_days < MIN_HORIZON_DAYS:
+        raise ValueError(f"Archive horizon must be at least {MIN_HORIZON_DAYS} days")
+    
+    cutoff = datetime.combine(date.today() - timedelta(days=horizon_days), datetime.min.time())
+    months = db.query(func.strftime('%Y-%m', DBExpense.date)).filter(DBExpense.date < cutoff).distinct().all()
+    schema = _schema()
+    columns = list(DBExpense.__table__.columns)
+    archived = 0
+    
+    for (month,) in sorted(months):
+        month_start = datetime.strptime(month, '%Y-%m')
+        in_month = (DBExpense.date >= month_start, DBExpense.date < min(_next_month(month_start), cutoff))
+        rows = db.execute(select(*columns).where(*in_month).order_by(DBExpense.id)).all()
+        if not rows:
+            continue
+        
+        table = pa.Table.from_arrays(
+            [pa.array(values, type=field.type) for values, field in zip(zip(*rows), schema)],
+            schema=schema
+        )
+        # Rows already in a part were written by a run that crashed before its delete; the month can
+        # since have gained back-dated rows, so a rerun would not reproduce that part's id range
+        table = table.filter(pc.invert(pc.is_in(table['id'], value_set=_archived_ids(shard, month_start.year, month_start.month))))
+        if table.num_rows:
+            ids = table['id']
+            _write_partition(table, os.path.join(
+                _month_dir(shard, month_start.year, month_start.month),
+                f"part-{pc.min(ids).as_py()}-{pc.max(ids).as_py()}.arrow"
+            ))
+        
+        # Rows inserted after the read have larger ids and wait for the next run
+        db.execute(delete(DBExpense).where(*in_month, DBExpense.id <= rows[-1].id))
+        result_cache.mark_data_changed(db, result_cache.EXPENSES, users={row.user_id for row in rows})
+        db.commit()
+        archived += len(rows)
+    
+    return archived
+
+def _partitions(shard: int, start: Optional[date], end: Optional[date]) -> List[Tuple[date, List[str]]]:
+    """(month, part files) for archived months overlapping [start, end], newest first"""
+    partitions = []
+    for month_dir in glob.glob(os.path.join(shard_dir(shard), "year=*", "month=*")):
+        year = int(os.path.basename(os.path.dirname(month_dir)).split('=')[1])
+        month = date(year, int(os.path.basename(month_dir).split('=')[1]), 1)
+        if (end is not None and month > end) or (start is not None and _next_month(datetime(month.year, month.month, 1)).date() <= start):
+            continue
+        files = sorted(glob.glob(os.path.join(month_dir, "part-*.arrow")))
+        if files:
+            partitions.append((month, files))
+    return sorted(partitions, reverse=True)
+
+def _read_part(path: str, fields: Sequence[str]) -> pa.Table:
+    # Mapped buffers stay valid for as long as the table references them
+    table = pa.ipc.open_file(pa.memory_map(path, 'r')).read_all()
+    if 'user_id' in fields and 'user_id' not in table.column_names:
+        # Parts archived before expenses had owners belong to the default user, as migrated rows do
+        table = table.append_column('user_id', pa.array([DEFAULT_USER_ID] * table.num_rows, pa.string()))
+    return table.select(list(fields))
+
+def _archived_ids(shard: int, year: int, month: int) -> pa.Array:
+    files = glob.glob(os.path.join(_month_dir(shard, year, month), "part-*.arrow"))
+    return pa.concat_arrays([_read_part(path, ['id'])['id'].combine_chunks() for path in files]) if files else pa.array([], pa.int64())
+
+def _read_month(files: Sequence[str], fields: Sequence[str]) -> pa.Table:
+    tables = [_read_part(path, fields) for path in files]
+    return pa.concat_tables(tables) if len(tables) > 1 else tables[0]
+
+def archived_page(
+    shard: int,
+    user_id: str,
+    fields: Sequence[str],
+    limit: int,
+    cursor: Optional[Tuple[datetime, int]] = None,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    category: Optional[str] = None
+) -> Tuple[List[tuple], bool]:
+    """A user's newest-first archived rows (as tuples of `fields`) after a (date, id) cursor; True if more remain"""
+    columns = list(dict.fromkeys([*fields, 'id', 'date', 'category', 'user_id']))
+    if cursor is not None:
+        end = min(end, cursor[0].date()) if end is not None else cursor[0].date()
+    
+    rows: List[tuple] = []
+    for _, files in _partitions(shard, start, end):
+        table = _read_month(files, columns)
+        dates = table['date']
+        
+        mask = pc.and_(pc.is_valid(dates), pc.equal(table['user_id'], user_id))
+        if start is not None:
+            mask = pc.and_(mask, pc.greater_equal(dates, pa.scalar(datetime.combine(start, datetime.min.time()), pa.timestamp('us'))))
+        if end is not None:
+            mask = pc.and_(mask, pc.less(dates, pa.scalar(datetime.combine(end + timedelta(days=1), datetime.min.time()), pa.timestamp('us'))))
+        if category is not None:
+            mask = pc.and_(mask, pc.equal(table['category'], category))
+        if cursor is not None:
+            cursor_date = pa.scalar(cursor[0], pa.timestamp('us'))
+            mask = pc.and_(mask, pc.or_(
+                pc.less(dates, cursor_date),
+                pc.and_(pc.equal(dates, cursor_date), pc.less(table['id'], cursor[1]))
+            ))
+        
+        table = table.filter(mask)
+        # Only the rows this page can still use are converted to Python objects
+        table = table.take(pc.sort_indices(table, [('date', 'descending'), ('id', 'descending')])[:limit + 1 - len(rows)])
+        rows.extend(zip(*(table[field].to_pylist() for field in fields)))
+        if len(rows) > limit:
+            return rows[:limit], True
+    
+    return rows, False
+
+def archived_rows(shard: int, fields: Sequence[str]) -> Iterator[tuple]:
+    """Every archived row of a shard (as tuples of `fields`) in (date, id) order, one month in memory at a time"""
+    for _, files in reversed(_partitions(shard, None, None)):
+        table = _read_month(files, list(dict.fromkeys([*fields, 'date', 'id'])))
+        table = table.take(pc.sort_indices(table, [('date', 'ascending'), ('id', 'ascending')]))
+        yield from zip(*(table[field].to_pylist() for field in fields))
+
+def archived_daily_totals(
+    shard: int,
+    since: Optional[date] = None,
+    live_ids: Callable[[date], Iterable[int]] = lambda month: ()
+) -> Iterator[tuple]:
+    """(user_id, day, category, total, count, min, max) per archived day and category, one month at a time.
+    
+    Ids that live_ids(month) returns are still in the expenses table, left there by a run that
+    crashed before its delete, and are skipped so they count once.
+    """
+    for month, files in reversed(_partitions(shard, since, None)):
+        table = _read_month(files, ['id', 'user_id', 'date', 'amount', 'category'])
+        mask = pc.invert(pc.is_in(table['id'], value_set=pa.array(list(live_ids(month)), pa.int64())))
+        if since is not None:
+            mask = pc.and_(mask, pc.greater_equal(table['date'], pa.scalar(datetime.combine(since, datetime.min.time()), pa.timestamp('us'))))
+        table = table.filter(mask)
+        days = pa.table({
+            'user_id': table['user_id'],
+            'day': pc.cast(table['date'], pa.date32()),
+            'category': pc.coalesce(table['category'], 'other'),
+            'amount': table['amount']
+        }).group_by(['user_id', 'day', 'category']).aggregate([
+            ('amount', 'sum'), ('amount', 'count'), ('amount', 'min'), ('amount', 'max')
+        ])
+        columns = ('user_id', 'day', 'category', 'amount_sum', 'amount_count', 'amount_min', 'amount_max')
+        yield from zip(*(days[column].to_pylist() for column in columns))
+
+def archive_stats() -> Dict:
+    files = glob.glob(os.path.join(EXPENSE_ARCHIVE_DIR, "shard=*", "year=*", "month=*", "part-*.arrow"))
+    return {'partitions': len(files), 'bytes': sum(os.path.getsize(path) for path in files)}
+
+if __name__ == "__main__":
+    from database import Base, shards
+    
+    parser = argparse.ArgumentParser(description="Move old expenses into Arrow partitions")
+    parser.add_argument("--horizon-days", type=int, default=ARCHIVE_HORIZON_DAYS, help="keep this many days in SQLite")
+    parser.add_argument("--vacuum", action="store_true", help="shrink the database files afterwards")
+    args = parser.parse_args()
+    
+    if args.horizon_days < MIN_HORIZON_DAYS:
+        parser.error(f"--horizon-days must be at least {MIN_HORIZON_DAYS}")
+    
+    for shard in shards:
+        Base.metadata.create_all(bind=shard.engine)
+        db = shard.SessionLocal()
+        try:
+            print(f"Archived {archive_expenses(db, shard.shard_id, args.horizon_days)} expenses from {shard.url}")
+        finally:
+            db.close()
+        if args.vacuum:
+            # Deleted rows only free pages inside the file; VACUUM returns them to the filesystem
+            with shard.engine.connect() as connection:
+                connection.execution_options(isolation_level="AUTOCOMMIT").execute(text("VACUUM"))
@@ -0,0 +1,223 @@
+"""Microbenchmarks for the AI engine on seeded synthetic expenses.
+
+Times ExpenseCategorizer.categorize / categorize_batch, get_category_insights
+and SpendingPredictor.predict_next_month across data sizes, reporting
+throughput, p50/p99 latency and peak traced memory. Results are written as
+JSON so runs from different commits can be compared. From the backend
+directory:
+    
+    python -m benchmarks.bench_ai_engine --sizes 1000 10000 100000 1000000
+    python -m benchmarks.bench_ai_engine --compare benchmarks/results/ai_engine-<commit>.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+import numpy as np
+import pandas as pd
+import sklearn
+from ai_engine.categorizer import ExpenseCategorizer
+from ai_engine.predictor import SpendingPredictor
+from benchmarks.synthetic import generate_expenses
+
+DEFAULT_SIZES = [1000, 10000, 100000, 1000000]
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+# Per-call categorizer latency is measured on at most this many descriptions per size
+CATEGORIZE_SAMPLE = 5000
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def _summary(latencies: List[float], units: int) -> Dict:
+    """Latency percentiles in ms and throughput in units per second, from the median run"""
+    latencies = np.array(latencies)
+    p50 = float(np.percentile(latencies, 50))
+    return {
+        'runs': len(latencies),
+        'p50_ms': p50 * 1000,
+        'p99_ms': float(np.percentile(latencies, 99)) * 1000,
+        'mean_ms': float(latencies.mean()) * 1000,
+        'throughput_per_s': units / p50 if p50 > 0 else None
+    }
+
+def _peak_memory(fn: Callable) -> int:
+    """Peak Python/NumPy allocation during one call; measured apart from timings because tracing slows them"""
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+def _time_runs(fn: Callable, repeats: int) -> List[float]:
+    latencies = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+def bench_categorize(categorizer: ExpenseCategorizer, expenses: List[Dict]) -> Dict:
+    """Per-call latency of categorize over a sample, starting from a cold merchant cache"""
+    descriptions = [expense['description'] for expense in expenses[:CATEGORIZE_SAMPLE]]
+    
+    categorizer.cache.clear()
+    latencies = []
+    for description in descriptions:
+        started = time.perf_counter()
+        categorizer.categorize(description)
+        latencies.append(time.perf_counter() - started)
+    
+    result = _summary(latencies, 1)
+    result['throughput_per_s'] = len(latencies) / sum(latencies)
+    
+    categorizer.cache.clear()
+    result['peak_memory_bytes'] = _peak_memory(lambda: [categorizer.categorize(d) for d in descriptions[:1000]])
+    return result
+
+def bench_categorize_batch(categorizer: ExpenseCategorizer, expenses: List[Dict], repeats: int) -> Dict:
+    descriptions = [expense['description'] for expense in expenses]
+    
+    def run():
+        categorizer.cache.clear()
+        categorizer.categorize_batch(descriptions)
+    
+    result = _summary(_time_runs(run, repeats), len(descriptions))
+    result['peak_memory_bytes'] = _peak_memory(run)
+    return result
+
+def bench_insights(categorizer: ExpenseCategorizer, expenses: List[Dict], repeats: int) -> Dict:
+    result = _summary(_time_runs(lambda: categorizer.get_category_insights(expenses), repeats), len(expenses))
+    result['peak_memory_bytes'] = _peak_memory(lambda: categorizer.get_category_insights(expenses))
+    return result
+
+def bench_predict(predictor: SpendingPredictor, expenses: List[Dict], repeats: int) -> Dict:
+    result = _summary(_time_runs(lambda: predictor.predict_next_month(expenses), repeats), len(expenses))
+    result['method'] = predictor.predict_next_month(expenses)['method']
+    result['peak_memory_bytes'] = _peak_memory(lambda: predictor.predict_next_month(expenses))
+    return result
+
+def run_benchmarks(args) -> Dict:
+    categorizer = ExpenseCategorizer()
+    predictor = SpendingPredictor()
+    results = []
+    
+    print(f"{'function':<24} {'rows':>9} {'p50 ms':>10} {'p99 ms':>10} {'per s':>12} {'peak MiB':>9}")
+    for size in args.sizes:
+        expenses = list(generate_expenses(
+            size,
+            users=args.users,
+            merchants=args.merchants,
+            categories=args.categories,
+            days=args.days,
+            transactions_per_day=args.transactions_per_day,
+            seed=args.seed
+        ))
+        
+        for name, measure in [
+            ('categorize', lambda: bench_categorize(categorizer, expenses)),
+            ('categorize_batch', lambda: bench_categorize_batch(categorizer, expenses, args.repeat)),
+            ('get_category_insights', lambda: bench_insights(categorizer, expenses, args.repeat)),
+            ('predict_next_month', lambda: bench_predict(predictor, expenses, args.repeat))
+        ]:
+            result = {'function': name, 'rows': size, **measure()}
+            results.append(result)
+            print(
+                f"{name:<24} {size:>9} {result['p50_ms']:>10.3f} {result['p99_ms']:>10.3f} "
+                f"{result['throughput_per_s'] or 0:>12.0f} {result['peak_memory_bytes'] / 2 ** 20:>9.1f}"
+            )
+        
+        del expenses
+    
+    return {
+        'benchmark': 'ai_engine',
+        'created_at': datetime.now().isoformat(),
+        'commit': _git_commit(),
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'sklearn': sklearn.__version__
+        },
+        'config': {
+            'sizes': args.sizes,
+            'users': args.users,
+            'merchants': args.merchants,
+            'categories': args.categories,
+            'days': args.days,
+            'transactions_per_day': args.transactions_per_day,
+            'seed': args.seed,
+            'repeat': args.repeat,
+            'categorize_sample': CATEGORIZE_SAMPLE
+        },
+        'results': results
+    }
+
+def compare(current: Dict, baseline: Dict, max_regression: Optional[float]) -> bool:
+    """Print p50 changes against a baseline run; False if any exceeds max_regression"""
+    previous = {(r['function'], r['rows']): r for r in baseline['results']}
+    ok = True
+    
+    print(f"\nCompared with {baseline.get('commit') or baseline['created_at']}:")
+    print(f"{'function':<24} {'rows':>9} {'base ms':>10} {'now ms':>10} {'change':>8}")
+    for result in current['results']:
+        before = previous.get((result['function'], result['rows']))
+        if before is None:
+            continue
+        change = result['p50_ms'] / before['p50_ms'] - 1 if before['p50_ms'] else 0.0
+        regressed = max_regression is not None and change > max_regression
+        ok = ok and not regressed
+        print(
+            f"{result['function']:<24} {result['rows']:>9} {before['p50_ms']:>10.3f} "
+            f"{result['p50_ms']:>10.3f} {change:>+7.1%}{'  REGRESSION' if regressed else ''}"
+        )
+    
+    return ok
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the AI engine on synthetic expenses")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="row counts to benchmark")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--merchants", type=int, default=200)
+    parser.add_argument("--categories", type=int, default=8)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--transactions-per-day", type=float, default=None, help="per user; defaults to filling each size")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per whole-dataset function")
+    parser.add_argument("--output", help="result JSON path (default: benchmarks/results/ai_engine-<commit>.json)")
+    parser.add_argument("--compare", help="baseline result JSON to compare against")
+    parser.add_argument("--max-regression", type=float, default=None, help="fail if a p50 slows by more than this fraction")
+    args = parser.parse_args()
+    
+    report = run_benchmarks(args)
+    
+    label = report['commit'] or datetime.now().strftime('%Y%m%d%H%M%S')
+    output = args.output or os.path.join(RESULTS_DIR, f"ai_engine-{label}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nWrote {output}")
+    
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if not compare(report, baseline, args.max_regression):
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
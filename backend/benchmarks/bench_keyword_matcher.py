@@ -0,0 +1,68 @@
+"""Microbenchmark: keyword fallback cost versus dictionary size.
+
+Compares the Aho-Corasick KeywordMatcher with the previous per-keyword
+substring loop. Run from the backend directory:
+    
+    python -m benchmarks.bench_keyword_matcher
+"""
+import random
+import string
+import time
+from typing import Dict, List
+from ai_engine.keyword_matcher import KeywordMatcher
+
+CATEGORY_COUNT = 8
+DESCRIPTION_COUNT = 2000
+DICTIONARY_SIZES = [10, 100, 1000, 10000]
+
+def _random_word(rng: random.Random) -> str:
+    return ''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(4, 10)))
+
+def _make_categories(rng: random.Random, keywords_per_category: int) -> Dict[str, List[str]]:
+    return {
+        f"category_{i}": [_random_word(rng) for _ in range(keywords_per_category)]
+        for i in range(CATEGORY_COUNT)
+    }
+
+def _make_descriptions(rng: random.Random, categories: Dict[str, List[str]]) -> List[str]:
+    keywords = [k for words in categories.values() for k in words]
+    descriptions = []
+    for _ in range(DESCRIPTION_COUNT):
+        words = [_random_word(rng) for _ in range(rng.randint(2, 5))]
+        if rng.random() < 0.5:
+            words.insert(rng.randint(0, len(words)), rng.choice(keywords))
+        descriptions.append(' '.join(words))
+    return descriptions
+
+def _naive_categorize(categories: Dict[str, List[str]], description: str) -> str:
+    for category, keywords in categories.items():
+        for keyword in keywords:
+            if keyword in description:
+                return category
+    return 'other'
+
+def _time(fn, descriptions: List[str]) -> float:
+    started = time.perf_counter()
+    for description in descriptions:
+        fn(description)
+    return (time.perf_counter() - started) / len(descriptions) * 1e6
+
+def main():
+    rng = random.Random(42)
+    
+    print(f"{'keywords':>10} {'build ms':>10} {'naive us/op':>12} {'automaton us/op':>16} {'speedup':>8}")
+    for per_category in DICTIONARY_SIZES:
+        categories = _make_categories(rng, per_category)
+        descriptions = _make_descriptions(rng, categories)
+        
+        started = time.perf_counter()
+        matcher = KeywordMatcher.from_categories(categories)
+        build_ms = (time.perf_counter() - started) * 1000
+        
+        naive_us = _time(lambda d: _naive_categorize(categories, d), descriptions)
+        automaton_us = _time(matcher.scores, descriptions)
+        
+        print(f"{matcher.keyword_count:>10} {build_ms:>10.1f} {naive_us:>12.1f} {automaton_us:>16.1f} {naive_us / automaton_us:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
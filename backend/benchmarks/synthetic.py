@@ -0,0 +1,92 @@
+"""Seeded synthetic expense generator for benchmarks.
+
+The same seed and parameters always produce the same rows, so timings
+from different commits are measured on identical data.
+"""
+import random
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterator, List, Optional
+from ai_engine.categorizer import ExpenseCategorizer
+
+# Typical spend per transaction; amounts are log-normal around these
+CATEGORY_MEDIAN_AMOUNTS = {
+    'food': 18.0,
+    'transport': 22.0,
+    'shopping': 45.0,
+    'entertainment': 30.0,
+    'utilities': 80.0,
+    'healthcare': 60.0,
+    'education': 120.0,
+    'other': 35.0
+}
+
+MERCHANT_SUFFIXES = ['', 'store', 'market', 'co', 'online', 'express', 'center', 'ltd']
+
+def make_categories(count: int) -> Dict[str, List[str]]:
+    """The categorizer's categories and keywords, padded with keyword-less extras up to count"""
+    categories = dict(list(ExpenseCategorizer(train=False).categories.items())[:count])
+    for i in range(len(categories), count):
+        categories[f"category_{i}"] = []
+    return categories
+
+def make_merchants(rng: random.Random, count: int, categories: Dict[str, List[str]]) -> List[Dict]:
+    """Merchants with a category, a statement-style name and a median amount"""
+    names = list(categories)
+    merchants = []
+    for i in range(count):
+        category = names[i % len(names)]
+        keyword = rng.choice(categories[category]) if categories[category] else f"merchant{i}"
+        suffix = rng.choice(MERCHANT_SUFFIXES)
+        merchants.append({
+            'name': f"{keyword} {suffix}".strip().upper(),
+            'category': category,
+            'median_amount': CATEGORY_MEDIAN_AMOUNTS.get(category, 35.0)
+        })
+    return merchants
+
+def generate_expenses(
+    rows: int,
+    users: int = 10,
+    merchants: int = 200,
+    categories: int = 8,
+    days: int = 90,
+    transactions_per_day: Optional[float] = None,
+    seed: int = 42,
+    end_date: Optional[date] = None
+) -> Iterator[Dict]:
+    """Yield up to `rows` expenses spread over `days` days and `users` users, newest day last.
+    
+    transactions_per_day is per user and defaults to whatever fills `rows`;
+    if it is too low to fill them, the day range is cycled again.
+    """
+    if rows <= 0:
+        return
+    
+    rng = random.Random(seed)
+    category_keywords = make_categories(categories)
+    merchant_list = make_merchants(rng, merchants, category_keywords)
+    end_date = end_date or date(2024, 6, 30)
+    start = datetime.combine(end_date - timedelta(days=days - 1), datetime.min.time())
+    per_day = transactions_per_day or rows / (users * days)
+    if per_day <= 0:
+        raise ValueError("transactions_per_day must be positive")
+    
+    produced = 0
+    while produced < rows:
+        for day in range(days):
+            for user in range(users):
+                # Stochastic rounding keeps the average daily count at the configured rate
+                count = int(per_day) + (rng.random() < per_day - int(per_day))
+                for _ in range(count):
+                    merchant = rng.choice(merchant_list)
+                    when = start + timedelta(days=day, seconds=rng.randrange(86400))
+                    yield {
+                        'user_id': f"user_{user}",
+                        'description': f"{merchant['name']} #{rng.randrange(1000, 9999)} {when:%m/%d}",
+                        'amount': round(rng.lognormvariate(0, 0.6) * merchant['median_amount'], 2),
+                        'category': merchant['category'],
+                        'date': when.isoformat()
+                    }
+                    produced += 1
+                    if produced >= rows:
+                        return
@@ -0,0 +1,84 @@
+"""Budget spend kept current by applying expense deltas in the writing transaction."""
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from typing import Dict, Iterable, Optional, Tuple
+from datetime import datetime
+from models.budget import DBBudget
+from models.expense import DBExpense
+from database import session_user
+import result_cache
+
+def _month_bounds(month: str) -> Tuple[datetime, datetime]:
+    start = datetime.strptime(month, '%Y-%m')
+    end = start.replace(year=start.year + 1, month=1) if start.month == 12 else start.replace(month=start.month + 1)
+    return start, end
+
+def _apply_deltas(db: Session, deltas: Dict[Tuple[str, str, str], float]):
+    for (user_id, category, month), delta in deltas.items():
+        db.query(DBBudget).filter(
+            DBBudget.user_id == user_id,
+            DBBudget.category == category,
+            DBBudget.month == month
+        ).update(
+            {DBBudget.current_spent: func.coalesce(DBBudget.current_spent, 0.0) + delta},
+            synchronize_session=False
+        )
+
+def record_expenses(db: Session, expenses: Iterable[DBExpense]):
+    """Add new expenses to the spend of their category's budget for that month"""
+    deltas = {}
+    for expense in expenses:
+        if expense.category:
+            key = (expense.user_id, expense.category, expense.date.strftime('%Y-%m'))
+            deltas[key] = deltas.get(key, 0.0) + expense.amount
+    _apply_deltas(db, deltas)
+
+def remove_expense(db: Session, expense: DBExpense, category: Optional[str] = None):
+    """Take an expense (under its current or given old category) off its budget"""
+    category = category or expense.category
+    if category:
+        _apply_deltas(db, {(expense.user_id, category, expense.date.strftime('%Y-%m')): -expense.amount})
+
+def change_category(db: Session, expense: DBExpense, old_category: Optional[str]):
+    """Move an expense's amount between budgets after its category was changed"""
+    if old_category == expense.category:
+        return
+    remove_expense(db, expense, category=old_category)
+    record_expenses(db, [expense])
+
+def month_spending(db: Session, month: str, category: Optional[str] = None) -> Dict[str, float]:
+    """The session user's spending per category for a 'YYYY-MM' month, in a single aggregate query"""
+    start, end = _month_bounds(month)
+    query = db.query(DBExpense.category, func.sum(DBExpense.amount)).filter(
+        DBExpense.user_id == session_user(db),
+        DBExpense.date >= start,
+        DBExpense.date < end
+    )
+    if category is not None:
+        query = query.filter(DBExpense.category == category)
+    return {row[0]: row[1] for row in query.group_by(DBExpense.category).all()}
+
+def rebuild_budget_spend(db: Session, month: str, user_id: Optional[str] = None) -> int:
+    """Recompute current_spent for a month's budgets, of one user or all of them; returns budgets updated"""
+    start, end = _month_bounds(month)
+    spending_query = db.query(DBExpense.user_id, DBExpense.category, func.sum(DBExpense.amount)).filter(
+        DBExpense.date >= start,
+        DBExpense.date < end
+    )
+    budget_query = db.query(DBBudget).filter(DBBudget.month == month)
+    if user_id is not None:
+        spending_query = spending_query.filter(DBExpense.user_id == user_id)
+        budget_query = budget_query.filter(DBBudget.user_id == user_id)
+    
+    spending = {(row[0], row[1]): row[2] for row in spending_query.group_by(DBExpense.user_id, DBExpense.category).all()}
+    budgets = budget_query.all()
+    changed = set()
+    for budget in budgets:
+        spent = spending.get((budget.user_id, budget.category), 0.0)
+        if budget.current_spent != spent:
+            budget.current_spent = spent
+            changed.add(budget.user_id)
+    # Startup runs this every time; budgets already in step keep their ETags
+    result_cache.mark_data_changed(db, result_cache.BUDGETS, users=changed)
+    db.commit()
+    return len(budgets)
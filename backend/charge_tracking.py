@@ -0,0 +1,152 @@
+"""Per-merchant charge statistics and alerts, maintained in the same transaction as expense writes.
+
+Each new expense updates its user's merchant row in O(1) and may record an alert
+(an unusual amount, or a merchant that has just become recurring). Like the
+rollups, the statistics outlive archived expenses. Rebuild from the archive
+partitions and the expenses table, which also replays historical alerts, with:
+
+    python -m charge_tracking
+"""
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from typing import Dict, Iterable, List, Optional, Tuple
+from datetime import date
+from ai_engine.charge_detector import ChargeDetector, MerchantChargeState, merchant_key
+from models.charge_stats import DBChargeAlert, DBMerchantStats
+from models.expense import DBExpense
+from database import session_user
+import argparse
+import heapq
+import archive
+
+LOAD_CHUNK_ROWS = 50000
+
+REBUILD_FIELDS = ('id', 'user_id', 'description', 'amount', 'category', 'date')
+
+detector = ChargeDetector()
+
+def _alert(user_id: str, expense_id: int, merchant: str, day: date, amount: float, alert: Dict) -> Dict:
+    return {'user_id': user_id, 'expense_id': expense_id, 'merchant': merchant, 'date': day, 'amount': amount, **alert}
+
+def _set_category(state, day: date, category: Optional[str]):
+    # The merchant takes the category of its latest charge, as a date-ordered rebuild leaves it
+    if state.last_date is None or day >= state.last_date:
+        state.category = category
+
+def record_expenses(db: Session, expenses: Iterable[DBExpense]):
+    """Fold new expenses into their merchants' statistics; call after flush, before commit"""
+    expenses = sorted(expenses, key=lambda expense: (expense.date, expense.id))
+    charges = [(expense, merchant_key(expense.description)) for expense in expenses]
+    # Descriptions that name no merchant would pool unrelated charges into one
+    charges = [(expense, merchant) for expense, merchant in charges if merchant is not None]
+    if not charges:
+        return
+    
+    # One query for the batch; the filter may match a few extra (user, merchant) pairs, which are unused
+    states: Dict[Tuple[str, str], DBMerchantStats] = {
+        (state.user_id, state.merchant): state
+        for state in db.query(DBMerchantStats).filter(
+            DBMerchantStats.user_id.in_({expense.user_id for expense, _ in charges}),
+            DBMerchantStats.merchant.in_({merchant for _, merchant in charges})
+        )
+    }
+    alerts = []
+    for expense, merchant in charges:
+        user_id = expense.user_id
+        state = states.get((user_id, merchant))
+        if state is None:
+            state = states[user_id, merchant] = DBMerchantStats(**vars(MerchantChargeState(user_id, merchant)))
+            db.add(state)
+        day = expense.date.date()
+        _set_category(state, day, expense.category)
+        alerts.extend(
+            _alert(user_id, expense.id, merchant, day, expense.amount, alert)
+            for alert in detector.observe(state, day, expense.amount)
+        )
+    
+    if alerts:
+        db.add_all(DBChargeAlert(**alert) for alert in alerts)
+
+def remove_expense(db: Session, expense: DBExpense):
+    """Take a deleted expense out of its merchant's amount statistics and drop its alerts"""
+    alerts = db.query(DBChargeAlert).filter(DBChargeAlert.expense_id == expense.id)
+    key = merchant_key(expense.description)
+    state = db.get(DBMerchantStats, (expense.user_id, key)) if key else None
+    if state is not None:
+        flagged = alerts.filter(DBChargeAlert.kind == 'amount_anomaly').first() is not None
+        detector.forget(state, expense.amount, flagged=flagged)
+    alerts.delete(synchronize_session=False)
+
+def change_category(db: Session, expense: DBExpense):
+    """Carry a changed category over to the merchant when the expense is its latest charge"""
+    key = merchant_key(expense.description)
+    state = db.get(DBMerchantStats, (expense.user_id, key)) if key else None
+    if state is not None:
+        _set_category(state, expense.date.date(), expense.category)
+
+def _charges(db: Session, shard: int) -> Iterable[tuple]:
+    """Archived and live expenses as REBUILD_FIELDS tuples, merged in (date, id) order"""
+    result = db.execute(select(*(getattr(DBExpense, field) for field in REBUILD_FIELDS)).order_by(DBExpense.date, DBExpense.id))
+    live = (row for rows in result.partitions(LOAD_CHUNK_ROWS) for row in rows)
+    previous = None
+    for row in heapq.merge(archive.archived_rows(shard, REBUILD_FIELDS), live, key=lambda row: (row[5], row[0])):
+        # A run that crashed between writing a part and deleting its rows leaves them in both
+        if (row[5], row[0]) != previous:
+            previous = (row[5], row[0])
+            yield row
+
+def rebuild_charge_stats(db: Session, shard: int = 0) -> int:
+    """Recompute every user's merchant statistics and alerts in one date-ordered pass over all expenses; returns merchants"""
+    states: Dict[Tuple[str, str], MerchantChargeState] = {}
+    alerts = []
+    for expense_id, user_id, description, amount, category, expense_date in _charges(db, shard):
+        merchant = merchant_key(description)
+        if merchant is None:
+            continue
+        state = states.get((user_id, merchant))
+        if state is None:
+            state = states[user_id, merchant] = MerchantChargeState(user_id, merchant)
+        day = expense_date.date()
+        _set_category(state, day, category)
+        alerts.extend(_alert(user_id, expense_id, merchant, day, amount, alert) for alert in detector.observe(state, day, amount))
+    
+    db.query(DBChargeAlert).delete(synchronize_session=False)
+    db.query(DBMerchantStats).delete(synchronize_session=False)
+    db.bulk_insert_mappings(DBMerchantStats, [vars(state) for state in states.values()])
+    db.bulk_insert_mappings(DBChargeAlert, alerts)
+    db.commit()
+    
+    return len(states)
+
+def charge_stats_missing(db: Session) -> bool:
+    """True when expenses exist but merchant statistics were never built"""
+    has_expenses = db.query(DBExpense.id).first() is not None
+    has_stats = db.query(DBMerchantStats.merchant).first() is not None
+    return has_expenses and not has_stats
+
+def recurring_merchants(db: Session) -> List[DBMerchantStats]:
+    return db.query(DBMerchantStats).filter(
+        DBMerchantStats.user_id == session_user(db),
+        DBMerchantStats.recurring.is_(True)
+    ).all()
+
+def recent_alerts(db: Session, since: date, kind: Optional[str] = None, limit: int = 100) -> List[DBChargeAlert]:
+    """The session user's alerts for charges dated from a given day onwards, newest first"""
+    query = db.query(DBChargeAlert).filter(DBChargeAlert.user_id == session_user(db), DBChargeAlert.date >= since)
+    if kind is not None:
+        query = query.filter(DBChargeAlert.kind == kind)
+    return query.order_by(DBChargeAlert.date.desc(), DBChargeAlert.id.desc()).limit(limit).all()
+
+if __name__ == "__main__":
+    from database import Base, shards
+    
+    parser = argparse.ArgumentParser(description="Rebuild per-merchant charge statistics and alerts from expenses")
+    parser.parse_args()
+    
+    for shard in shards:
+        Base.metadata.create_all(bind=shard.engine)
+        db = shard.SessionLocal()
+        try:
+            print(f"Rebuilt charge statistics for {rebuild_charge_stats(db, shard.shard_id)} merchants in {shard.url}")
+        finally:
+            db.close()
@@ -1,20 +1,102 @@
-from sqlalchemy import create_engine
+from fastapi import Header, HTTPException
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from typing import List, Optional
+import metrics
 import os
+import zlib
 
 # Database configuration
 DATABASE_URL = "sqlite:///./ai_finance.db"
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Users are spread over DB_SHARD_COUNT SQLite files by a stable hash of
+# their id; one shard keeps the original single-file layout. Changing the
+# count moves users between shards, so existing data must be migrated
+DB_SHARD_COUNT = int(os.getenv("DB_SHARD_COUNT", "1"))
+
+# WAL lets readers run alongside the single writer. SQLITE_SYNCHRONOUS=FULL
+# fsyncs every commit, so acknowledged writes survive power loss; NORMAL
+# is faster but may lose the last commits on power loss (never corrupts)
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "FULL")
+
+def _configure_sqlite(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+    cursor.close()
+
+def shard_url(shard: int) -> str:
+    if DB_SHARD_COUNT == 1:
+        return DATABASE_URL
+    return f"sqlite:///./ai_finance_shard{shard}.db"
+
+class Shard:
+    """Engines and session factories for one shard database; each engine has its own pool"""
+    
+    def __init__(self, shard_id: int):
+        self.shard_id = shard_id
+        self.url = shard_url(shard_id)
+        
+        # Sessions carry their shard so caches and derived state stay per shard
+        self.engine = create_engine(self.url, connect_args={"check_same_thread": False})
+        self.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=self.engine, info={'shard': shard_id})
+        
+        # Async path for the API routes; objects stay loaded after commit because
+        # lazy attribute loads are not possible outside the event loop's greenlet
+        self.async_engine = create_async_engine(self.url.replace("sqlite://", "sqlite+aiosqlite://", 1))
+        self.AsyncSessionLocal = async_sessionmaker(
+            self.async_engine, autoflush=False, expire_on_commit=False, info={'shard': shard_id}
+        )
+        
+        for sync_engine in (self.engine, self.async_engine.sync_engine):
+            event.listen(sync_engine, "connect", _configure_sqlite)
+            metrics.instrument_engine(sync_engine)
+
+shards: List[Shard] = [Shard(shard_id) for shard_id in range(DB_SHARD_COUNT)]
+
+# The first shard doubles as the default database for unsharded callers
+engine = shards[0].engine
+SessionLocal = shards[0].SessionLocal
+async_engine = shards[0].async_engine
+AsyncSessionLocal = shards[0].AsyncSessionLocal
 
 Base = declarative_base()
 
+# Rows written without an X-User-Id header, possible only while there is a single shard
+DEFAULT_USER_ID = os.getenv("DEFAULT_USER_ID", "default")
+
+def request_user(x_user_id: Optional[str]) -> str:
+    """The caller's user id; the header is required once users are spread over several shards"""
+    if x_user_id:
+        return x_user_id
+    if DB_SHARD_COUNT > 1:
+        raise HTTPException(status_code=400, detail="X-User-Id header is required")
+    return DEFAULT_USER_ID
+
+def session_user(db) -> str:
+    """The user a request session is scoped to; every query and derived-state key filters on it"""
+    return db.info.get('user_id', DEFAULT_USER_ID)
+
+def shard_for_user(user_id: Optional[str]) -> Shard:
+    """Route a user id to its shard"""
+    if not user_id or DB_SHARD_COUNT == 1:
+        return shards[0]
+    return shards[zlib.crc32(user_id.encode()) % DB_SHARD_COUNT]
+
 # Dependency to get database session
-def get_db():
-    db = SessionLocal()
+def get_db(x_user_id: Optional[str] = Header(None)):
+    user_id = request_user(x_user_id)
+    db = shard_for_user(user_id).SessionLocal(info={'user_id': user_id})
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+# Dependency to get an async database session
+async def get_async_db(x_user_id: Optional[str] = Header(None)):
+    user_id = request_user(x_user_id)
+    async with shard_for_user(user_id).AsyncSessionLocal(info={'user_id': user_id}) as db:
+        yield db
@@ -0,0 +1,43 @@
+"""Derived state that must change with every expense write.
+
+Route handlers call these after flushing their changes and before
+committing, so rollups and budgets commit atomically with the expense
+and cached analytics are invalidated once the transaction commits.
+"""
+from sqlalchemy.orm import Session
+from typing import Iterable, Optional
+from models.expense import DBExpense
+import analytics_store
+import budget_tracking
+import charge_tracking
+import forecast_state
+import result_cache
+import rollups
+
+def expenses_created(db: Session, expenses: Iterable[DBExpense]):
+    expenses = list(expenses)
+    rollups.record_expenses(db, expenses)
+    budget_tracking.record_expenses(db, expenses)
+    charge_tracking.record_expenses(db, expenses)
+    for expense in expenses:
+        forecast_state.stage_expense_change(db, expense, 1)
+    analytics_store.stage_expenses_added(db, expenses)
+    result_cache.mark_data_changed(db, result_cache.EXPENSES, users={expense.user_id for expense in expenses})
+
+def expense_deleted(db: Session, expense: DBExpense):
+    rollups.remove_expense(db, expense)
+    budget_tracking.remove_expense(db, expense)
+    charge_tracking.remove_expense(db, expense)
+    forecast_state.stage_expense_change(db, expense, -1)
+    analytics_store.stage_expense_removed(db, expense)
+    result_cache.mark_data_changed(db, result_cache.EXPENSES, users=[expense.user_id])
+
+def expense_category_changed(db: Session, expense: DBExpense, old_category: Optional[str]):
+    rollups.change_category(db, expense, old_category)
+    budget_tracking.change_category(db, expense, old_category)
+    if old_category != expense.category:
+        charge_tracking.change_category(db, expense)
+        forecast_state.stage_expense_change(db, expense, -1, category=old_category or 'other')
+        forecast_state.stage_expense_change(db, expense, 1)
+        analytics_store.stage_category_changed(db, expense)
+    result_cache.mark_data_changed(db, result_cache.EXPENSES, users=[expense.user_id])
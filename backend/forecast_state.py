@@ -0,0 +1,78 @@
+"""Process-wide incremental forecaster kept in step with committed expense writes.
+
+Enabled with PREDICTOR_MODE=incremental. Expense changes are staged on
+the session and applied only after commit; the state is reloaded from
+the daily rollups periodically to pick up writes from other workers.
+At most FORECAST_MAX_PREDICTORS users are kept in memory.
+"""
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from typing import Dict, Optional, Tuple
+from datetime import date, timedelta
+from ai_engine.incremental_predictor import IncrementalSpendingPredictor
+from models.expense import DBExpense
+from database import session_user
+import os
+import threading
+import time
+import rollups
+
+PREDICTOR_MODE = os.getenv("PREDICTOR_MODE", "refit")
+FORECAST_RESYNC_INTERVAL = float(os.getenv("FORECAST_RESYNC_INTERVAL", "300"))
+FORECAST_MAX_PREDICTORS = int(os.getenv("FORECAST_MAX_PREDICTORS", "1000"))
+FORECAST_WINDOWS = (30, 60)
+
+# One forecaster per (shard, user id), created on the user's first forecast
+_predictors: Dict[Tuple[int, str], IncrementalSpendingPredictor] = {}
+_loaded_at: Dict[Tuple[int, str], float] = {}
+_load_lock = threading.Lock()
+
+def _user_predictor(key: Tuple[int, str]) -> IncrementalSpendingPredictor:
+    predictor = _predictors.get(key)
+    if predictor is None:
+        with _load_lock:
+            if key not in _predictors and len(_predictors) >= FORECAST_MAX_PREDICTORS and _loaded_at:
+                # Evict the forecaster loaded longest ago; that user reloads from the rollups on their next forecast
+                oldest = min(_loaded_at, key=_loaded_at.get)
+                _predictors.pop(oldest, None)
+                _loaded_at.pop(oldest, None)
+            predictor = _predictors.setdefault(key, IncrementalSpendingPredictor(windows=FORECAST_WINDOWS))
+    return predictor
+
+def incremental_enabled() -> bool:
+    return PREDICTOR_MODE == "incremental"
+
+def stage_expense_change(db: Session, expense: DBExpense, sign: int, category: Optional[str] = None):
+    """Queue an expense's effect on the forecast series until the transaction commits"""
+    if incremental_enabled():
+        db.info.setdefault('forecast_changes', []).append(
+            (expense.user_id, expense.date.date(), sign * expense.amount, category or expense.category or 'other', sign)
+        )
+
+@event.listens_for(Session, "after_commit")
+def _apply_after_commit(session: Session):
+    changes = session.info.pop('forecast_changes', [])
+    shard = session.info.get('shard', 0)
+    for user_id, day, amount, category, count in changes:
+        # Users without a forecaster yet load everything from the rollups on first use
+        predictor = _predictors.get((shard, user_id))
+        if predictor is not None:
+            predictor.add_expense(day, amount, category, count=count)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_on_rollback(session: Session):
+    session.info.pop('forecast_changes', None)
+
+def get_incremental_predictor(db: Session) -> IncrementalSpendingPredictor:
+    """The session user's forecaster, (re)loaded from the rollups on first use and every resync interval"""
+    key = (db.info.get('shard', 0), session_user(db))
+    predictor = _user_predictor(key)
+    
+    if key not in _loaded_at or time.monotonic() - _loaded_at[key] > FORECAST_RESYNC_INTERVAL:
+        with _load_lock:
+            if key not in _loaded_at or time.monotonic() - _loaded_at[key] > FORECAST_RESYNC_INTERVAL:
+                since = date.today() - timedelta(days=max(FORECAST_WINDOWS) - 1)
+                predictor.load(rollups.rollup_rows(db, since))
+                _loaded_at[key] = time.monotonic()
+    
+    return predictor
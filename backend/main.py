@@ -1,12 +1,39 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from database import engine, Base
-from routes import expenses, predictions, insights, budgets
+from fastapi.responses import PlainTextResponse
+from database import DEFAULT_USER_ID, Base, shards
+from routes import expenses, predictions, insights, budgets, imports, dashboard
+from ai_engine.model_registry import loaded_model_version, categorizer_cache_stats, shutdown_online_learning
+from ai_engine.compute_pool import COMPUTE_TRAIN_TIMEOUT, compute_pool_stats, ensure_categorizer_artifact, get_compute_pool, shutdown_compute_pool
 from models.expense import DBExpense
 from models.budget import DBBudget
+from models.statement_import import DBStatementImport
+from models.rollup import DBDailyRollup
+from models.charge_stats import DBMerchantStats, DBChargeAlert
+from models.data_version import DBDataVersion
+from models.indexes import ensure_indexes
+from models.migrations import add_missing_columns, drop_stale_derived_tables, migrate_user_scope
+from rollups import rebuild_rollups, rollups_missing
+from budget_tracking import rebuild_budget_spend
+from charge_tracking import charge_stats_missing, rebuild_charge_stats
+from result_cache import cache_stats
+from analytics_store import store_stats
+from archive import archive_stats
+from write_queue import start_write_queue, stop_write_queue, write_queue_stats
+from datetime import datetime
+import logging
+import metrics
+import time
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
+logger = logging.getLogger(__name__)
+
+# Create database tables in every shard
+for shard in shards:
+    migrate_user_scope(shard.engine, DEFAULT_USER_ID)
+    add_missing_columns(shard.engine)
+    drop_stale_derived_tables(shard.engine)
+    Base.metadata.create_all(bind=shard.engine)
+    ensure_indexes(shard.engine)
 
 app = FastAPI(
     title="AI Finance Manager API",
@@ -21,13 +48,82 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    sql_stats = metrics.start_request_sql()
+    metrics.HTTP_REQUESTS_IN_FLIGHT.inc()
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        metrics.HTTP_REQUESTS_IN_FLIGHT.dec()
+        # Route templates keep label cardinality bounded (/expenses/{expense_id}, not every id)
+        route = request.scope.get('route')
+        route_path = route.path if route is not None else 'unmatched'
+        metrics.HTTP_REQUEST_DURATION.observe(
+            time.perf_counter() - started, method=request.method, route=route_path, status=status
+        )
+        metrics.REQUEST_SQL_QUERIES.observe(sql_stats[0], route=route_path)
+        metrics.REQUEST_SQL_DURATION.observe(sql_stats[1], route=route_path)
+
 # Include routers
 app.include_router(expenses.router, prefix="/api/v1", tags=["expenses"])
 app.include_router(predictions.router, prefix="/api/v1", tags=["ai-predictions"])
 app.include_router(insights.router, prefix="/api/v1", tags=["ai-insights"])
 app.include_router(budgets.router, prefix="/api/v1", tags=["budgets"])
+app.include_router(imports.router, prefix="/api/v1", tags=["imports"])
+app.include_router(dashboard.router, prefix="/api/v1", tags=["dashboard"])
+
+@app.on_event("startup")
+def rebuild_derived_state():
+    for shard in shards:
+        db = shard.SessionLocal()
+        try:
+            # One-off backfill for databases created before rollups existed
+            if rollups_missing(db):
+                rebuild_rollups(db, shard=shard.shard_id)
+            # Merchant statistics are backfilled once; afterwards every write keeps them current
+            if charge_stats_missing(db):
+                rebuild_charge_stats(db, shard.shard_id)
+            # Budgets created before spend tracking hold a stale snapshot
+            rebuild_budget_spend(db, datetime.now().strftime('%Y-%m'))
+        finally:
+            db.close()
+
+@app.on_event("startup")
+async def start_expense_writer():
+    start_write_queue()
+
+@app.on_event("startup")
+async def train_categorizer_in_pool():
+    # Train a missing categorizer artifact in a worker; the API process then only loads it
+    pool = get_compute_pool()
+    if pool is not None:
+        try:
+            await pool.run(ensure_categorizer_artifact, timeout=COMPUTE_TRAIN_TIMEOUT)
+        except Exception:
+            logger.exception("Categorizer training in the compute pool failed; it will train on first use")
+
+@app.on_event("shutdown")
+def flush_online_learning():
+    shutdown_online_learning()
+
+@app.on_event("shutdown")
+def stop_compute_pool():
+    shutdown_compute_pool()
+
+@app.on_event("shutdown")
+async def close_async_engine():
+    # Queued expenses are committed before the engine goes away
+    await stop_write_queue()
+    for shard in shards:
+        await shard.async_engine.dispose()
 
 @app.get("/")
 def read_root():
@@ -43,4 +139,19 @@ def read_root():
 
 @app.get("/health")
 def health_check():
-    return {"status": "healthy", "ai_engine": "active"}
\ No newline at end of file
+    return {
+        "status": "healthy",
+        "ai_engine": "active",
+        "categorizer_model_version": loaded_model_version(),
+        "categorizer_cache": categorizer_cache_stats(),
+        "result_cache": cache_stats(),
+        "analytics_store": store_stats(),
+        "archive": archive_stats(),
+        "write_queue": write_queue_stats(),
+        "database_shards": len(shards),
+        "compute_pool": compute_pool_stats()
+    }
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
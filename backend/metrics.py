@@ -0,0 +1,184 @@
+"""In-process Prometheus metrics, rendered in the text exposition format by /metrics.
+
+Each uvicorn worker keeps its own values, so scrape every worker (or run
+one per container). Work done inside compute pool workers is measured
+from the API process as compute task time.
+"""
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from contextvars import ContextVar
+from sqlalchemy import event
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+import threading
+import time
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+FAST_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+_registry: List['Metric'] = []
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Metric(ABC):
+    kind = 'untyped'
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        _registry.append(self)
+    
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+    
+    def _labels(self, key: Tuple[str, ...], extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+        pairs = list(zip(self.labelnames, key)) + list(extra)
+        if not pairs:
+            return ''
+        return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+    
+    @abstractmethod
+    def samples(self) -> Iterator[str]:
+        """Exposition lines for the current values"""
+    
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return '\n'.join(lines)
+
+class Counter(Metric):
+    kind = 'counter'
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+    
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+    
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            values = list(self._values.items())
+        for key, value in values:
+            yield f"{self.name}{self._labels(key)} {_format_value(value)}"
+
+class Gauge(Counter):
+    kind = 'gauge'
+    
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+    
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+class Histogram(Metric):
+    kind = 'histogram'
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+        self._counts: Dict[Tuple[str, ...], List[int]] = {}
+        self._sums: Dict[Tuple[str, ...], float] = {}
+    
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts = self._counts.get(key)
+            if counts is None:
+                counts = self._counts[key] = [0] * len(self.buckets)
+                self._sums[key] = 0.0
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            self._sums[key] += value
+    
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+    
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            series = [(key, list(counts), self._sums[key]) for key, counts in self._counts.items()]
+        for key, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                yield f"{self.name}_bucket{self._labels(key, (('le', _format_value(bound)),))} {cumulative}"
+            yield f"{self.name}_sum{self._labels(key)} {_format_value(total)}"
+            yield f"{self.name}_count{self._labels(key)} {cumulative}"
+
+def render() -> str:
+    """All registered metrics in the Prometheus text format"""
+    return '\n'.join(metric.render() for metric in _registry) + '\n'
+
+HTTP_REQUEST_DURATION = Histogram(
+    'http_request_duration_seconds', 'HTTP request latency by route template',
+    ['method', 'route', 'status']
+)
+HTTP_REQUESTS_IN_FLIGHT = Gauge('http_requests_in_flight', 'HTTP requests currently being served')
+REQUEST_SQL_QUERIES = Histogram(
+    'http_request_sql_queries', 'SQL statements executed per HTTP request',
+    ['route'], buckets=COUNT_BUCKETS
+)
+REQUEST_SQL_DURATION = Histogram(
+    'http_request_sql_duration_seconds', 'Time spent executing SQL per HTTP request', ['route']
+)
+SQL_QUERY_DURATION = Histogram('sql_query_duration_seconds', 'Duration of individual SQL statements', buckets=FAST_BUCKETS)
+CATEGORIZER_INFERENCE = Histogram(
+    'categorizer_inference_duration_seconds', 'Categorizer model inference time per batch of cache misses',
+    buckets=FAST_BUCKETS
+)
+PREDICTOR_FIT = Histogram('predictor_fit_duration_seconds', 'Spending forecast model fit time', ['model'], buckets=FAST_BUCKETS)
+PREDICTIONS = Counter('predictions_total', 'Forecasts computed (cached responses excluded), by route and method', ['route', 'method'])
+COMPUTE_TASK_DURATION = Histogram('compute_task_duration_seconds', 'Compute pool task time seen by the caller', ['task'])
+COMPUTE_TASKS_REJECTED = Counter(
+    'compute_tasks_rejected_total', 'Compute pool tasks refused or timed out; callers fall back to a cheaper path',
+    ['task', 'reason']
+)
+
+# (statement count, seconds) for the HTTP request being served, if any
+_request_sql: ContextVar[Optional[List[float]]] = ContextVar('request_sql', default=None)
+
+def start_request_sql() -> List[float]:
+    """Begin attributing SQL statements to the current request; returns the live [count, seconds]"""
+    stats = [0, 0.0]
+    _request_sql.set(stats)
+    return stats
+
+def instrument_engine(engine):
+    """Time every statement run on a (sync) engine; pass async engines' sync_engine"""
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+    
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        duration = time.perf_counter() - conn.info['query_started'].pop()
+        SQL_QUERY_DURATION.observe(duration)
+        stats = _request_sql.get()
+        if stats is not None:
+            stats[0] += 1
+            stats[1] += duration
+    
+    @event.listens_for(engine, "handle_error")
+    def _failed(context):
+        # Failed statements never reach after_cursor_execute; drop their start time
+        starts = context.connection.info.get('query_started') if context.connection is not None else None
+        if starts:
+            starts.pop()
@@ -0,0 +1,13 @@
+from sqlalchemy import Column, Integer, String, Float, Boolean
+from database import Base
+
+class DBBudget(Base):
+    __tablename__ = "budgets"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(String, nullable=False, index=True)
+    category = Column(String, nullable=False)
+    monthly_limit = Column(Float, nullable=False)
+    current_spent = Column(Float, default=0.0)
+    month = Column(String, nullable=False)
+    is_active = Column(Boolean, default=True)
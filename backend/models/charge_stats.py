@@ -0,0 +1,35 @@
+from sqlalchemy import Column, Integer, String, Float, Date, Boolean, Index
+from database import Base
+
+class DBMerchantStats(Base):
+    __tablename__ = "merchant_charge_stats"
+
+    user_id = Column(String, primary_key=True)
+    merchant = Column(String, primary_key=True)
+    category = Column(String)
+    charge_count = Column(Integer, nullable=False, default=0)
+    mean_amount = Column(Float, nullable=False, default=0.0)
+    m2_amount = Column(Float, nullable=False, default=0.0)
+    outlier_count = Column(Integer, nullable=False, default=0)
+    outlier_mean = Column(Float, nullable=False, default=0.0)
+    outlier_m2 = Column(Float, nullable=False, default=0.0)
+    last_date = Column(Date)
+    interval_count = Column(Integer, nullable=False, default=0)
+    interval_mean = Column(Float, nullable=False, default=0.0)
+    interval_m2 = Column(Float, nullable=False, default=0.0)
+    recurring = Column(Boolean, nullable=False, default=False, index=True)
+
+class DBChargeAlert(Base):
+    __tablename__ = "charge_alerts"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(String, nullable=False)
+    expense_id = Column(Integer, index=True)
+    merchant = Column(String, nullable=False)
+    kind = Column(String, nullable=False)
+    date = Column(Date, nullable=False)
+    amount = Column(Float, nullable=False)
+    expected_amount = Column(Float)
+    z_score = Column(Float)
+
+    __table_args__ = (Index("ix_charge_alerts_user_date", "user_id", "date"),)
@@ -0,0 +1,10 @@
+from sqlalchemy import Column, Integer, String
+from database import Base
+
+class DBDataVersion(Base):
+    __tablename__ = "data_versions"
+
+    # user_id '*' holds writes that touch every user, such as rebuilds and archiving
+    user_id = Column(String, primary_key=True)
+    table_name = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,19 @@
+from sqlalchemy import Column, Integer, String, Float, DateTime, Text
+from datetime import datetime
+from database import Base
+
+class DBExpense(Base):
+    __tablename__ = "expenses"
+
+    id = Column(Integer, primary_key=True, index=True)
+    # Indexed through the (user_id, ...) composites in models/indexes.py
+    user_id = Column(String, nullable=False)
+    description = Column(String, nullable=False)
+    amount = Column(Float, nullable=False)
+    category = Column(String, index=True)
+    ai_category = Column(String)
+    ai_confidence = Column(Float)
+    date = Column(DateTime, default=datetime.now)
+    payment_method = Column(String)
+    location = Column(String)
+    notes = Column(Text)
@@ -0,0 +1,13 @@
+from sqlalchemy import Index
+from models.expense import DBExpense
+
+# Every read is scoped to one user; keyset pagination then walks (date, id), category listings filter by date
+EXPENSE_INDEXES = [
+    Index("ix_expenses_user_date_id", DBExpense.user_id, DBExpense.date, DBExpense.id),
+    Index("ix_expenses_user_category_date", DBExpense.user_id, DBExpense.category, DBExpense.date),
+]
+
+def ensure_indexes(engine):
+    """Create indexes missing from tables that existed before they were declared"""
+    for index in EXPENSE_INDEXES:
+        index.create(bind=engine, checkfirst=True)
@@ -0,0 +1,49 @@
+from sqlalchemy import inspect, text
+from database import Base
+
+# Rows from before users existed are given to the default user
+USER_TABLES = ("expenses", "budgets", "statement_imports")
+# Derived tables are dropped instead when their columns change; startup rebuilds them from the expenses
+DERIVED_TABLES = ("daily_category_rollups", "merchant_charge_stats", "charge_alerts")
+# Superseded by the user-scoped indexes
+OBSOLETE_INDEXES = ("ix_expenses_date_id", "ix_expenses_category_date")
+# Nullable columns added to tables after their first release, as (table, column, type)
+ADDED_COLUMNS = (("statement_imports", "file_sha256", "VARCHAR"), ("statement_imports", "date_format", "VARCHAR"))
+
+def migrate_user_scope(engine, default_user_id: str):
+    """Add user_id to tables created before it existed; run before create_all"""
+    inspector = inspect(engine)
+    tables = set(inspector.get_table_names())
+    default = default_user_id.replace("'", "''")
+    
+    with engine.begin() as connection:
+        for table in USER_TABLES:
+            if table not in tables or 'user_id' in {column['name'] for column in inspector.get_columns(table)}:
+                continue
+            connection.execute(text(f"ALTER TABLE {table} ADD COLUMN user_id VARCHAR NOT NULL DEFAULT '{default}'"))
+        for index in OBSOLETE_INDEXES:
+            connection.execute(text(f"DROP INDEX IF EXISTS {index}"))
+
+def add_missing_columns(engine):
+    """Add columns introduced after a table was created; run before create_all"""
+    inspector = inspect(engine)
+    tables = set(inspector.get_table_names())
+    
+    with engine.begin() as connection:
+        for table, column, column_type in ADDED_COLUMNS:
+            if table not in tables or column in {existing['name'] for existing in inspector.get_columns(table)}:
+                continue
+            connection.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}"))
+
+def drop_stale_derived_tables(engine):
+    """Drop derived tables missing a column of their model, so create_all and the startup rebuild replace them"""
+    inspector = inspect(engine)
+    tables = set(inspector.get_table_names())
+    
+    with engine.begin() as connection:
+        for table in DERIVED_TABLES:
+            if table not in tables:
+                continue
+            existing = {column['name'] for column in inspector.get_columns(table)}
+            if not set(Base.metadata.tables[table].columns.keys()) <= existing:
+                connection.execute(text(f"DROP TABLE {table}"))
@@ -0,0 +1,13 @@
+from sqlalchemy import Column, Integer, String, Float, Date
+from database import Base
+
+class DBDailyRollup(Base):
+    __tablename__ = "daily_category_rollups"
+
+    user_id = Column(String, primary_key=True)
+    day = Column(Date, primary_key=True)
+    category = Column(String, primary_key=True)
+    total_amount = Column(Float, nullable=False, default=0.0)
+    transaction_count = Column(Integer, nullable=False, default=0)
+    min_amount = Column(Float)
+    max_amount = Column(Float)
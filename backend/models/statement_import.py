@@ -0,0 +1,21 @@
+from sqlalchemy import Column, Integer, String, Float, DateTime
+from datetime import datetime
+from database import Base
+
+class DBStatementImport(Base):
+    __tablename__ = "statement_imports"
+
+    id = Column(String, primary_key=True, index=True)
+    user_id = Column(String, nullable=False, index=True)
+    filename = Column(String)
+    file_sha256 = Column(String)
+    file_format = Column(String, nullable=False)
+    date_format = Column(String)
+    chunk_size = Column(Integer, nullable=False)
+    chunks_committed = Column(Integer, default=0)
+    rows_imported = Column(Integer, default=0)
+    rows_rejected = Column(Integer, default=0)
+    rows_per_second = Column(Float)
+    status = Column(String, default="in_progress")
+    created_at = Column(DateTime, default=datetime.now)
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
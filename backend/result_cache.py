@@ -0,0 +1,131 @@
+"""In-memory cache for analytics responses and ETags for conditional GETs, both keyed by persisted data versions.
+
+Every write bumps a per-(table, user) version in the data_versions table in
+the same transaction, so ETags agree across uvicorn workers and restarts,
+and a write handled by any worker changes them at once. Cached results are
+keyed by the same versions and only reused while nothing was written; the
+TTL only bounds memory held by results nobody asks for.
+"""
+from fastapi import Header, HTTPException, Request, Response
+from sqlalchemy import Select, event, select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+from typing import Callable, Dict, Iterable, Optional, Sequence, Tuple
+from datetime import date
+from ai_engine.cache import LRUCache
+from models.data_version import DBDataVersion
+from database import DEFAULT_USER_ID, request_user, session_user, shard_for_user
+import functools
+import inspect
+import os
+import uuid
+
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "256"))
+RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", "60"))
+
+_cache = LRUCache(maxsize=RESULT_CACHE_SIZE, ttl=RESULT_CACHE_TTL)
+
+EXPENSES = 'expenses'
+BUDGETS = 'budgets'
+
+# Version row for writes that change every user's data
+ALL_USERS = '*'
+
+def mark_data_changed(db: Session, *tables: str, users: Iterable[str] = (ALL_USERS,)):
+    """Bump the tables' versions for the given users (default: everyone) when the session's transaction commits"""
+    db.info.setdefault('data_changed', set()).update((table, user_id) for table in tables for user_id in users)
+
+@event.listens_for(Session, "before_commit")
+def _bump_before_commit(session: Session):
+    # Bumped inside the writing transaction, so the new version is visible exactly when the data is
+    changed = session.info.pop('data_changed', None)
+    if changed:
+        statement = insert(DBDataVersion).values([
+            {'user_id': user_id, 'table_name': table, 'version': 1} for table, user_id in sorted(changed)
+        ])
+        session.execute(statement.on_conflict_do_update(
+            index_elements=[DBDataVersion.user_id, DBDataVersion.table_name],
+            set_={'version': DBDataVersion.version + 1}
+        ))
+
+@event.listens_for(Session, "after_rollback")
+def _discard_on_rollback(session: Session):
+    session.info.pop('data_changed', None)
+
+def _versions_query(tables: Sequence[str], user_id: str) -> Select:
+    return select(DBDataVersion.table_name, DBDataVersion.user_id, DBDataVersion.version).where(
+        DBDataVersion.table_name.in_(tables),
+        DBDataVersion.user_id.in_((user_id, ALL_USERS))
+    )
+
+def _version_token(rows: Iterable[Tuple[str, str, int]], tables: Sequence[str], user_id: str) -> str:
+    versions = {(table, user): version for table, user, version in rows}
+    return '.'.join(f"{versions.get((table, user_id), 0)}-{versions.get((table, ALL_USERS), 0)}" for table in tables)
+
+def data_etag(db: Session, tables: Tuple[str, ...], user_id: str = DEFAULT_USER_ID) -> str:
+    """Strong ETag for a user's responses computed from the given tables"""
+    versions = _version_token(db.execute(_versions_query(tables, user_id)).all(), tables, user_id)
+    user = uuid.uuid5(uuid.NAMESPACE_URL, user_id).hex[:12]
+    # The date is part of the ETag because analytics windows are relative to today
+    return f'"{user}-{versions}-{date.today():%Y%m%d}"'
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    # If-None-Match uses weak comparison
+    candidates = [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]
+    return '*' in candidates or etag in candidates
+
+def conditional_get(*tables: str) -> Callable:
+    """Route dependency answering 304 when If-None-Match holds the current ETag; returns the ETag otherwise.
+    
+    The ETag is also set on the injected response; routes returning a
+    Response object directly must copy it onto that response.
+    """
+    def check(request: Request, response: Response, x_user_id: Optional[str] = Header(None)) -> str:
+        # Read before the route queries, so a write racing the query only makes the ETag older, never newer
+        user_id = request_user(x_user_id)
+        with shard_for_user(user_id).SessionLocal() as db:
+            etag = data_etag(db, tables, user_id)
+        if _etag_matches(request.headers.get('if-none-match'), etag):
+            raise HTTPException(status_code=304, headers={'ETag': etag})
+        response.headers['ETag'] = etag
+        return etag
+    return check
+
+def cached_result(name: str) -> Callable:
+    """Cache a route's return value per user, query parameters, data versions and day"""
+    tables = (EXPENSES, BUDGETS)
+    
+    def make_key(kwargs: Dict, version_rows: Iterable[Tuple[str, str, int]], user_id: str) -> tuple:
+        params = tuple(sorted((k, v) for k, v in kwargs.items() if k != 'db'))
+        # The date is part of the key because analytics windows are relative to today
+        return (name, user_id, params, _version_token(version_rows, tables, user_id), date.today())
+    
+    def decorator(fn: Callable) -> Callable:
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                user_id = session_user(kwargs['db'])
+                key = make_key(kwargs, (await kwargs['db'].execute(_versions_query(tables, user_id))).all(), user_id)
+                result = _cache.get(key)
+                if result is None:
+                    result = await fn(*args, **kwargs)
+                    _cache.put(key, result)
+                return result
+            return async_wrapper
+        
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            user_id = session_user(kwargs['db'])
+            key = make_key(kwargs, kwargs['db'].execute(_versions_query(tables, user_id)).all(), user_id)
+            result = _cache.get(key)
+            if result is None:
+                result = fn(*args, **kwargs)
+                _cache.put(key, result)
+            return result
+        return wrapper
+    return decorator
+
+def cache_stats() -> Dict:
+    return _cache.stats()
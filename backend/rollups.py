@@ -0,0 +1,212 @@
+"""Daily (day, category) spending rollups, maintained in the same transaction as expense writes.
+
+Rebuild from the archive partitions and the expenses table after a backfill with:
+
+    python -m rollups [--since YYYY-MM-DD]
+"""
+from sqlalchemy import func
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+from typing import Dict, Iterable, List, Optional, Tuple
+from datetime import date, datetime
+from models.expense import DBExpense
+from models.rollup import DBDailyRollup
+from database import session_user
+import argparse
+import result_cache
+
+def _key(expense: DBExpense) -> Tuple[str, date, str]:
+    return expense.user_id, expense.date.date(), expense.category or 'other'
+
+def record_expenses(db: Session, expenses: Iterable[DBExpense]):
+    """Add new expenses to their rollup rows; call after flush, before commit"""
+    deltas: Dict[Tuple[str, date, str], Tuple[float, int, float, float]] = {}
+    for expense in expenses:
+        total, count, low, high = deltas.get(_key(expense), (0.0, 0, expense.amount, expense.amount))
+        deltas[_key(expense)] = (total + expense.amount, count + 1, min(low, expense.amount), max(high, expense.amount))
+    
+    for (user_id, day, category), (total, count, low, high) in deltas.items():
+        statement = insert(DBDailyRollup).values(
+            user_id=user_id,
+            day=day,
+            category=category,
+            total_amount=total,
+            transaction_count=count,
+            min_amount=low,
+            max_amount=high
+        )
+        db.execute(statement.on_conflict_do_update(
+            index_elements=[DBDailyRollup.user_id, DBDailyRollup.day, DBDailyRollup.category],
+            set_={
+                'total_amount': DBDailyRollup.total_amount + statement.excluded.total_amount,
+                'transaction_count': DBDailyRollup.transaction_count + statement.excluded.transaction_count,
+                'min_amount': func.min(func.coalesce(DBDailyRollup.min_amount, statement.excluded.min_amount), statement.excluded.min_amount),
+                'max_amount': func.max(func.coalesce(DBDailyRollup.max_amount, statement.excluded.max_amount), statement.excluded.max_amount)
+            }
+        ))
+
+def remove_expense(db: Session, expense: DBExpense, category: Optional[str] = None):
+    """Subtract an expense (under its current or given old category) from its rollup row"""
+    user_id, day, current_category = _key(expense)
+    category = category or current_category
+    
+    rollup = db.query(DBDailyRollup).filter(
+        DBDailyRollup.user_id == user_id,
+        DBDailyRollup.day == day,
+        DBDailyRollup.category == category
+    ).first()
+    if rollup is None:
+        return
+    
+    if rollup.transaction_count <= 1:
+        db.delete(rollup)
+        return
+    
+    rollup.total_amount -= expense.amount
+    rollup.transaction_count -= 1
+    
+    # Min/max cannot be decremented; recompute the single cell when an extreme goes away
+    if expense.amount <= rollup.min_amount or expense.amount >= rollup.max_amount:
+        day_start = datetime.combine(day, datetime.min.time())
+        day_end = datetime.combine(day, datetime.max.time())
+        low, high = db.query(func.min(DBExpense.amount), func.max(DBExpense.amount)).filter(
+            DBExpense.id != expense.id,
+            DBExpense.user_id == user_id,
+            DBExpense.date >= day_start,
+            DBExpense.date <= day_end,
+            func.coalesce(DBExpense.category, 'other') == category
+        ).one()
+        rollup.min_amount = low
+        rollup.max_amount = high
+
+def change_category(db: Session, expense: DBExpense, old_category: Optional[str]):
+    """Move an expense between category rollups after its category was changed"""
+    if (old_category or 'other') == (expense.category or 'other'):
+        return
+    remove_expense(db, expense, category=old_category or 'other')
+    record_expenses(db, [expense])
+
+def rebuild_rollups(db: Session, since: Optional[date] = None, shard: int = 0) -> int:
+    """Recompute every user's rollups from the shard's archive and expenses table, optionally only from a given day"""
+    # Imported here: the archive imports the analytics modules, which import this one
+    import archive
+    
+    day = func.date(DBExpense.date)
+    category = func.coalesce(DBExpense.category, 'other')
+    
+    query = db.query(
+        DBExpense.user_id, day, category,
+        func.sum(DBExpense.amount), func.count(DBExpense.id),
+        func.min(DBExpense.amount), func.max(DBExpense.amount)
+    )
+    delete_query = db.query(DBDailyRollup)
+    if since is not None:
+        query = query.filter(DBExpense.date >= datetime.combine(since, datetime.min.time()))
+        delete_query = delete_query.filter(DBDailyRollup.day >= since)
+    
+    delete_query.delete(synchronize_session=False)
+    
+    # Archived days are summed from the Arrow parts; back-dated expenses can add to the same days
+    cells: Dict[Tuple[str, date, str], List] = {}
+    
+    def add(user_id: str, cell_day: date, cell_category: str, total: float, count: int, low: float, high: float):
+        cell = cells.get((user_id, cell_day, cell_category))
+        if cell is None:
+            cells[user_id, cell_day, cell_category] = [total, count, low, high]
+        else:
+            cell[0] += total
+            cell[1] += count
+            cell[2] = min(cell[2], low)
+            cell[3] = max(cell[3], high)
+    
+    def live_ids(month: date) -> List[int]:
+        month_start = datetime.combine(month, datetime.min.time())
+        next_month = datetime(month.year + month.month // 12, month.month % 12 + 1, 1)
+        return [row[0] for row in db.query(DBExpense.id).filter(DBExpense.date >= month_start, DBExpense.date < next_month)]
+    
+    for row in archive.archived_daily_totals(shard, since, live_ids):
+        add(*row)
+    for user_id, cell_day, cell_category, total, count, low, high in query.group_by(DBExpense.user_id, day, category):
+        add(user_id, date.fromisoformat(cell_day), cell_category, total, count, low, high)
+    
+    db.bulk_insert_mappings(DBDailyRollup, [
+        {
+            'user_id': user_id,
+            'day': cell_day,
+            'category': cell_category,
+            'total_amount': total,
+            'transaction_count': count,
+            'min_amount': low,
+            'max_amount': high
+        }
+        for (user_id, cell_day, cell_category), (total, count, low, high) in cells.items()
+    ])
+    result_cache.mark_data_changed(db, result_cache.EXPENSES)
+    db.commit()
+    
+    return len(cells)
+
+def rollups_missing(db: Session) -> bool:
+    """True when expenses exist but the rollup table was never built"""
+    has_expenses = db.query(DBExpense.id).first() is not None
+    has_rollups = db.query(DBDailyRollup.day).first() is not None
+    return has_expenses and not has_rollups
+
+def _window(db: Session, since: date) -> Tuple:
+    # Future-dated rows (imported scheduled payments) are left out until their day, as in the columnar store
+    return DBDailyRollup.user_id == session_user(db), DBDailyRollup.day >= since, DBDailyRollup.day <= date.today()
+
+def rollup_rows(db: Session, since: date, category: Optional[str] = None) -> List[Tuple[date, str, float, int]]:
+    """The session user's (day, category, total, count) rows from a given day through today"""
+    query = db.query(
+        DBDailyRollup.day,
+        DBDailyRollup.category,
+        DBDailyRollup.total_amount,
+        DBDailyRollup.transaction_count
+    ).filter(*_window(db, since))
+    if category is not None:
+        query = query.filter(DBDailyRollup.category == category)
+    return query.order_by(DBDailyRollup.day).all()
+
+def daily_totals(db: Session, since: date) -> List[Tuple[date, float, int]]:
+    """(day, total, count) per day from a given day through today"""
+    return db.query(
+        DBDailyRollup.day,
+        func.sum(DBDailyRollup.total_amount),
+        func.sum(DBDailyRollup.transaction_count)
+    ).filter(*_window(db, since)).group_by(DBDailyRollup.day).order_by(DBDailyRollup.day).all()
+
+def category_totals(db: Session, since: date, category: Optional[str] = None) -> List[Tuple[str, float, int]]:
+    """(category, total, count) per category from a given day through today"""
+    query = db.query(
+        DBDailyRollup.category,
+        func.sum(DBDailyRollup.total_amount),
+        func.sum(DBDailyRollup.transaction_count)
+    ).filter(*_window(db, since))
+    if category is not None:
+        query = query.filter(DBDailyRollup.category == category)
+    return query.group_by(DBDailyRollup.category).all()
+
+def monthly_totals(db: Session, since: date) -> List[Tuple[str, float, int]]:
+    """('YYYY-MM', total, count) per month from a given day through today; rollups outlive archived expenses"""
+    month = func.strftime('%Y-%m', DBDailyRollup.day)
+    return db.query(
+        month,
+        func.sum(DBDailyRollup.total_amount),
+        func.sum(DBDailyRollup.transaction_count)
+    ).filter(*_window(db, since)).group_by(month).order_by(month).all()
+
+if __name__ == "__main__":
+    from database import Base, shards
+    
+    parser = argparse.ArgumentParser(description="Rebuild daily category rollups from expenses")
+    parser.add_argument("--since", type=date.fromisoformat, help="only rebuild days from this date (YYYY-MM-DD)")
+    args = parser.parse_args()
+    
+    for shard in shards:
+        Base.metadata.create_all(bind=shard.engine)
+        db = shard.SessionLocal()
+        try:
+            print(f"Rebuilt {rebuild_rollups(db, args.since, shard.shard_id)} rollup rows in {shard.url}")
+        finally:
+            db.close()
@@ -1,69 +1,24 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from database import get_db
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_async_db, session_user
 from models.budget import DBBudget
-from models.expense import DBExpense
 from datetime import datetime
+from typing import Dict, List
+from budget_tracking import month_spending, rebuild_budget_spend
+import result_cache
 
 router = APIRouter()
 
-@router.post("/budgets")
-def create_budget(category: str, monthly_limit: float, db: Session = Depends(get_db)):
-    """Create a new budget for a category"""
-    
-    current_month = datetime.now().strftime('%Y-%m')
-    
-    # Check if budget already exists for this month/category
-    existing = db.query(DBBudget).filter(
-        DBBudget.category == category,
-        DBBudget.month == current_month
-    ).first()
-    
-    if existing:
-        raise HTTPException(status_code=400, detail="Budget already exists for this category this month")
-    
-    # Calculate current spending for this category this month
-    month_start = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    current_spent = db.query(DBExpense).filter(
-        DBExpense.category == category,
-        DBExpense.date >= month_start
-    ).with_entities(DBExpense.amount).all()
-    
-    total_spent = sum(amount[0] for amount in current_spent)
-    
-    budget = DBBudget(
-        category=category,
-        monthly_limit=monthly_limit,
-        current_spent=total_spent,
-        month=current_month
-    )
-    
-    db.add(budget)
-    db.commit()
-    db.refresh(budget)
-    
-    return budget
-
-@router.get("/budgets")
-def get_budgets(db: Session = Depends(get_db)):
-    """Get all active budgets"""
-    current_month = datetime.now().strftime('%Y-%m')
-    budgets = db.query(DBBudget).filter(
-        DBBudget.month == current_month,
+async def active_budgets(db: AsyncSession, month: str) -> List[DBBudget]:
+    return (await db.execute(select(DBBudget).where(
+        DBBudget.user_id == session_user(db),
+        DBBudget.month == month,
         DBBudget.is_active == True
-    ).all()
-    
-    return budgets
+    ))).scalars().all()
 
-@router.get("/budgets/status")
-def get_budget_status(db: Session = Depends(get_db)):
-    """Get budget status with AI insights"""
-    current_month = datetime.now().strftime('%Y-%m')
-    budgets = db.query(DBBudget).filter(
-        DBBudget.month == current_month,
-        DBBudget.is_active == True
-    ).all()
-    
+def budget_status_report(budgets: List[DBBudget], month: str) -> Dict:
+    """Budget status response with per-budget usage and advice"""
     status_report = []
     
     for budget in budgets:
@@ -96,6 +51,63 @@ def get_budget_status(db: Session = Depends(get_db)):
     
     return {
         'budgets': status_report,
-        'month': current_month,
+        'month': month,
         'total_budgets': len(budgets)
-    }
\ No newline at end of file
+    }
+
+@router.post("/budgets")
+async def create_budget(category: str, monthly_limit: float, db: AsyncSession = Depends(get_async_db)):
+    """Create a new budget for a category"""
+    
+    current_month = datetime.now().strftime('%Y-%m')
+    
+    # Check if budget already exists for this month/category
+    existing = (await db.execute(select(DBBudget).where(
+        DBBudget.user_id == session_user(db),
+        DBBudget.category == category,
+        DBBudget.month == current_month
+    ))).scalars().first()
+    
+    if existing:
+        raise HTTPException(status_code=400, detail="Budget already exists for this category this month")
+    
+    # Calculate current spending for this category this month; expense writes keep it current afterwards
+    spending = await db.run_sync(lambda session: month_spending(session, current_month, category=category))
+    total_spent = spending.get(category, 0.0)
+    
+    budget = DBBudget(
+        user_id=session_user(db),
+        category=category,
+        monthly_limit=monthly_limit,
+        current_spent=total_spent,
+        month=current_month
+    )
+    
+    db.add(budget)
+    result_cache.mark_data_changed(db, result_cache.BUDGETS, users=[budget.user_id])
+    await db.commit()
+    await db.refresh(budget)
+    
+    return budget
+
+@router.get("/budgets")
+async def get_budgets(db: AsyncSession = Depends(get_async_db)):
+    """Get all active budgets"""
+    return await active_budgets(db, datetime.now().strftime('%Y-%m'))
+
+@router.get("/budgets/status", dependencies=[Depends(result_cache.conditional_get(result_cache.EXPENSES, result_cache.BUDGETS))])
+async def get_budget_status(db: AsyncSession = Depends(get_async_db)):
+    """Get budget status with AI insights"""
+    current_month = datetime.now().strftime('%Y-%m')
+    budgets = await active_budgets(db, current_month)
+    return budget_status_report(budgets, current_month)
+
+@router.post("/budgets/rebuild")
+async def rebuild_budgets(db: AsyncSession = Depends(get_async_db)):
+    """Recompute this month's budget spend from expenses in one query"""
+    current_month = datetime.now().strftime('%Y-%m')
+    
+    # Spend is maintained on every expense write; this repairs it after direct database loads
+    rebuilt = await db.run_sync(rebuild_budget_spend, current_month, session_user(db))
+    
+    return {"message": "Budget spend rebuilt", "budgets": rebuilt, "month": current_month}
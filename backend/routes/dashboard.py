@@ -0,0 +1,73 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_async_db
+from result_cache import BUDGETS, EXPENSES, cached_result, conditional_get
+from ai_engine.columnar import EPOCH_WEEKDAY, epoch_day
+from routes.budgets import active_budgets, budget_status_report
+from routes.insights import find_savings_opportunities, summarize_spending
+from routes.predictions import forecast_spending, summarize_patterns, summarize_week
+from datetime import datetime, timedelta
+import numpy as np
+import analytics_store
+
+router = APIRouter()
+
+def _last_days(matrix: np.ndarray, days: int) -> np.ndarray:
+    """Rows from `days` days ago through today, matching the single endpoints' cutoffs"""
+    return matrix[-(days + 1):]
+
+@router.get("/dashboard", dependencies=[Depends(conditional_get(EXPENSES, BUDGETS))])
+@cached_result("dashboard")
+async def get_dashboard(db: AsyncSession = Depends(get_async_db)):
+    """Summary, savings, forecast, patterns and budget status from one 90-day read and one forecast"""
+    now = datetime.now()
+    since = (now - timedelta(days=90)).date()
+    categories, totals, counts = await db.run_sync(analytics_store.daily_category_matrices, since)
+    
+    # 30-day category totals
+    totals_30, counts_30 = _last_days(totals, 30).sum(axis=0), _last_days(counts, 30).sum(axis=0)
+    summary_rows = [
+        (category, float(totals_30[j]), int(counts_30[j]))
+        for j, category in enumerate(categories) if counts_30[j]
+    ]
+    
+    # 60-day category and daily totals
+    counts_60 = _last_days(counts, 60)
+    savings_spending = {
+        category: float(total)
+        for category, total, count in zip(categories, _last_days(totals, 60).sum(axis=0), counts_60.sum(axis=0)) if count
+    }
+    day_totals, day_counts = _last_days(totals, 60).sum(axis=1), counts_60.sum(axis=1)
+    first_day = now.date() - timedelta(days=len(day_totals) - 1)
+    daily_totals = [(first_day + timedelta(days=int(i)), float(day_totals[i])) for i in np.flatnonzero(day_counts)]
+    
+    # 90-day weekday and category patterns
+    weekdays = (epoch_day(since) + np.arange(len(totals)) + EPOCH_WEEKDAY) % 7
+    weekday_totals = np.bincount(weekdays, weights=totals.sum(axis=1), minlength=7)
+    weekday_counts = np.bincount(weekdays, weights=counts.sum(axis=1), minlength=7)
+    category_counts = counts.sum(axis=0)
+    
+    # One forecast serves both the next-month and the weekly figures
+    prediction = await forecast_spending(db, "dashboard", 60, daily_totals)
+    budgets = await active_budgets(db, now.strftime('%Y-%m'))
+    
+    return {
+        "spending_summary": await summarize_spending(summary_rows),
+        "savings_opportunities": find_savings_opportunities(savings_spending),
+        "next_month": {
+            "prediction": prediction,
+            "data_points": int(counts_60.sum()),
+            "analysis_period": "60 days"
+        },
+        "weekly_forecast": summarize_week(prediction),
+        "spending_patterns": summarize_patterns(
+            {
+                analytics_store.WEEKDAY_NAMES[i]: (float(weekday_totals[i]), int(weekday_counts[i]))
+                for i in np.flatnonzero(weekday_counts)
+            },
+            {category: float(total) for category, total, count in zip(categories, totals.sum(axis=0), category_counts) if count},
+            int(category_counts.sum())
+        ),
+        "budget_status": budget_status_report(budgets, now.strftime('%Y-%m')),
+        "generated_at": now.isoformat()
+    }
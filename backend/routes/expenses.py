@@ -1,23 +1,112 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
-from database import get_db
+from fastapi import APIRouter, Body, Depends, Header, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import ORJSONResponse
+from pydantic import ValidationError
+from sqlalchemy import Select, and_, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from datetime import date, datetime
+import base64
+import json
+from database import get_async_db, request_user, session_user, shard_for_user
 from models.expense import DBExpense
-from schemas.expense import ExpenseCreate, ExpenseResponse
-from ai_engine.categorizer import ExpenseCategorizer
+from schemas.expense import ExpenseCreate, ExpenseResponse, ExpenseBatchResponse
+from ai_engine.model_registry import get_categorizer, record_correction
+from ai_engine import compute_pool
+import archive
+import expense_events
+import result_cache
+import write_queue
 
 router = APIRouter()
-categorizer = ExpenseCategorizer()
+
+MAX_BATCH_SIZE = 10000
+MAX_PAGE_SIZE = 1000
+
+# List endpoints select these columns as plain rows and encode them with orjson,
+# skipping ORM object construction and per-row ExpenseResponse validation
+RESPONSE_COLUMNS = (
+    DBExpense.id, DBExpense.description, DBExpense.amount, DBExpense.category, DBExpense.date,
+    DBExpense.ai_category, DBExpense.ai_confidence, DBExpense.payment_method, DBExpense.location, DBExpense.notes
+)
+RESPONSE_FIELDS = tuple(column.key for column in RESPONSE_COLUMNS)
+
+# ?format=columnar returns parallel arrays for charts: {"ids": [...], "dates": [...], ...}
+COLUMNAR_COLUMNS = (DBExpense.id, DBExpense.date, DBExpense.amount, DBExpense.category)
+COLUMNAR_FIELDS = tuple(column.key for column in COLUMNAR_COLUMNS)
+COLUMNAR_KEYS = ('ids', 'dates', 'amounts', 'categories')
+
+LIST_FORMAT = Query("rows", alias="format", pattern="^(rows|columnar)$")
+EXPENSES_ETAG = Depends(result_cache.conditional_get(result_cache.EXPENSES))
+
+def _page_limit(limit: int = Query(100, ge=1)) -> int:
+    # Larger pages are cut to the cap rather than rejected, so clients written before it keep working
+    return min(limit, MAX_PAGE_SIZE)
+
+PAGE_LIMIT = Depends(_page_limit)
+
+def _list_query(db: AsyncSession, response_format: str) -> Select:
+    columns = COLUMNAR_COLUMNS if response_format == "columnar" else RESPONSE_COLUMNS
+    return select(*columns).where(DBExpense.user_id == session_user(db))
+
+def _list_response(rows: Sequence, response_format: str, etag: str, next_cursor: Optional[str] = None) -> ORJSONResponse:
+    if response_format == "columnar":
+        columns = list(zip(*rows)) or [()] * len(COLUMNAR_KEYS)
+        content = {'count': len(rows), **{key: list(values) for key, values in zip(COLUMNAR_KEYS, columns)}}
+    else:
+        content = [dict(zip(RESPONSE_FIELDS, row)) for row in rows]
+    
+    headers = {'ETag': etag}
+    if next_cursor:
+        headers['X-Next-Cursor'] = next_cursor
+    return ORJSONResponse(content, headers=headers)
+
+def _encode_cursor(expense_date: datetime, expense_id: int) -> str:
+    payload = json.dumps({'d': expense_date.isoformat(), 'i': expense_id})
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+def _decode_cursor(cursor: str):
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(payload['d']), int(payload['i'])
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+async def _owned_expense(db: AsyncSession, expense_id: int) -> DBExpense:
+    """The expense if it belongs to the session user; 404 otherwise, so other users' ids are not revealed"""
+    expense = await db.get(DBExpense, expense_id)
+    if not expense or expense.user_id != session_user(db):
+        raise HTTPException(status_code=404, detail="Expense not found")
+    return expense
+
+async def _keyset_page(db: AsyncSession, query: Select, cursor: Optional[str], limit: int) -> Tuple[List, Optional[str]]:
+    """Newest-first page of rows after the cursor, and the cursor for the page after it (if any)"""
+    if cursor:
+        cursor_date, cursor_id = _decode_cursor(cursor)
+        query = query.where(or_(
+            DBExpense.date < cursor_date,
+            and_(DBExpense.date == cursor_date, DBExpense.id < cursor_id)
+        ))
+    
+    # Fetch one extra row to know whether another page exists
+    result = await db.execute(query.order_by(DBExpense.date.desc(), DBExpense.id.desc()).limit(limit + 1))
+    rows = result.all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, _encode_cursor(rows[-1].date, rows[-1].id)
+    
+    return rows, None
 
 @router.post("/expenses", response_model=ExpenseResponse)
-def create_expense(expense: ExpenseCreate, db: Session = Depends(get_db)):
+async def create_expense(expense: ExpenseCreate, db: AsyncSession = Depends(get_async_db)):
     """Create new expense with AI categorization"""
     
-    # Use AI to categorize the expense
-    ai_result = categorizer.categorize(expense.description, expense.amount)
+    # Use AI to categorize the expense (model work stays off the event loop)
+    ai_result = await run_in_threadpool(lambda: get_categorizer().categorize(expense.description, expense.amount))
     
     # Create expense with AI insights
-    db_expense = DBExpense(
+    values = dict(
+        user_id=session_user(db),
         description=expense.description,
         amount=expense.amount,
         category=expense.category or ai_result['category'],
@@ -28,51 +117,159 @@ def create_expense(expense: ExpenseCreate, db: Session = Depends(get_db)):
         notes=expense.notes
     )
     
-    db.add(db_expense)
-    db.commit()
-    db.refresh(db_expense)
-    
-    return ExpenseResponse(
-        id=db_expense.id,
-        description=db_expense.description,
-        amount=db_expense.amount,
-        category=db_expense.category,
-        date=db_expense.date,
-        ai_category=db_expense.ai_category,
-        ai_confidence=db_expense.ai_confidence,
-        payment_method=db_expense.payment_method,
-        location=db_expense.location,
-        notes=db_expense.notes
-    )
+    if write_queue.group_commit_enabled():
+        # Resolves once the batch holding this row has committed
+        db_expense = await write_queue.submit_expense(values, shard=db.info['shard'])
+    else:
+        db_expense = DBExpense(**values)
+        db.add(db_expense)
+        await db.flush()
+        await db.run_sync(expense_events.expenses_created, [db_expense])
+        await db.commit()
+        await db.refresh(db_expense)
+    
+    # A user-chosen category that differs from the AI's is a training signal
+    if expense.category and expense.category != ai_result['category']:
+        record_correction(expense.description, expense.category)
+    
+    return ORJSONResponse({field: getattr(db_expense, field) for field in RESPONSE_FIELDS})
+
+@router.post("/expenses/batch", response_model=ExpenseBatchResponse)
+async def create_expenses_batch(items: List[Dict[str, Any]] = Body(...), db: AsyncSession = Depends(get_async_db)):
+    """Create many expenses with one AI categorization pass and one commit"""
+    
+    if len(items) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=413, detail=f"Batch size exceeds {MAX_BATCH_SIZE} expenses")
+    
+    # Validate items individually so one bad row does not fail the batch
+    results = []
+    valid = []
+    for index, item in enumerate(items):
+        try:
+            valid.append((index, ExpenseCreate.model_validate(item)))
+        except ValidationError as e:
+            results.append({
+                'index': index,
+                'errors': [
+                    f"{'.'.join(str(loc) for loc in err['loc'])}: {err['msg']}"
+                    for err in e.errors()
+                ]
+            })
+    
+    # Categorize every valid description in a single model pass
+    descriptions = [expense.description for _, expense in valid]
+    ai_results = await compute_pool.categorize_batch(descriptions)
+    
+    db_expenses = [
+        DBExpense(
+            user_id=session_user(db),
+            description=expense.description,
+            amount=expense.amount,
+            category=expense.category or ai_result['category'],
+            ai_category=ai_result['category'],
+            ai_confidence=ai_result['confidence'],
+            payment_method=expense.payment_method,
+            location=expense.location,
+            notes=expense.notes
+        )
+        for (_, expense), ai_result in zip(valid, ai_results)
+    ]
+    
+    # Bulk insert; ids are assigned on flush, before the single commit
+    db.add_all(db_expenses)
+    await db.flush()
+    await db.run_sync(expense_events.expenses_created, db_expenses)
+    
+    for (index, _), db_expense, ai_result in zip(valid, db_expenses, ai_results):
+        results.append({
+            'index': index,
+            'id': db_expense.id,
+            'ai_category': ai_result['category'],
+            'ai_confidence': ai_result['confidence']
+        })
+    
+    await db.commit()
+    
+    for (_, expense), ai_result in zip(valid, ai_results):
+        if expense.category and expense.category != ai_result['category']:
+            record_correction(expense.description, expense.category)
+    
+    results.sort(key=lambda r: r['index'])
+    
+    return {
+        'created': len(db_expenses),
+        'failed': len(items) - len(db_expenses),
+        'results': results
+    }
 
 @router.get("/expenses", response_model=List[ExpenseResponse])
-def get_expenses(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    """Get all expenses"""
-    expenses = db.query(DBExpense).offset(skip).limit(limit).all()
-    return expenses
+async def get_expenses(
+    cursor: Optional[str] = None,
+    skip: int = 0,
+    limit: int = PAGE_LIMIT,
+    response_format: str = LIST_FORMAT,
+    etag: str = EXPENSES_ETAG,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get expenses, newest first; pass X-Next-Cursor back as cursor for the next page"""
+    query = _list_query(db, response_format)
+    
+    # Offset paging is kept for old clients; cursors stay fast on deep pages
+    if skip and not cursor:
+        query = query.order_by(DBExpense.date.desc(), DBExpense.id.desc()).offset(skip).limit(limit)
+        return _list_response((await db.execute(query)).all(), response_format, etag)
+    
+    rows, next_cursor = await _keyset_page(db, query, cursor, limit)
+    return _list_response(rows, response_format, etag, next_cursor)
+
+@router.get("/expenses/archive", response_model=List[ExpenseResponse])
+async def get_archived_expenses(
+    cursor: Optional[str] = None,
+    limit: int = PAGE_LIMIT,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    category: Optional[str] = None,
+    response_format: str = LIST_FORMAT,
+    etag: str = EXPENSES_ETAG,
+    x_user_id: Optional[str] = Header(None)
+):
+    """Archived expenses between start and end (inclusive), newest first, paginated with X-Next-Cursor"""
+    fields = COLUMNAR_FIELDS if response_format == "columnar" else RESPONSE_FIELDS
+    position = _decode_cursor(cursor) if cursor else None
+    user_id = request_user(x_user_id)
+    
+    rows, more = await run_in_threadpool(
+        archive.archived_page, shard_for_user(user_id).shard_id, user_id, fields, limit,
+        cursor=position, start=start, end=end, category=category
+    )
+    
+    next_cursor = None
+    if more:
+        last = dict(zip(fields, rows[-1]))
+        next_cursor = _encode_cursor(last['date'], last['id'])
+    return _list_response(rows, response_format, etag, next_cursor)
 
 @router.get("/expenses/{expense_id}", response_model=ExpenseResponse)
-def get_expense(expense_id: int, db: Session = Depends(get_db)):
+async def get_expense(expense_id: int, etag: str = EXPENSES_ETAG, db: AsyncSession = Depends(get_async_db)):
     """Get specific expense"""
-    expense = db.query(DBExpense).filter(DBExpense.id == expense_id).first()
-    if not expense:
+    row = (await db.execute(_list_query(db, "rows").where(DBExpense.id == expense_id))).first()
+    if not row:
         raise HTTPException(status_code=404, detail="Expense not found")
-    return expense
+    return ORJSONResponse(dict(zip(RESPONSE_FIELDS, row)), headers={'ETag': etag})
 
 @router.put("/expenses/{expense_id}/recategorize")
-def recategorize_expense(expense_id: int, db: Session = Depends(get_db)):
+async def recategorize_expense(expense_id: int, db: AsyncSession = Depends(get_async_db)):
     """Re-run AI categorization on an expense"""
-    expense = db.query(DBExpense).filter(DBExpense.id == expense_id).first()
-    if not expense:
-        raise HTTPException(status_code=404, detail="Expense not found")
+    expense = await _owned_expense(db, expense_id)
     
     # Re-categorize with AI
-    ai_result = categorizer.categorize(expense.description, expense.amount)
+    ai_result = await run_in_threadpool(lambda: get_categorizer().categorize(expense.description, expense.amount))
     
     expense.ai_category = ai_result['category']
     expense.ai_confidence = ai_result['confidence']
     
-    db.commit()
+    result_cache.mark_data_changed(db, result_cache.EXPENSES, users=[expense.user_id])
+    await db.commit()
     
     return {
         "message": "Expense recategorized",
@@ -80,20 +277,49 @@ def recategorize_expense(expense_id: int, db: Session = Depends(get_db)):
         "confidence": ai_result['confidence']
     }
 
-@router.get("/expenses/category/{category}")
-def get_expenses_by_category(category: str, db: Session = Depends(get_db)):
-    """Get expenses by category"""
-    expenses = db.query(DBExpense).filter(DBExpense.category == category).all()
-    return expenses
+@router.put("/expenses/{expense_id}/category")
+async def update_expense_category(expense_id: int, category: Optional[str] = None, db: AsyncSession = Depends(get_async_db)):
+    """Set an expense's category by hand; without a category it becomes uncategorized"""
+    expense = await _owned_expense(db, expense_id)
+    description, ai_category = expense.description, expense.ai_category
+    
+    category = category or None
+    old_category, expense.category = expense.category, category
+    await db.flush()
+    await db.run_sync(expense_events.expense_category_changed, expense, old_category)
+    await db.commit()
+    
+    # A hand-picked category that differs from the AI's is a training signal
+    if category and category != ai_category:
+        record_correction(description, category)
+    
+    return {
+        "message": "Expense category updated",
+        "old_category": old_category,
+        "category": category
+    }
+
+@router.get("/expenses/category/{category}", response_model=List[ExpenseResponse])
+async def get_expenses_by_category(
+    category: str,
+    cursor: Optional[str] = None,
+    limit: int = PAGE_LIMIT,
+    response_format: str = LIST_FORMAT,
+    etag: str = EXPENSES_ETAG,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get expenses by category, newest first, paginated with X-Next-Cursor"""
+    query = _list_query(db, response_format).where(DBExpense.category == category)
+    rows, next_cursor = await _keyset_page(db, query, cursor, limit)
+    return _list_response(rows, response_format, etag, next_cursor)
 
 @router.delete("/expenses/{expense_id}")
-def delete_expense(expense_id: int, db: Session = Depends(get_db)):
+async def delete_expense(expense_id: int, db: AsyncSession = Depends(get_async_db)):
     """Delete an expense"""
-    expense = db.query(DBExpense).filter(DBExpense.id == expense_id).first()
-    if not expense:
-        raise HTTPException(status_code=404, detail="Expense not found")
+    expense = await _owned_expense(db, expense_id)
     
-    db.delete(expense)
-    db.commit()
+    await db.run_sync(expense_events.expense_deleted, expense)
+    await db.delete(expense)
+    await db.commit()
     
     return {"message": "Expense deleted successfully"}
\ No newline at end of file
@@ -0,0 +1,338 @@
+from fastapi import APIRouter, Depends, File, HTTPException, UploadFile
+from sqlalchemy.orm import Session
+from typing import Dict, Iterator, List, Optional
+from database import get_db, session_user
+from models.expense import DBExpense
+from models.statement_import import DBStatementImport
+from ai_engine.compute_pool import categorize_batch_sync
+import expense_events
+from datetime import datetime
+import codecs
+import csv
+import hashlib
+import re
+import time
+import uuid
+
+router = APIRouter()
+
+READ_BLOCK_SIZE = 64 * 1024
+MAX_CHUNK_SIZE = 10000
+
+# In order of preference when every date in a file fits several, e.g. 03/04/2024
+DATE_FORMATS = ('%Y-%m-%d', '%Y/%m/%d', '%m/%d/%Y', '%d/%m/%Y', '%d.%m.%Y', '%Y%m%d')
+OFX_DATE_FORMAT = '%Y%m%d'
+
+CSV_COLUMNS = {
+    'date': ('date', 'transaction date', 'posted date', 'posting date', 'booking date'),
+    'description': ('description', 'payee', 'merchant', 'name', 'details', 'narrative'),
+    'amount': ('amount', 'value', 'transaction amount'),
+    'debit': ('debit', 'withdrawal', 'money out', 'paid out'),
+    'memo': ('memo', 'notes', 'reference'),
+}
+
+OFX_TOKEN = re.compile(r'<(/?)([A-Za-z0-9.]+)>([^<]*)')
+
+def _read_text(upload: UploadFile, encoding: str = 'utf-8') -> Iterator[str]:
+    """Decode the uploaded file block by block without reading it whole"""
+    decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+    upload.file.seek(0)
+    while True:
+        block = upload.file.read(READ_BLOCK_SIZE)
+        if not block:
+            break
+        yield decoder.decode(block)
+    tail = decoder.decode(b'', final=True)
+    if tail:
+        yield tail
+
+def _file_digest(upload: UploadFile) -> str:
+    """SHA-256 of the uploaded file, read block by block"""
+    digest = hashlib.sha256()
+    upload.file.seek(0)
+    for block in iter(lambda: upload.file.read(READ_BLOCK_SIZE), b''):
+        digest.update(block)
+    return digest.hexdigest()
+
+def _read_lines(upload: UploadFile) -> Iterator[str]:
+    """Yield text lines from the upload, one at a time"""
+    pending = ''
+    for text in _read_text(upload):
+        pending += text
+        lines = pending.splitlines(keepends=True)
+        # Keep the last (possibly partial) line for the next block
+        pending = lines.pop() if lines and not lines[-1].endswith(('\n', '\r')) else ''
+        yield from lines
+    if pending:
+        yield pending
+
+def _parse_csv(upload: UploadFile) -> Iterator[Dict]:
+    """Parse CSV rows into raw transaction records"""
+    reader = csv.reader(_read_lines(upload))
+    header = next(reader, None)
+    if header is None:
+        return
+    
+    header = [h.strip().lstrip('\ufeff').lower() for h in header]
+    columns = {}
+    for field, aliases in CSV_COLUMNS.items():
+        for alias in aliases:
+            if alias in header:
+                columns[field] = header.index(alias)
+                break
+    
+    if 'date' not in columns or 'description' not in columns or not ('amount' in columns or 'debit' in columns):
+        raise HTTPException(status_code=400, detail="CSV must have date, description and amount (or debit) columns")
+    
+    for row in reader:
+        if not row:
+            continue
+        yield {field: row[idx] if idx < len(row) else '' for field, idx in columns.items()}
+
+def _parse_ofx(upload: UploadFile) -> Iterator[Dict]:
+    """Parse OFX/QFX <STMTTRN> blocks into raw transaction records"""
+    pending = ''
+    record = None
+    
+    for text in _read_text(upload, encoding='latin-1'):
+        pending += text
+        # Only tokenize up to the last complete tag; the rest waits for more data
+        cut = max(pending.rfind('<'), 0)
+        ready, pending = pending[:cut], pending[cut:]
+        
+        for closing, tag, value in OFX_TOKEN.findall(ready):
+            tag = tag.upper()
+            if tag == 'STMTTRN':
+                if closing and record is not None:
+                    yield record
+                    record = None
+                elif not closing:
+                    record = {}
+            elif record is not None and not closing:
+                value = value.strip()
+                if tag == 'DTPOSTED':
+                    record['date'] = value[:8]
+                elif tag == 'TRNAMT':
+                    record['amount'] = value
+                elif tag == 'NAME':
+                    record['description'] = value
+                elif tag == 'MEMO':
+                    record['memo'] = value
+    
+    # Trailing data only matters if the file was not terminated cleanly
+    for closing, tag, value in OFX_TOKEN.findall(pending):
+        if tag.upper() == 'STMTTRN' and closing and record is not None:
+            yield record
+            record = None
+
+def _parse_date(value: str, date_format: str) -> Optional[datetime]:
+    try:
+        return datetime.strptime((value or '').strip(), date_format)
+    except ValueError:
+        return None
+
+def _detect_date_format(values: Iterator[str]) -> str:
+    """The preferred format among those that fit every date in the file"""
+    candidates = list(DATE_FORMATS)
+    for value in values:
+        fitting = [fmt for fmt in candidates if _parse_date(value, fmt) is not None]
+        # Unparseable dates are left for _normalize to reject
+        if fitting:
+            candidates = fitting
+        if len(candidates) == 1:
+            break
+    return candidates[0]
+
+def _parse_amount(value: str) -> Optional[float]:
+    value = (value or '').strip().replace(',', '').replace('$', '')
+    if value.startswith('(') and value.endswith(')'):
+        value = '-' + value[1:-1]
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+def _normalize(records: Iterator[Dict], date_format: str, debits_negative: bool, stats: Dict) -> Iterator[Dict]:
+    """Turn raw records into expense rows, dropping credits and invalid rows"""
+    for record in records:
+        date = _parse_date(record.get('date'), date_format)
+        description = (record.get('description') or record.get('memo') or '').strip()
+        
+        if record.get('debit', '').strip():
+            amount = _parse_amount(record['debit'])
+            amount = abs(amount) if amount is not None else None
+        else:
+            amount = _parse_amount(record.get('amount'))
+            if amount is not None:
+                # Only money going out is an expense
+                is_debit = amount < 0 if debits_negative else amount > 0
+                amount = abs(amount) if is_debit else 0.0
+        
+        if date is None or not description or amount is None:
+            stats['rejected'] += 1
+            continue
+        if amount == 0:
+            continue
+        
+        yield {
+            'date': date,
+            'description': description,
+            'amount': amount,
+            'notes': record.get('memo') or None
+        }
+
+def _chunked(rows: Iterator[Dict], size: int) -> Iterator[List[Dict]]:
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+@router.post("/imports/statement")
+def import_statement(
+    file: UploadFile = File(...),
+    file_format: Optional[str] = None,
+    import_id: Optional[str] = None,
+    chunk_size: int = 1000,
+    date_format: Optional[str] = None,
+    debits_negative: bool = True,
+    db: Session = Depends(get_db)
+):
+    """Stream a CSV/OFX bank statement into expenses in committed chunks"""
+    
+    if chunk_size < 1 or chunk_size > MAX_CHUNK_SIZE:
+        raise HTTPException(status_code=400, detail=f"chunk_size must be between 1 and {MAX_CHUNK_SIZE}")
+    
+    if file_format is None:
+        extension = (file.filename or '').rsplit('.', 1)[-1].lower()
+        file_format = 'ofx' if extension in ('ofx', 'qfx') else 'csv'
+    file_format = file_format.lower()
+    if file_format not in ('csv', 'ofx'):
+        raise HTTPException(status_code=400, detail="Unsupported format, expected csv or ofx")
+    if date_format is not None and date_format not in DATE_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported date_format, expected one of {', '.join(DATE_FORMATS)}")
+    
+    parser = _parse_ofx if file_format == 'ofx' else _parse_csv
+    
+    # Resuming an import re-parses the file but skips chunks already committed
+    file_sha256 = _file_digest(file)
+    job = db.get(DBStatementImport, import_id) if import_id else None
+    if job is not None and job.user_id != session_user(db):
+        raise HTTPException(status_code=409, detail="Import id is already in use")
+    if job is None:
+        job = DBStatementImport(
+            id=import_id or uuid.uuid4().hex,
+            user_id=session_user(db),
+            filename=file.filename,
+            file_sha256=file_sha256,
+            file_format=file_format,
+            date_format=date_format,
+            chunk_size=chunk_size,
+            chunks_committed=0,
+            rows_imported=0
+        )
+        db.add(job)
+    elif job.chunk_size != chunk_size or job.file_format != file_format:
+        raise HTTPException(status_code=409, detail="Resumed import must use the original format and chunk_size")
+    elif date_format is not None and job.date_format not in (None, date_format):
+        raise HTTPException(status_code=409, detail="Resumed import must use the original date_format")
+    elif job.file_sha256 is not None and job.file_sha256 != file_sha256:
+        # Skipping committed chunks of a different file would drop or duplicate rows
+        raise HTTPException(status_code=409, detail="Resumed import must upload the original file")
+    elif job.status == "completed":
+        return _import_summary(job, rows_this_run=0, chunks_skipped=job.chunks_committed, elapsed=0.0)
+    
+    if job.date_format is None:
+        # One format for the whole file, so 03/04 and 13/04 rows cannot be read in different orders
+        if date_format is None and file_format == 'ofx':
+            date_format = OFX_DATE_FORMAT
+        elif date_format is None:
+            date_format = _detect_date_format(record.get('date') for record in parser(file))
+        job.date_format = date_format
+    db.commit()
+    
+    stats = {'rejected': 0}
+    rows = _normalize(parser(file), job.date_format, debits_negative, stats)
+    
+    started = time.perf_counter()
+    rows_this_run = 0
+    chunks_skipped = 0
+    
+    for chunk_index, chunk in enumerate(_chunked(rows, chunk_size)):
+        if chunk_index < job.chunks_committed:
+            chunks_skipped += 1
+            continue
+        
+        ai_results = categorize_batch_sync([row['description'] for row in chunk])
+        
+        db_expenses = [
+            DBExpense(
+                user_id=job.user_id,
+                description=row['description'],
+                amount=row['amount'],
+                date=row['date'],
+                category=ai_result['category'],
+                ai_category=ai_result['category'],
+                ai_confidence=ai_result['confidence'],
+                notes=row['notes']
+            )
+            for row, ai_result in zip(chunk, ai_results)
+        ]
+        db.add_all(db_expenses)
+        db.flush()
+        expense_events.expenses_created(db, db_expenses)
+        
+        # Progress is committed together with the chunk so a resume never duplicates rows
+        job.chunks_committed = chunk_index + 1
+        job.rows_imported += len(chunk)
+        db.commit()
+        
+        rows_this_run += len(chunk)
+    
+    elapsed = time.perf_counter() - started
+    
+    job.status = "completed"
+    job.rows_rejected = stats['rejected']
+    job.rows_per_second = rows_this_run / elapsed if elapsed > 0 else None
+    db.commit()
+    
+    return _import_summary(job, rows_this_run, chunks_skipped, elapsed)
+
+def _import_summary(job: DBStatementImport, rows_this_run: int, chunks_skipped: int, elapsed: float) -> Dict:
+    return {
+        'import_id': job.id,
+        'status': job.status,
+        'format': job.file_format,
+        'date_format': job.date_format,
+        'chunk_size': job.chunk_size,
+        'chunks_committed': job.chunks_committed,
+        'chunks_skipped': chunks_skipped,
+        'rows_imported': rows_this_run,
+        'total_rows_imported': job.rows_imported,
+        'rows_rejected': job.rows_rejected,
+        'elapsed_seconds': elapsed,
+        'rows_per_second': rows_this_run / elapsed if elapsed > 0 else None
+    }
+
+@router.get("/imports/{import_id}")
+def get_import_status(import_id: str, db: Session = Depends(get_db)):
+    """Get progress of a statement import"""
+    job = db.get(DBStatementImport, import_id)
+    if not job or job.user_id != session_user(db):
+        raise HTTPException(status_code=404, detail="Import not found")
+    
+    return {
+        'import_id': job.id,
+        'filename': job.filename,
+        'status': job.status,
+        'format': job.file_format,
+        'date_format': job.date_format,
+        'chunk_size': job.chunk_size,
+        'chunks_committed': job.chunks_committed,
+        'rows_imported': job.rows_imported,
+        'rows_rejected': job.rows_rejected,
+        'rows_per_second': job.rows_per_second
+    }
@@ -1,31 +1,29 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from database import get_db
-from models.expense import DBExpense
-from ai_engine.categorizer import ExpenseCategorizer
+from fastapi import APIRouter, Depends, Query
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_async_db
+from result_cache import EXPENSES, cached_result, conditional_get
+from ai_engine.model_registry import get_categorizer
+from ai_engine.charge_detector import amount_stddev, period_label
 from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+import analytics_store
+import charge_tracking
+import rollups
 
 router = APIRouter()
-categorizer = ExpenseCategorizer()
 
-@router.get("/insights/spending-summary")
-def get_spending_insights(db: Session = Depends(get_db)):
-    """Get AI-powered spending insights"""
-    
-    # Get last 30 days of expenses
-    cutoff_date = datetime.now() - timedelta(days=30)
-    expenses = db.query(DBExpense).filter(DBExpense.date >= cutoff_date).all()
-    
+async def summarize_spending(totals: List[Tuple[str, float, int]]) -> Dict:
+    """Spending summary response from (category, total, count) rows"""
     expense_data = [
         {
-            'category': exp.category,
-            'amount': exp.amount,
-            'date': exp.date.isoformat()
+            'category': category,
+            'amount': total
         }
-        for exp in expenses
+        for category, total, _ in totals
     ]
     
-    insights = categorizer.get_category_insights(expense_data)
+    insights = await run_in_threadpool(lambda: get_categorizer().get_category_insights(expense_data))
     
     # Add AI recommendations
     recommendations = []
@@ -44,24 +42,11 @@ def get_spending_insights(db: Session = Depends(get_db)):
         "insights": insights,
         "recommendations": recommendations,
         "period": "Last 30 days",
-        "total_transactions": len(expenses)
+        "total_transactions": sum(count for _, _, count in totals)
     }
 
-@router.get("/insights/savings-opportunities")
-def get_savings_opportunities(db: Session = Depends(get_db)):
-    """AI-powered savings recommendations"""
-    
-    cutoff_date = datetime.now() - timedelta(days=60)
-    expenses = db.query(DBExpense).filter(DBExpense.date >= cutoff_date).all()
-    
-    category_spending = {}
-    for expense in expenses:
-        cat = expense.category
-        if cat in category_spending:
-            category_spending[cat] += expense.amount
-        else:
-            category_spending[cat] = expense.amount
-    
+def find_savings_opportunities(category_spending: Dict[str, float]) -> Dict:
+    """Savings response from 60 days of spending per category"""
     opportunities = []
     
     # Analyze each category for savings
@@ -101,4 +86,120 @@ def get_savings_opportunities(db: Session = Depends(get_db)):
         'opportunities': opportunities,
         'total_potential_monthly_savings': total_potential_savings,
         'analysis_period': '60 days'
-    }
\ No newline at end of file
+    }
+
+@router.get("/insights/spending-summary", dependencies=[Depends(conditional_get(EXPENSES))])
+@cached_result("insights/spending-summary")
+async def get_spending_insights(db: AsyncSession = Depends(get_async_db)):
+    """Get AI-powered spending insights"""
+    
+    # Get last 30 days of category totals
+    cutoff_date = datetime.now() - timedelta(days=30)
+    totals = await db.run_sync(analytics_store.category_totals, cutoff_date.date())
+    
+    return await summarize_spending(totals)
+
+@router.get("/insights/savings-opportunities", dependencies=[Depends(conditional_get(EXPENSES))])
+@cached_result("insights/savings-opportunities")
+async def get_savings_opportunities(db: AsyncSession = Depends(get_async_db)):
+    """AI-powered savings recommendations"""
+    
+    cutoff_date = datetime.now() - timedelta(days=60)
+    totals = await db.run_sync(analytics_store.category_totals, cutoff_date.date())
+    category_spending = {category: total for category, total, _ in totals}
+    
+    return find_savings_opportunities(category_spending)
+
+@router.get("/insights/year-over-year", dependencies=[Depends(conditional_get(EXPENSES))])
+@cached_result("insights/year-over-year")
+async def get_year_over_year(months: int = Query(12, ge=1, le=24), db: AsyncSession = Depends(get_async_db)):
+    """Monthly spending for the last months against the same months a year earlier"""
+    today = datetime.now().date()
+    first_month = today.year * 12 + today.month - months  # zero-based month index of the oldest month shown
+    since = datetime(first_month // 12 - 1, first_month % 12 + 1, 1).date()
+    
+    # Daily rollups are kept when old expenses are archived, so this is one small query at any range
+    totals = {month: (total, count) for month, total, count in await db.run_sync(rollups.monthly_totals, since)}
+    
+    comparison = []
+    for index in range(first_month, first_month + months):
+        month = f"{index // 12:04d}-{index % 12 + 1:02d}"
+        previous = f"{index // 12 - 1:04d}-{index % 12 + 1:02d}"
+        current_total, current_count = totals.get(month, (0.0, 0))
+        previous_total, _ = totals.get(previous, (0.0, 0))
+        comparison.append({
+            'month': month,
+            'total': current_total,
+            'transactions': current_count,
+            'previous_year_total': previous_total,
+            'change_percent': (current_total - previous_total) / previous_total * 100 if previous_total else None
+        })
+    
+    return {
+        'months': comparison,
+        'total': sum(month['total'] for month in comparison),
+        'previous_year_total': sum(month['previous_year_total'] for month in comparison)
+    }
+
+@router.get("/insights/recurring-charges", dependencies=[Depends(conditional_get(EXPENSES))])
+@cached_result("insights/recurring-charges")
+async def get_recurring_charges(include_lapsed: bool = False, db: AsyncSession = Depends(get_async_db)):
+    """Subscriptions and other regular charges, from per-merchant statistics kept current on every insert"""
+    today = datetime.now().date()
+    merchants = await db.run_sync(charge_tracking.recurring_merchants)
+    
+    charges = []
+    for state in merchants:
+        next_expected = state.last_date + timedelta(days=round(state.interval_mean))
+        # A charge two periods overdue has most likely been cancelled
+        lapsed = (today - state.last_date).days > 2 * state.interval_mean
+        if lapsed and not include_lapsed:
+            continue
+        charges.append({
+            'merchant': state.merchant,
+            'category': state.category,
+            'period': period_label(state.interval_mean),
+            'interval_days': state.interval_mean,
+            'average_amount': state.mean_amount,
+            'amount_stddev': amount_stddev(state),
+            'charges': state.charge_count,
+            'last_charged': state.last_date,
+            'next_expected': next_expected,
+            'monthly_cost': state.mean_amount * 30.44 / state.interval_mean,
+            'lapsed': lapsed
+        })
+    
+    charges.sort(key=lambda charge: charge['monthly_cost'], reverse=True)
+    
+    return {
+        'recurring_charges': charges,
+        'total_monthly_cost': sum(charge['monthly_cost'] for charge in charges if not charge['lapsed'])
+    }
+
+@router.get("/insights/charge-alerts", dependencies=[Depends(conditional_get(EXPENSES))])
+@cached_result("insights/charge-alerts")
+async def get_charge_alerts(
+    days: int = Query(30, ge=1, le=366),
+    kind: Optional[str] = Query(None, pattern="^(amount_anomaly|new_recurring)$"),
+    limit: int = Query(100, ge=1, le=1000),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Unusual amounts and newly recurring merchants, flagged when their expenses were added"""
+    since = datetime.now().date() - timedelta(days=days)
+    alerts = await db.run_sync(charge_tracking.recent_alerts, since, kind, limit)
+    
+    return {
+        'alerts': [
+            {
+                'expense_id': alert.expense_id,
+                'merchant': alert.merchant,
+                'kind': alert.kind,
+                'date': alert.date,
+                'amount': alert.amount,
+                'expected_amount': alert.expected_amount,
+                'z_score': alert.z_score
+            }
+            for alert in alerts
+        ],
+        'period_days': days
+    }
@@ -1,135 +1,195 @@
 from fastapi import APIRouter, Depends
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from database import get_db
-from models.expense import DBExpense
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_async_db
+from result_cache import EXPENSES, cached_result, conditional_get
 from ai_engine.predictor import SpendingPredictor
+from ai_engine.compute_pool import forecast_all_categories, forecast_daily_totals, run_or_fallback
 from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+import analytics_store
+import forecast_state
+import metrics
 
 router = APIRouter()
 predictor = SpendingPredictor()
 
-@router.get("/predictions/next-month")
-def predict_next_month_spending(db: Session = Depends(get_db)):
-    """AI prediction for next month's spending"""
+def _daily_totals(db: Session, cutoff_date: datetime):
+    """Per-day spending totals and transaction count"""
+    rows = analytics_store.daily_totals(db, cutoff_date.date())
     
-    # Get recent expenses (last 60 days)
-    cutoff_date = datetime.now() - timedelta(days=60)
-    expenses = db.query(DBExpense).filter(DBExpense.date >= cutoff_date).all()
+    daily_totals = [(row[0], row[1]) for row in rows]
+    transaction_count = sum(row[2] for row in rows)
     
-    # Convert to format expected by AI
+    return daily_totals, transaction_count
+
+def _method(prediction) -> str:
+    """Prediction method for metrics; category estimates carry no method field"""
+    if 'method' in prediction:
+        return prediction['method']
+    return 'no_data' if prediction.get('trend') == 'no_data' else 'category_average'
+
+def _fallback_prediction(daily_totals):
+    """Cheap average-based forecast for when the compute pool is saturated or too slow"""
+    return predictor._simple_prediction([
+        {'date': day.isoformat(), 'amount': total}
+        for day, total in daily_totals
+    ])
+
+def _fallback_category_predictions(categories, start_day, daily_matrix):
+    """Per-category averages for when the compute pool is saturated or too slow"""
     expense_data = [
-        {
-            'date': exp.date.isoformat(),
-            'amount': exp.amount,
-            'category': exp.category
-        }
-        for exp in expenses
+        {'date': (start_day + timedelta(days=int(i))).isoformat(), 'amount': daily_matrix[i, j], 'category': categories[j]}
+        for i, j in zip(*daily_matrix.nonzero())
     ]
+    return {category: predictor.predict_category_spending(expense_data, category) for category in categories}
+
+async def forecast_spending(db: AsyncSession, route: str, window_days: int, daily_totals: Optional[List] = None) -> Dict:
+    """Next-30-day forecast from the incremental model, or a compute pool fit of the window's daily totals"""
+    if forecast_state.incremental_enabled():
+        incremental = await db.run_sync(forecast_state.get_incremental_predictor)
+        prediction = await run_in_threadpool(incremental.forecast, window_days=window_days)
+    else:
+        if daily_totals is None:
+            daily_totals, _ = await db.run_sync(_daily_totals, datetime.now() - timedelta(days=window_days))
+        # Model fits run in the compute pool to keep this worker responsive
+        prediction = await run_or_fallback(
+            forecast_daily_totals, daily_totals,
+            fallback=lambda: _fallback_prediction(daily_totals)
+        )
+    
+    metrics.PREDICTIONS.inc(route=route, method=_method(prediction))
+    return prediction
+
+def summarize_week(prediction: Dict) -> Dict:
+    """Weekly forecast response from a forecast's first-week daily predictions"""
+    return {
+        "weekly_forecast": prediction.get('daily_predictions', []),
+        "total_week_prediction": sum(prediction.get('daily_predictions', [])),
+        "confidence": prediction.get('confidence', 0.5),
+        "trend": prediction.get('trend', 'stable')
+    }
+
+def summarize_patterns(day_patterns: Dict[str, Tuple[float, int]], category_totals: Dict[str, float], total_expenses: int) -> Dict:
+    """Spending patterns response from per-weekday (total, count) and per-category totals"""
+    # Calculate per-transaction averages
+    day_averages = {
+        day: total / count if count else 0
+        for day, (total, count) in day_patterns.items()
+    }
     
-    # Get AI prediction
-    prediction = predictor.predict_next_month(expense_data)
+    return {
+        "daily_patterns": day_averages,
+        "category_breakdown": category_totals,
+        "highest_spending_day": max(day_averages, key=day_averages.get) if day_averages else None,
+        "top_category": max(category_totals, key=category_totals.get) if category_totals else None,
+        "analysis_period": "90 days",
+        "total_expenses": total_expenses
+    }
+
+@router.get("/predictions/next-month", dependencies=[Depends(conditional_get(EXPENSES))])
+@cached_result("predictions/next-month")
+async def predict_next_month_spending(db: AsyncSession = Depends(get_async_db)):
+    """AI prediction for next month's spending"""
+    
+    if forecast_state.incremental_enabled():
+        # The running sums keep the window's transaction count, so no query runs per request
+        prediction = await forecast_spending(db, "next-month", 60)
+        incremental = await db.run_sync(forecast_state.get_incremental_predictor)
+        transaction_count = incremental.transaction_count(window_days=60)
+    else:
+        # Get daily totals for recent expenses (last 60 days)
+        cutoff_date = datetime.now() - timedelta(days=60)
+        daily_totals, transaction_count = await db.run_sync(_daily_totals, cutoff_date)
+        
+        # Get AI prediction
+        prediction = await forecast_spending(db, "next-month", 60, daily_totals)
     
     return {
         "prediction": prediction,
-        "data_points": len(expense_data),
+        "data_points": transaction_count,
         "analysis_period": "60 days",
         "generated_at": datetime.now().isoformat()
     }
 
-@router.get("/predictions/category/{category}")
-def predict_category_spending(category: str, db: Session = Depends(get_db)):
+@router.get("/predictions/category/{category}", dependencies=[Depends(conditional_get(EXPENSES))])
+@cached_result("predictions/category/{category}")
+async def predict_category_spending(category: str, db: AsyncSession = Depends(get_async_db)):
     """AI prediction for specific category spending"""
     
-    # Get category expenses (last 60 days)
+    # Get category daily totals (last 60 days)
     cutoff_date = datetime.now() - timedelta(days=60)
-    expenses = db.query(DBExpense).filter(
-        DBExpense.category == category,
-        DBExpense.date >= cutoff_date
-    ).all()
+    rows = await db.run_sync(lambda session: analytics_store.rollup_rows(session, cutoff_date.date(), category=category))
     
+    # One entry per day carries the same totals the raw expenses would
     expense_data = [
         {
-            'date': exp.date.isoformat(),
-            'amount': exp.amount,
-            'category': exp.category
+            'date': day.isoformat(),
+            'amount': total,
+            'category': category
         }
-        for exp in expenses
+        for day, _, total, _ in rows
     ]
     
     prediction = predictor.predict_category_spending(expense_data, category)
+    metrics.PREDICTIONS.inc(route="category", method=_method(prediction))
     
     return {
         "category": category,
         "prediction": prediction,
-        "historical_data_points": len(expense_data)
+        "historical_data_points": sum(row[3] for row in rows)
     }
 
-@router.get("/predictions/weekly-forecast")
-def get_weekly_forecast(db: Session = Depends(get_db)):
-    """Get AI forecast for the next 7 days"""
-    
-    cutoff_date = datetime.now() - timedelta(days=30)
-    expenses = db.query(DBExpense).filter(DBExpense.date >= cutoff_date).all()
-    
-    expense_data = [
-        {
-            'date': exp.date.isoformat(),
-            'amount': exp.amount,
-            'category': exp.category
-        }
-        for exp in expenses
-    ]
-    
-    prediction = predictor.predict_next_month(expense_data)
+@router.get("/predictions/categories", dependencies=[Depends(conditional_get(EXPENSES))])
+@cached_result("predictions/categories")
+async def predict_all_categories(db: AsyncSession = Depends(get_async_db)):
+    """AI prediction for every category in one query and one model fit"""
+    
+    # Get the (day x category) matrix of daily totals (last 60 days)
+    start_day = (datetime.now() - timedelta(days=60)).date()
+    categories, daily_matrix, data_points = await db.run_sync(analytics_store.daily_category_matrix, start_day)
+    
+    predictions = await run_or_fallback(
+        forecast_all_categories, categories, daily_matrix,
+        fallback=lambda: _fallback_category_predictions(categories, start_day, daily_matrix)
+    )
+    for prediction in predictions.values():
+        metrics.PREDICTIONS.inc(route="categories", method=_method(prediction))
     
     return {
-        "weekly_forecast": prediction.get('daily_predictions', []),
-        "total_week_prediction": sum(prediction.get('daily_predictions', [])),
-        "confidence": prediction.get('confidence', 0.5),
-        "trend": prediction.get('trend', 'stable')
+        "categories": {
+            category: {
+                "prediction": predictions[category],
+                "historical_data_points": data_points[category]
+            }
+            for category in categories
+        },
+        "analysis_period": "60 days",
+        "generated_at": datetime.now().isoformat()
     }
 
-@router.get("/predictions/spending-patterns")
-def analyze_spending_patterns(db: Session = Depends(get_db)):
-    """Analyze spending patterns using AI"""
-    
-    # Get last 90 days of data
-    cutoff_date = datetime.now() - timedelta(days=90)
-    expenses = db.query(DBExpense).filter(DBExpense.date >= cutoff_date).all()
+@router.get("/predictions/weekly-forecast", dependencies=[Depends(conditional_get(EXPENSES))])
+@cached_result("predictions/weekly-forecast")
+async def get_weekly_forecast(db: AsyncSession = Depends(get_async_db)):
+    """Get AI forecast for the next 7 days"""
     
-    # Group by day of week
-    day_patterns = {}
-    category_patterns = {}
+    prediction = await forecast_spending(db, "weekly-forecast", 30)
     
-    for expense in expenses:
-        day_name = expense.date.strftime('%A')
-        category = expense.category
-        
-        # Day patterns
-        if day_name not in day_patterns:
-            day_patterns[day_name] = []
-        day_patterns[day_name].append(expense.amount)
-        
-        # Category patterns
-        if category not in category_patterns:
-            category_patterns[category] = []
-        category_patterns[category].append(expense.amount)
+    return summarize_week(prediction)
+
+@router.get("/predictions/spending-patterns", dependencies=[Depends(conditional_get(EXPENSES))])
+@cached_result("predictions/spending-patterns")
+async def analyze_spending_patterns(db: AsyncSession = Depends(get_async_db)):
+    """Analyze spending patterns using AI"""
     
-    # Calculate averages
-    day_averages = {
-        day: sum(amounts) / len(amounts) if amounts else 0
-        for day, amounts in day_patterns.items()
-    }
+    # Last 90 days grouped by day of week and by category
+    cutoff_date = (datetime.now() - timedelta(days=90)).date()
+    day_patterns = await db.run_sync(analytics_store.weekday_totals, cutoff_date)
+    totals = await db.run_sync(analytics_store.category_totals, cutoff_date)
     
-    category_totals = {
-        cat: sum(amounts) for cat, amounts in category_patterns.items()
-    }
-    
-    return {
-        "daily_patterns": day_averages,
-        "category_breakdown": category_totals,
-        "highest_spending_day": max(day_averages, key=day_averages.get) if day_averages else None,
-        "top_category": max(category_totals, key=category_totals.get) if category_totals else None,
-        "analysis_period": "90 days",
-        "total_expenses": len(expenses)
-    }
\ No newline at end of file
+    return summarize_patterns(
+        day_patterns,
+        {category: total for category, total, _ in totals},
+        sum(count for _, _, count in totals)
+    )
\ No newline at end of file
@@ -1,6 +1,6 @@
 from pydantic import BaseModel
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
 class ExpenseBase(BaseModel):
     description: str
@@ -20,4 +20,16 @@ class ExpenseResponse(ExpenseBase):
     ai_confidence: Optional[float] = None
     
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class ExpenseBatchItemResult(BaseModel):
+    index: int
+    id: Optional[int] = None
+    ai_category: Optional[str] = None
+    ai_confidence: Optional[float] = None
+    errors: Optional[List[str]] = None
+
+class ExpenseBatchResponse(BaseModel):
+    created: int
+    failed: int
+    results: List[ExpenseBatchItemResult]
@@ -0,0 +1,81 @@
+import os
+import sys
+import tempfile
+import pytest
+from datetime import datetime, timedelta
+from typing import Iterable, List, Tuple
+
+# The databases, model artifacts and archive live relative to the working directory; keep them out of the tree
+os.chdir(tempfile.mkdtemp(prefix="ai_finance_tests_"))
+os.environ.setdefault("COMPUTE_POOL_WORKERS", "0")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+@pytest.fixture
+def client():
+    """API client on empty databases; in-process derived state is reset afterwards"""
+    from fastapi.testclient import TestClient
+    import main
+    
+    with TestClient(main.app) as test_client:
+        yield test_client
+    _reset_state()
+
+def _reset_state():
+    import analytics_store
+    import database
+    import forecast_state
+    import result_cache
+    
+    for shard in database.shards:
+        db = shard.SessionLocal()
+        try:
+            # Versions keep counting up, so no ETag or cached result of an earlier test can match
+            for table in reversed(database.Base.metadata.sorted_tables):
+                if table.name != 'data_versions':
+                    db.execute(table.delete())
+            result_cache.mark_data_changed(db, result_cache.EXPENSES, result_cache.BUDGETS)
+            db.commit()
+        finally:
+            db.close()
+    
+    with analytics_store._lock:
+        analytics_store._stores.clear()
+        analytics_store._loaded_at.clear()
+    forecast_state._predictors.clear()
+    forecast_state._loaded_at.clear()
+
+@pytest.fixture
+def add_expenses():
+    """Insert a user's (description, amount, category, days ago) rows through the write path; returns their ids"""
+    import database
+    import expense_events
+    from models.expense import DBExpense
+    
+    def add(rows: Iterable[Tuple[str, float, str, float]], user_id: str = None) -> List[int]:
+        now = datetime.now()
+        user_id = user_id or database.DEFAULT_USER_ID
+        db = database.shard_for_user(user_id).SessionLocal()
+        try:
+            expenses = [
+                DBExpense(
+                    user_id=user_id, description=description, amount=amount, category=category,
+                    date=now - timedelta(days=days_ago)
+                )
+                for description, amount, category, days_ago in rows
+            ]
+            db.add_all(expenses)
+            db.flush()
+            expense_events.expenses_created(db, expenses)
+            db.commit()
+            return [expense.id for expense in expenses]
+        finally:
+            db.close()
+    return add
+
+@pytest.fixture
+def change_category(client):
+    """Change a default-user expense's category through the API, as a manual correction would"""
+    def change(expense_id: int, category: str):
+        response = client.put(f'/api/v1/expenses/{expense_id}/category', params={'category': category})
+        assert response.status_code == 200
+    return change
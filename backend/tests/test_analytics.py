@@ -0,0 +1,70 @@
+import pytest
+import analytics_store
+import result_cache
+from routes.predictions import summarize_week
+
+ENDPOINTS = (
+    "/api/v1/predictions/next-month",
+    "/api/v1/predictions/category/food",
+    "/api/v1/predictions/categories",
+    "/api/v1/predictions/weekly-forecast",
+    "/api/v1/predictions/spending-patterns",
+    "/api/v1/insights/spending-summary",
+    "/api/v1/insights/savings-opportunities",
+    "/api/v1/dashboard",
+)
+
+def _without_timestamps(value):
+    if isinstance(value, dict):
+        return {key: _without_timestamps(item) for key, item in value.items() if key != "generated_at"}
+    if isinstance(value, list):
+        return [_without_timestamps(item) for item in value]
+    return value
+
+def _responses(client):
+    result_cache._cache.clear()
+    responses = {}
+    for path in ENDPOINTS:
+        response = client.get(path)
+        assert response.status_code == 200, path
+        responses[path] = _without_timestamps(response.json())
+    return responses
+
+def _seed(add_expenses):
+    add_expenses([("grocery store", 20.0 + i % 7, "food", i) for i in range(0, 100, 3)])
+    add_expenses([("bus pass", 12.5, "transport", i) for i in range(1, 90, 5)])
+    add_expenses([("cinema", 30.0, "entertainment", i) for i in range(2, 60, 11)])
+
+def test_engines_agree_after_writes(client, add_expenses, change_category, monkeypatch):
+    _seed(add_expenses)
+    monkeypatch.setattr(analytics_store, "ANALYTICS_ENGINE", "columnar")
+    _responses(client)  # loads the columnar copy; the writes below reach it incrementally
+    
+    ids = add_expenses([("grocery store", 600.0, "food", 0), ("coffee", 4.5, "food", 3), ("rent", 900.0, "utilities", 10)])
+    # Future-dated rows (imported scheduled payments) count on neither engine until their day
+    add_expenses([("rent", 900.0, "utilities", -5), ("grocery store", 75.0, "food", -1)])
+    assert client.delete(f"/api/v1/expenses/{ids[1]}").status_code == 200
+    change_category(ids[2], "housing")
+    
+    columnar = _responses(client)
+    monkeypatch.setattr(analytics_store, "ANALYTICS_ENGINE", "rollups")
+    assert _responses(client) == columnar
+
+@pytest.mark.parametrize("engine", ["rollups", "columnar"])
+def test_dashboard_matches_standalone_endpoints(client, add_expenses, monkeypatch, engine):
+    monkeypatch.setattr(analytics_store, "ANALYTICS_ENGINE", engine)
+    _seed(add_expenses)
+    add_expenses([("rent", 900.0, "utilities", -5)])
+    client.post("/api/v1/budgets", params={"category": "food", "monthly_limit": 150})
+    
+    responses = _responses(client)
+    dashboard = responses["/api/v1/dashboard"]
+    next_month = responses["/api/v1/predictions/next-month"]
+    
+    assert dashboard["next_month"] == {key: value for key, value in next_month.items() if key in dashboard["next_month"]}
+    # The weekly figures are the first week of the one 60-day fit, not a separate 30-day fit
+    assert dashboard["weekly_forecast"] == summarize_week(next_month["prediction"])
+    assert dashboard["spending_patterns"] == responses["/api/v1/predictions/spending-patterns"]
+    assert dashboard["spending_summary"] == responses["/api/v1/insights/spending-summary"]
+    assert dashboard["savings_opportunities"] == responses["/api/v1/insights/savings-opportunities"]
+    assert dashboard["budget_status"] == _without_timestamps(client.get("/api/v1/budgets/status").json())
@@ -0,0 +1,57 @@
+import pytest
+from datetime import date
+import archive
+import database
+import result_cache
+import rollups
+
+def _archive():
+    db = database.SessionLocal()
+    try:
+        return archive.archive_expenses(db, horizon_days=archive.MIN_HORIZON_DAYS)
+    finally:
+        db.close()
+
+def test_rerun_after_crash_does_not_duplicate_rows(client, add_expenses, monkeypatch, tmp_path):
+    monkeypatch.setattr(archive, "EXPENSE_ARCHIVE_DIR", str(tmp_path))
+    today = date.today()
+    days_ago = (today - date(today.year - 2, today.month, 15)).days
+    first = add_expenses([("grocery store", 20.0, "food", days_ago), ("bus", 3.0, "transport", days_ago)])
+    
+    # A crash between writing a month's part and deleting its rows leaves both behind
+    def crash(*args, **kwargs):
+        raise RuntimeError("crashed before commit")
+    with monkeypatch.context() as patch:
+        patch.setattr(result_cache, "mark_data_changed", crash)
+        with pytest.raises(RuntimeError):
+            _archive()
+    
+    # The month gains a back-dated row before the rerun
+    backdated = add_expenses([("pharmacy", 9.0, "health", days_ago)])
+    assert _archive() == 3
+    
+    rows, more = archive.archived_page(0, database.DEFAULT_USER_ID, ("id",), 10)
+    assert sorted(row[0] for row in rows) == sorted(first + backdated)
+    assert not more
+    assert client.get("/api/v1/expenses").json() == []
+
+def test_rollup_rebuild_keeps_archived_days(client, add_expenses, monkeypatch, tmp_path):
+    monkeypatch.setattr(archive, "EXPENSE_ARCHIVE_DIR", str(tmp_path))
+    add_expenses([("grocery store", 10.0, "food", 365 + days) for days in (1, 2)] + [("bus", 3.0, "transport", 1)])
+    _archive()
+    # A back-dated expense lands on an archived day after the month was archived
+    add_expenses([("pharmacy", 4.0, "health", 366)])
+    
+    def year_over_year():
+        result_cache._cache.clear()
+        return client.get("/api/v1/insights/year-over-year", params={"months": 2}).json()
+    
+    before = year_over_year()
+    assert before["previous_year_total"] == 24.0
+    
+    db = database.SessionLocal()
+    try:
+        rollups.rebuild_rollups(db)
+    finally:
+        db.close()
+    assert year_over_year() == before
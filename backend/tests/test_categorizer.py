@@ -0,0 +1,31 @@
+import pytest
+import random
+from ai_engine.categorizer import ExpenseCategorizer
+from ai_engine.keyword_matcher import KeywordMatcher
+
+@pytest.mark.parametrize("description, merchant", [
+    ("UBER *TRIP 4F2X", "uber trip"),
+    ("7-Eleven #1234", "eleven"),
+    ("Starbucks ref school fees", "starbucks ref school fees"),
+    ("AMAZON MKTP ref: AB12CD", "amazon mktp"),
+    ("Shell txn 99812 fuel", "shell fuel"),
+    ("NETFLIX.COM 12/03", "netflixcom"),
+])
+def test_normalize_merchant(description, merchant):
+    assert ExpenseCategorizer(train=False).normalize_merchant(description) == merchant
+
+def test_keyword_matcher_counts_every_occurrence():
+    # Overlapping keywords and keywords that are suffixes of others are the automaton's hard cases
+    categories = {"a": ["he", "she", "hers"], "b": ["his", "is", "ss"], "c": ["s"]}
+    matcher = KeywordMatcher.from_categories(categories)
+    rng = random.Random(7)
+    
+    for _ in range(200):
+        text = ''.join(rng.choice("hersi ") for _ in range(rng.randint(0, 30)))
+        expected = {}
+        for category, keywords in categories.items():
+            for keyword in keywords:
+                count = sum(text.startswith(keyword, i) for i in range(len(text)))
+                if count:
+                    expected[category] = expected.get(category, 0.0) + count * len(keyword)
+        assert matcher.scores(text) == expected
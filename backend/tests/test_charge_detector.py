@@ -0,0 +1,45 @@
+from datetime import date, timedelta
+from ai_engine.charge_detector import ANOMALY_LEVEL_SHIFT_RUN, ChargeDetector, MerchantChargeState, merchant_key
+
+def _charge(detector, state, months, amount):
+    return detector.observe(state, date(2025, 1, 1) + timedelta(days=30 * months), amount)
+
+def test_outlier_stays_out_of_the_statistics():
+    detector, state = ChargeDetector(), MerchantChargeState("default", "netflix")
+    for month in range(8):
+        _charge(detector, state, month, 9.99)
+    assert state.recurring
+    
+    assert [alert['kind'] for alert in _charge(detector, state, 8, 99.99)] == ['amount_anomaly']
+    assert state.recurring
+    assert (state.charge_count, state.mean_amount) == (8, 9.99)
+    
+    _charge(detector, state, 9, 9.99)
+    alerts = _charge(detector, state, 10, 199.0)
+    assert alerts[0]['z_score'] > 100
+
+def test_repeated_new_amount_becomes_the_normal():
+    detector, state = ChargeDetector(), MerchantChargeState("default", "netflix")
+    for month in range(8):
+        _charge(detector, state, month, 9.99)
+    for month in range(8, 8 + ANOMALY_LEVEL_SHIFT_RUN):
+        assert _charge(detector, state, month, 15.49)
+    
+    assert state.mean_amount == 15.49
+    assert _charge(detector, state, 8 + ANOMALY_LEVEL_SHIFT_RUN, 15.49) == []
+    assert state.recurring
+
+def test_forgetting_a_flagged_charge_leaves_the_statistics():
+    detector, state = ChargeDetector(), MerchantChargeState("default", "netflix")
+    for month in range(8):
+        _charge(detector, state, month, 9.99)
+    _charge(detector, state, 8, 99.99)
+    
+    detector.forget(state, 99.99, flagged=True)
+    assert (state.charge_count, state.mean_amount, state.outlier_count) == (8, 9.99, 0)
+
+def test_descriptions_without_a_merchant_have_no_key():
+    assert merchant_key("") is None
+    assert merchant_key(None) is None
+    assert merchant_key("#1234 5678") is None
+    assert merchant_key("NETFLIX.COM") is not None
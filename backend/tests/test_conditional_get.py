@@ -0,0 +1,33 @@
+import result_cache
+
+def _get(client, path, etag=None, user_id="alice"):
+    headers = {"X-User-Id": user_id}
+    if etag:
+        headers["If-None-Match"] = etag
+    return client.get(path, headers=headers)
+
+def test_unchanged_data_is_answered_with_304(client, add_expenses):
+    add_expenses([("grocery store", 40.0, "food", 1)], user_id="alice")
+    etag = _get(client, "/api/v1/expenses").headers["ETag"]
+    
+    response = _get(client, "/api/v1/expenses", etag)
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+    
+    # The validator is persisted, not per process: a fresh cache (another worker, a restart) agrees
+    result_cache._cache.clear()
+    assert _get(client, "/api/v1/expenses", etag).status_code == 304
+
+def test_writes_from_any_session_change_the_etag(client, add_expenses):
+    add_expenses([("grocery store", 40.0, "food", 1)], user_id="alice")
+    etag = _get(client, "/api/v1/insights/spending-summary").headers["ETag"]
+    
+    # add_expenses commits through its own session, as another worker or a CLI would
+    add_expenses([("cinema", 12.0, "entertainment", 1)], user_id="bob")
+    assert _get(client, "/api/v1/insights/spending-summary", etag).status_code == 304
+    
+    add_expenses([("bakery", 5.0, "food", 1)], user_id="alice")
+    response = _get(client, "/api/v1/insights/spending-summary", etag)
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert response.json()["insights"]["category_breakdown"]["food"] == 45.0
@@ -0,0 +1,91 @@
+import archive
+import charge_tracking
+import database
+import rollups
+from models.budget import DBBudget
+from models.charge_stats import DBChargeAlert, DBMerchantStats
+from models.rollup import DBDailyRollup
+
+def _value(value):
+    # Running sums and a one-pass rebuild round differently in the last bits
+    return round(value, 6) if isinstance(value, float) else value
+
+def _rows(model, *columns):
+    db = database.SessionLocal()
+    try:
+        return sorted(tuple(_value(getattr(row, column)) for column in columns) for row in db.query(model))
+    finally:
+        db.close()
+
+def _rebuild(rebuild):
+    db = database.SessionLocal()
+    try:
+        rebuild(db)
+    finally:
+        db.close()
+
+def test_rollups_match_rebuild(client, add_expenses, change_category):
+    ids = add_expenses([("grocery store", 20.0 + i, "food", i // 2) for i in range(12)])
+    add_expenses([("bus", 3.0, "transport", 1), ("rent", 900.0, "utilities", -3), ("cash", 10.0, None, 2)])
+    for expense_id in (ids[0], ids[5], ids[11]):  # includes the day's minimum and maximum
+        assert client.delete(f"/api/v1/expenses/{expense_id}").status_code == 200
+    change_category(ids[3], "household")
+    change_category(ids[4], None)
+    
+    columns = ("user_id", "day", "category", "total_amount", "transaction_count", "min_amount", "max_amount")
+    incremental = _rows(DBDailyRollup, *columns)
+    _rebuild(rollups.rebuild_rollups)
+    assert _rows(DBDailyRollup, *columns) == incremental
+
+def test_budget_spend_matches_rebuild(client, add_expenses, change_category):
+    for category in ("food", "transport", "household"):
+        assert client.post("/api/v1/budgets", params={"category": category, "monthly_limit": 100}).status_code == 200
+    ids = add_expenses([("grocery store", 12.5, "food", 0), ("bus", 3.0, "transport", 0), ("grocery store", 7.5, "food", 0)])
+    assert client.delete(f"/api/v1/expenses/{ids[1]}").status_code == 200
+    change_category(ids[2], "household")
+    
+    incremental = _rows(DBBudget, "category", "current_spent")
+    assert client.post("/api/v1/budgets/rebuild").json()["budgets"] == 3
+    assert _rows(DBBudget, "category", "current_spent") == incremental
+    assert dict(incremental) == {"food": 12.5, "transport": 0.0, "household": 7.5}
+
+CHARGE_COLUMNS = (
+    "user_id", "merchant", "category", "charge_count", "mean_amount", "m2_amount", "outlier_count", "outlier_mean",
+    "outlier_m2", "last_date", "interval_count", "interval_mean", "interval_m2", "recurring"
+)
+ALERT_COLUMNS = ("user_id", "expense_id", "merchant", "kind", "date", "amount")
+
+def _add_charges(add_expenses, months):
+    for months_ago in range(months, 0, -1):
+        add_expenses([("NETFLIX.COM", 15.99, "entertainment", 30 * months_ago), ("grocery store", 40.0 + months_ago, "food", 30 * months_ago - 3)])
+
+def test_charge_stats_match_rebuild(client, add_expenses, change_category):
+    # Charges arrive in date order; a backdated charge counts towards gaps only on rebuild
+    _add_charges(add_expenses, 8)
+    ids = add_expenses([("NETFLIX.COM", 59.99, "entertainment", 0), ("#4411 0093", 12.0, "other", 0), ("", 3.0, "other", 0)])
+    change_category(ids[0], "subscriptions")
+    
+    incremental, incremental_alerts = _rows(DBMerchantStats, *CHARGE_COLUMNS), _rows(DBChargeAlert, *ALERT_COLUMNS)
+    _rebuild(charge_tracking.rebuild_charge_stats)
+    assert _rows(DBMerchantStats, *CHARGE_COLUMNS) == incremental
+    assert _rows(DBChargeAlert, *ALERT_COLUMNS) == incremental_alerts
+    assert {alert[3] for alert in incremental_alerts} == {"new_recurring", "amount_anomaly"}
+    
+    # Descriptions naming no merchant are not pooled into a merchant of their own
+    assert {row[1] for row in incremental} == {"netflixcom", "grocery store"}
+    assert ("subscriptions", 8, 15.99) in {(row[2], row[3], row[4]) for row in incremental}
+
+def test_charge_stats_rebuild_reads_archived_expenses(client, add_expenses, monkeypatch, tmp_path):
+    monkeypatch.setattr(archive, "EXPENSE_ARCHIVE_DIR", str(tmp_path))
+    _add_charges(add_expenses, 14)
+    incremental, incremental_alerts = _rows(DBMerchantStats, *CHARGE_COLUMNS), _rows(DBChargeAlert, *ALERT_COLUMNS)
+    
+    db = database.SessionLocal()
+    try:
+        assert archive.archive_expenses(db, horizon_days=archive.MIN_HORIZON_DAYS) > 0
+    finally:
+        db.close()
+    _rebuild(charge_tracking.rebuild_charge_stats)
+    
+    assert _rows(DBMerchantStats, *CHARGE_COLUMNS) == incremental
+    assert _rows(DBChargeAlert, *ALERT_COLUMNS) == incremental_alerts
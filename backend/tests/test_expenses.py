@@ -0,0 +1,54 @@
+from routes import expenses
+from schemas.expense import ExpenseResponse
+
+def test_oversized_limit_is_capped(client, add_expenses, monkeypatch):
+    monkeypatch.setattr(expenses, "MAX_PAGE_SIZE", 2)
+    add_expenses([("Coffee shop", 4.0, "food", days_ago) for days_ago in range(3)])
+    
+    response = client.get("/api/v1/expenses", params={"limit": 5000})
+    
+    assert response.status_code == 200
+    assert len(response.json()) == 2
+    assert "X-Next-Cursor" in response.headers
+    assert len(client.get("/api/v1/expenses", params={"limit": 5000, "skip": 1}).json()) == 2
+    assert client.get("/api/v1/expenses", params={"limit": 0}).status_code == 422
+
+def test_batch_creates_valid_items_and_reports_invalid_ones(client):
+    items = [
+        {"description": "Grocery store", "amount": 42.5},
+        {"description": "Missing amount"},
+        {"description": "Cinema tickets", "amount": 25.0, "category": "entertainment"},
+    ]
+    
+    response = client.post("/api/v1/expenses/batch", json=items)
+    
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["created"], body["failed"]) == (2, 1)
+    assert [result["index"] for result in body["results"]] == [0, 1, 2]
+    assert body["results"][1]["id"] is None and body["results"][1]["errors"] == ["amount: Field required"]
+    
+    created = {expense["id"]: expense for expense in client.get("/api/v1/expenses").json()}
+    assert sorted(created) == sorted(body["results"][i]["id"] for i in (0, 2))
+    assert created[body["results"][2]["id"]]["category"] == "entertainment"
+    assert created[body["results"][0]["id"]]["category"] == body["results"][0]["ai_category"]
+
+def test_row_and_columnar_formats_agree(client, add_expenses):
+    assert client.get("/api/v1/expenses", params={"format": "columnar"}).json() == {
+        "count": 0, "ids": [], "dates": [], "amounts": [], "categories": []
+    }
+    add_expenses([("Grocery store", 42.5, "food", 1), ("Bus ticket", 2.75, "transport", 2)])
+    
+    rows = client.get("/api/v1/expenses").json()
+    columnar = client.get("/api/v1/expenses", params={"format": "columnar"}).json()
+    
+    # The orjson path skips response_model validation, so check it still returns the schema's fields
+    assert all(set(row) == set(ExpenseResponse.model_fields) for row in rows)
+    assert [ExpenseResponse.model_validate(row).description for row in rows] == ["Grocery store", "Bus ticket"]
+    assert columnar == {
+        "count": 2,
+        "ids": [row["id"] for row in rows],
+        "dates": [row["date"] for row in rows],
+        "amounts": [42.5, 2.75],
+        "categories": ["food", "transport"]
+    }
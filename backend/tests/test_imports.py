@@ -0,0 +1,101 @@
+import pytest
+from routes import imports
+
+CSV = (
+    "Date,Description,Amount\n"
+    "2024-03-01,Grocery store,-42.50\n"
+    "2024-03-02,Salary,2500.00\n"
+    "2024-03-03,Coffee shop,-4.20\n"
+    "2024-03-04,Bus ticket,-2.75\n"
+    "2024-03-05,Pharmacy,-12.00\n"
+)
+
+OFX = """OFXHEADER:100
+<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKTRANLIST>
+<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20240301120000<TRNAMT>-42.50<NAME>Grocery store<MEMO>Card 1234</STMTTRN>
+<STMTTRN><TRNTYPE>CREDIT<DTPOSTED>20240302<TRNAMT>2500.00<NAME>Salary</STMTTRN>
+<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20240303<TRNAMT>-4.20<NAME>Coffee shop</STMTTRN>
+</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>
+"""
+
+def _import(client, content, filename="statement.csv", **params):
+    return client.post("/api/v1/imports/statement", params=params, files={"file": (filename, content)})
+
+def _expenses(client):
+    return sorted((expense["date"][:10], expense["description"], expense["amount"]) for expense in client.get("/api/v1/expenses").json())
+
+def test_csv_import_commits_debits_in_chunks(client):
+    summary = _import(client, CSV + "not a date,Refund,-1.00\n", chunk_size=3).json()
+    
+    assert summary["status"] == "completed"
+    assert summary["chunks_committed"] == 2
+    assert summary["rows_imported"] == 4
+    assert summary["rows_rejected"] == 1
+    assert _expenses(client) == [
+        ("2024-03-01", "Grocery store", 42.5), ("2024-03-03", "Coffee shop", 4.2),
+        ("2024-03-04", "Bus ticket", 2.75), ("2024-03-05", "Pharmacy", 12.0)
+    ]
+
+def test_csv_import_reads_debit_column(client):
+    content = "Posted Date,Payee,Debit,Credit\n2024-03-01,Grocery store,42.50,\n2024-03-02,Salary,,2500.00\n"
+    
+    assert _import(client, content, debits_negative=False).json()["rows_imported"] == 1
+    assert _expenses(client) == [("2024-03-01", "Grocery store", 42.5)]
+
+def test_ofx_import(client):
+    summary = _import(client, OFX, filename="statement.qfx").json()
+    
+    assert summary["format"] == "ofx"
+    assert _expenses(client) == [("2024-03-01", "Grocery store", 42.5), ("2024-03-03", "Coffee shop", 4.2)]
+
+def test_day_first_dates_are_detected_for_the_whole_file(client):
+    # 03/04 alone could be March 4th; 25/04 shows the file is day first
+    content = "Date,Description,Amount\n03/04/2024,Coffee shop,-4.20\n25/04/2024,Grocery store,-42.50\n"
+    
+    assert _import(client, content).json()["date_format"] == "%d/%m/%Y"
+    assert _expenses(client) == [("2024-04-03", "Coffee shop", 4.2), ("2024-04-25", "Grocery store", 42.5)]
+
+def test_ambiguous_dates_follow_date_format(client):
+    content = "Date,Description,Amount\n03/04/2024,Coffee shop,-4.20\n"
+    
+    assert _import(client, content).json()["date_format"] == "%m/%d/%Y"
+    assert _import(client, content, date_format="%d/%m/%Y").json()["date_format"] == "%d/%m/%Y"
+    assert [day for day, _, _ in _expenses(client)] == ["2024-03-04", "2024-04-03"]
+
+def _interrupt_after_first_chunk(monkeypatch):
+    categorize = imports.categorize_batch_sync
+    calls = []
+    
+    def fail_second_chunk(descriptions):
+        calls.append(descriptions)
+        if len(calls) == 2:
+            raise RuntimeError("worker died")
+        return categorize(descriptions)
+    
+    monkeypatch.setattr(imports, "categorize_batch_sync", fail_second_chunk)
+
+def test_resume_skips_committed_chunks(client, monkeypatch):
+    _interrupt_after_first_chunk(monkeypatch)
+    with pytest.raises(RuntimeError):
+        _import(client, CSV, import_id="march", chunk_size=2)
+    assert client.get("/api/v1/imports/march").json()["rows_imported"] == 2
+    
+    monkeypatch.undo()
+    summary = _import(client, CSV, import_id="march", chunk_size=2).json()
+    
+    assert summary["status"] == "completed"
+    assert summary["chunks_skipped"] == 1
+    assert summary["total_rows_imported"] == 4
+    descriptions = sorted(expense["description"] for expense in client.get("/api/v1/expenses").json())
+    assert descriptions == ["Bus ticket", "Coffee shop", "Grocery store", "Pharmacy"]
+
+def test_resume_with_different_file_is_rejected(client, monkeypatch):
+    _interrupt_after_first_chunk(monkeypatch)
+    with pytest.raises(RuntimeError):
+        _import(client, CSV, import_id="march", chunk_size=2)
+    monkeypatch.undo()
+    
+    response = _import(client, CSV.replace("Pharmacy", "Hardware store"), import_id="march", chunk_size=2)
+    
+    assert response.status_code == 409
+    assert client.get("/api/v1/imports/march").json()["rows_imported"] == 2
@@ -0,0 +1,16 @@
+def _samples(client, name):
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    return [line for line in response.text.splitlines() if line.startswith(name)]
+
+def test_requests_are_labelled_by_route_template(client):
+    client.get("/api/v1/expenses/987654")
+    client.get("/no-such-page-42")
+    
+    durations = _samples(client, "http_request_duration_seconds_count")
+    assert 'http_request_duration_seconds_count{method="GET",route="/api/v1/expenses/{expense_id}",status="404"}' in {
+        line.rsplit(' ', 1)[0] for line in durations
+    }
+    assert any('route="unmatched",status="404"' in line for line in durations)
+    assert not any("987654" in line or "no-such-page-42" in line for line in durations)
+    assert any('route="/api/v1/expenses/{expense_id}"' in line for line in _samples(client, "http_request_sql_queries_count"))
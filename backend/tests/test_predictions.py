@@ -0,0 +1,53 @@
+import pytest
+import analytics_store
+
+@pytest.mark.parametrize("engine", ["rollups", "columnar"])
+def test_category_forecast_ignores_future_dated_expenses(client, add_expenses, monkeypatch, engine):
+    monkeypatch.setattr(analytics_store, "ANALYTICS_ENGINE", engine)
+    # Statement imports can carry scheduled payments dated after today
+    add_expenses([("grocery store", 40.0, "food", days_ago) for days_ago in range(0, 20, 2)])
+    add_expenses([("rent", 900.0, "utilities", -5), ("grocery store", 55.0, "food", -1)])
+    
+    response = client.get("/api/v1/predictions/categories")
+    
+    assert response.status_code == 200
+    categories = response.json()["categories"]
+    assert set(categories) == {"food"}
+    assert categories["food"]["historical_data_points"] == 10
+
+def test_incremental_next_month_keeps_transaction_count(client, add_expenses, monkeypatch):
+    import forecast_state
+    monkeypatch.setattr(forecast_state, "PREDICTOR_MODE", "incremental")
+    add_expenses([("grocery store", 20.0 + i, "food", i) for i in range(0, 50, 2)])
+    assert client.get("/api/v1/predictions/next-month").json()["data_points"] == 25
+    
+    # Writes after the load reach the running count, including deletes and rows outside the window
+    ids = add_expenses([("bus", 3.0, "transport", 1), ("bus", 3.0, "transport", 2), ("old", 9.0, "other", 90)])
+    assert client.delete(f"/api/v1/expenses/{ids[0]}").status_code == 200
+    assert client.get("/api/v1/predictions/next-month").json()["data_points"] == 26
+    
+    # Matches a reload of the running sums from the rollups
+    forecast_state._loaded_at.clear()
+    client.post("/api/v1/budgets", params={"category": "food", "monthly_limit": 100})  # moves the result cache on
+    assert client.get("/api/v1/predictions/next-month").json()["data_points"] == 26
+
+def test_evicted_forecaster_reloads_same_forecast(client, add_expenses, monkeypatch):
+    import forecast_state
+    import result_cache
+    monkeypatch.setattr(forecast_state, "PREDICTOR_MODE", "incremental")
+    monkeypatch.setattr(forecast_state, "FORECAST_MAX_PREDICTORS", 1)
+    add_expenses([("grocery store", 20.0 + i, "food", i) for i in range(0, 50, 2)], user_id="alice")
+    add_expenses([("bus", 3.0, "transport", i) for i in range(0, 30, 3)], user_id="bob")
+    
+    def forecast(user_id):
+        response = client.get("/api/v1/predictions/next-month", headers={"X-User-Id": user_id}).json()
+        response.pop("generated_at")
+        return response
+    
+    expected = forecast("alice")
+    forecast("bob")
+    assert set(forecast_state._predictors) == {(0, "bob")}
+    
+    result_cache._cache.clear()
+    assert forecast("alice") == expected
+    assert set(forecast_state._predictors) == {(0, "alice")}
@@ -0,0 +1,34 @@
+import database
+
+def test_users_only_see_their_own_expenses(client, add_expenses):
+    alice = {'X-User-Id': 'alice'}
+    bob = {'X-User-Id': 'bob'}
+    alice_ids = add_expenses([("Grocery store", 40.0, "food", 1)], user_id='alice')
+    add_expenses([("Cinema tickets", 25.0, "entertainment", 1)], user_id='bob')
+    
+    assert [expense['description'] for expense in client.get('/api/v1/expenses', headers=alice).json()] == ["Grocery store"]
+    assert [expense['description'] for expense in client.get('/api/v1/expenses', headers=bob).json()] == ["Cinema tickets"]
+    assert client.get(f'/api/v1/expenses/{alice_ids[0]}', headers=bob).status_code == 404
+    assert client.delete(f'/api/v1/expenses/{alice_ids[0]}', headers=bob).status_code == 404
+    assert client.put(f'/api/v1/expenses/{alice_ids[0]}/category', params={'category': 'other'}, headers=bob).status_code == 404
+    assert client.get(f'/api/v1/expenses/{alice_ids[0]}', headers=alice).status_code == 200
+
+def test_budget_spend_is_per_user(client, add_expenses):
+    for user_id in ('alice', 'bob'):
+        response = client.post(
+            '/api/v1/budgets', params={'category': 'food', 'monthly_limit': 100.0}, headers={'X-User-Id': user_id}
+        )
+        assert response.status_code == 200
+    add_expenses([("Grocery store", 40.0, "food", 0)], user_id='alice')
+    
+    spent = {
+        user_id: client.get('/api/v1/budgets', headers={'X-User-Id': user_id}).json()[0]['current_spent']
+        for user_id in ('alice', 'bob')
+    }
+    assert spent == {'alice': 40.0, 'bob': 0.0}
+
+def test_user_header_is_required_with_several_shards(client, monkeypatch):
+    monkeypatch.setattr(database, 'DB_SHARD_COUNT', 2)
+    assert client.get('/api/v1/expenses').status_code == 400
+    monkeypatch.setattr(database, 'DB_SHARD_COUNT', 1)
+    assert client.get('/api/v1/expenses').status_code == 200
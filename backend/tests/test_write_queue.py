@@ -0,0 +1,44 @@
+import asyncio
+import database
+import write_queue
+from models.expense import DBExpense
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+def _values(description, user_id=database.DEFAULT_USER_ID):
+    return {'user_id': user_id, 'description': description, 'amount': 10.0, 'category': 'food'}
+
+def _submit_batch(rows):
+    async def run():
+        queue = write_queue.GroupCommitQueue(database.shards[0], max_batch=len(rows), max_delay=1.0, maxsize=100)
+        queue.start()
+        results = await asyncio.gather(*(queue.submit(values) for values in rows), return_exceptions=True)
+        await queue.stop()
+        return queue, results
+    return asyncio.run(run())
+
+def _descriptions():
+    with database.shards[0].SessionLocal() as db:
+        return sorted(description for (description,) in db.query(DBExpense.description))
+
+def test_bad_row_fails_alone(client):
+    queue, results = _submit_batch([_values("lunch"), _values("broken", user_id=None), _values("dinner")])
+    
+    assert isinstance(results[1], Exception)
+    assert [result.description for result in (results[0], results[2])] == ["lunch", "dinner"]
+    assert _descriptions() == ["dinner", "lunch"]
+    assert queue.stats()['failed'] == 1
+
+def test_failed_after_commit_listener_does_not_reinsert(client):
+    def fail(session):
+        raise RuntimeError("listener failed")
+    
+    event.listen(Session, "after_commit", fail)
+    try:
+        queue, results = _submit_batch([_values("lunch"), _values("dinner")])
+    finally:
+        event.remove(Session, "after_commit", fail)
+    
+    assert [result.description for result in results] == ["lunch", "dinner"]
+    assert _descriptions() == ["dinner", "lunch"]
+    assert queue.stats()['commits'] == 1
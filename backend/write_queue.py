@@ -0,0 +1,173 @@
+"""Write-behind queue that group-commits expense inserts from a single writer.
+
+Enabled with EXPENSE_WRITE_MODE=group_commit. Requests enqueue their row
+and await it; one writer task inserts up to GROUP_COMMIT_MAX_BATCH rows
+per transaction, waiting at most GROUP_COMMIT_MAX_DELAY_MS for a batch to
+fill, so many inserts share one commit (and one fsync).
+
+Durability is unchanged: a caller gets its row back only after the commit
+that contains it, so an acknowledged expense is exactly as durable as any
+other commit under the database's SQLITE_SYNCHRONOUS setting. Rows still
+queued when the process dies were never acknowledged.
+"""
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from typing import Any, Dict, List, Optional, Tuple
+from database import Shard, shards
+from models.expense import DBExpense
+import asyncio
+import logging
+import os
+import expense_events
+
+logger = logging.getLogger(__name__)
+
+EXPENSE_WRITE_MODE = os.getenv("EXPENSE_WRITE_MODE", "direct")
+GROUP_COMMIT_MAX_BATCH = int(os.getenv("GROUP_COMMIT_MAX_BATCH", "256"))
+GROUP_COMMIT_MAX_DELAY = float(os.getenv("GROUP_COMMIT_MAX_DELAY_MS", "5")) / 1000
+GROUP_COMMIT_QUEUE_SIZE = int(os.getenv("GROUP_COMMIT_QUEUE_SIZE", "10000"))
+
+_STOP = object()
+
+@event.listens_for(Session, "after_commit", insert=True)
+def _record_commit(session: Session):
+    # Runs ahead of the other after_commit listeners, so one of them failing cannot hide that the rows committed
+    if 'group_commit' in session.info:
+        session.info['committed'] = True
+
+class GroupCommitQueue:
+    """Single asyncio writer that inserts queued expenses in batched transactions"""
+    
+    def __init__(self, shard: Shard, max_batch: int = 256, max_delay: float = 0.005, maxsize: int = 10000):
+        self.shard = shard
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self._task: Optional[asyncio.Task] = None
+        
+        self.rows = 0
+        self.commits = 0
+        self.failed = 0
+        self.largest_batch = 0
+    
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        """Commit everything already queued, then stop the writer"""
+        if self._task is not None:
+            await self._queue.put(_STOP)
+            await self._task
+            self._task = None
+    
+    async def submit(self, values: Dict[str, Any]) -> DBExpense:
+        """Queue an expense's column values and wait until its row is committed"""
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((values, future))
+        return await future
+    
+    def _drain(self, batch: List) -> bool:
+        """Move already-queued items into the batch; False once the stop marker is seen"""
+        while len(batch) < self.max_batch:
+            try:
+                item = self._queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return True
+            if item is _STOP:
+                return False
+            batch.append(item)
+        return True
+    
+    async def _run(self):
+        running = True
+        while running:
+            item = await self._queue.get()
+            if item is _STOP:
+                break
+            
+            batch = [item]
+            running = self._drain(batch)
+            
+            # Give concurrent requests a moment to join a batch that is not yet full
+            if running and len(batch) < self.max_batch and self.max_delay > 0:
+                await asyncio.sleep(self.max_delay)
+                running = self._drain(batch)
+            
+            await self._commit(batch)
+    
+    async def _commit(self, batch: List[Tuple[Dict[str, Any], asyncio.Future]]):
+        expenses = [DBExpense(**values) for values, _ in batch]
+        
+        db = None
+        try:
+            async with self.shard.AsyncSessionLocal(info={'group_commit': True}) as db:
+                db.add_all(expenses)
+                await db.flush()
+                await db.run_sync(expense_events.expenses_created, expenses)
+                await db.commit()
+        except Exception as exc:
+            if db is not None and db.info.get('committed'):
+                # The rows are durable and only in-memory state missed them; a retry would insert them twice
+                logger.exception("Updating in-memory state after a group commit failed")
+            elif len(batch) > 1:
+                # Retry row by row so one bad row does not fail the whole batch
+                for item in batch:
+                    await self._commit([item])
+                return
+            else:
+                self.failed += 1
+                logger.exception("Group commit of an expense failed")
+                _, future = batch[0]
+                if not future.done():
+                    future.set_exception(exc)
+                return
+        
+        self.rows += len(batch)
+        self.commits += 1
+        self.largest_batch = max(self.largest_batch, len(batch))
+        
+        for expense, (_, future) in zip(expenses, batch):
+            # A caller that disconnected has a cancelled future; its row is committed regardless
+            if not future.done():
+                future.set_result(expense)
+    
+    def stats(self) -> Dict:
+        return {
+            'queued': self._queue.qsize(),
+            'rows': self.rows,
+            'commits': self.commits,
+            'failed': self.failed,
+            'average_batch': self.rows / self.commits if self.commits else 0.0,
+            'largest_batch': self.largest_batch
+        }
+
+# One writer per shard: shards are separate files with separate write locks
+_write_queues: Dict[int, GroupCommitQueue] = {}
+
+def group_commit_enabled() -> bool:
+    return EXPENSE_WRITE_MODE == "group_commit"
+
+def start_write_queue():
+    """Start the writer tasks on the running event loop (app startup)"""
+    if group_commit_enabled() and not _write_queues:
+        for shard in shards:
+            queue = GroupCommitQueue(shard, GROUP_COMMIT_MAX_BATCH, GROUP_COMMIT_MAX_DELAY, GROUP_COMMIT_QUEUE_SIZE)
+            queue.start()
+            _write_queues[shard.shard_id] = queue
+
+async def stop_write_queue():
+    """Flush queued expenses and stop the writers (app shutdown)"""
+    for queue in _write_queues.values():
+        await queue.stop()
+    _write_queues.clear()
+
+async def submit_expense(values: Dict[str, Any], shard: int = 0) -> DBExpense:
+    if shard not in _write_queues:
+        raise RuntimeError("Group commit writer is not running")
+    return await _write_queues[shard].submit(values)
+
+def write_queue_stats() -> Optional[Dict]:
+    if not _write_queues:
+        return None
+    return {shard: queue.stats() for shard, queue in _write_queues.items()}
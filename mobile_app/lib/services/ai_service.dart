@@ -13,6 +13,10 @@ class AIService extends ChangeNotifier {
   Map<String, dynamic> _spendingPatterns = {};
   bool _isLoading = false;
 
+  // Last ETag and body per path; unchanged data comes back as 304 without a body
+  final Map<String, String> _etags = {};
+  final Map<String, String> _bodies = {};
+
   // Getters
   double get nextMonthPrediction => _nextMonthPrediction;
   double get savingsOpportunity => _savingsOpportunity;
@@ -21,22 +25,46 @@ class AIService extends ChangeNotifier {
   Map<String, dynamic> get spendingPatterns => _spendingPatterns;
   bool get isLoading => _isLoading;
 
+  Future<http.Response> _get(String path) async {
+    final response = await http.get(
+      Uri.parse('$baseUrl$path'),
+      headers: {
+        'Content-Type': 'application/json',
+        if (_etags.containsKey(path)) 'If-None-Match': _etags[path]!,
+      },
+    );
+
+    if (response.statusCode == 304 && _bodies.containsKey(path)) {
+      return http.Response(_bodies[path]!, 200, headers: response.headers);
+    }
+
+    final etag = response.headers['etag'];
+    if (response.statusCode == 200 && etag != null) {
+      _etags[path] = etag;
+      _bodies[path] = response.body;
+    }
+    return response;
+  }
+
   Future<void> loadPredictions() async {
     _isLoading = true;
     notifyListeners();
 
     try {
-      // Load next month prediction
-      await _loadNextMonthPrediction();
-      
-      // Load savings opportunities
-      await _loadSavingsOpportunities();
-      
-      // Load spending patterns
-      await _loadSpendingPatterns();
-      
-      // Load weekly forecast
-      await _loadWeeklyForecast();
+      // One combined request; fall back to the individual endpoints on older servers
+      if (!await _loadDashboard()) {
+        // Load next month prediction
+        await _loadNextMonthPrediction();
+        
+        // Load savings opportunities
+        await _loadSavingsOpportunities();
+        
+        // Load spending patterns
+        await _loadSpendingPatterns();
+        
+        // Load weekly forecast
+        await _loadWeeklyForecast();
+      }
       
     } catch (e) {
       debugPrint('Error loading AI predictions: $e');
@@ -47,12 +75,27 @@ class AIService extends ChangeNotifier {
     }
   }
 
+  Future<bool> _loadDashboard() async {
+    try {
+      final response = await _get('/dashboard');
+      if (response.statusCode != 200) return false;
+
+      final data = json.decode(response.body);
+      _nextMonthPrediction = data['next_month']['prediction']['predicted_total']?.toDouble() ?? 0.0;
+      _savingsOpportunity = data['savings_opportunities']['total_potential_monthly_savings']?.toDouble() ?? 0.0;
+      _spendingPatterns = data['spending_patterns'];
+      _topSpendingCategory = data['spending_patterns']['top_category'] ?? 'Food';
+      _setWeeklyForecast(data['weekly_forecast']);
+      return true;
+    } catch (e) {
+      debugPrint('Error loading dashboard: $e');
+      return false;
+    }
+  }
+
   Future<void> _loadNextMonthPrediction() async {
     try {
-      final response = await http.get(
-        Uri.parse('$baseUrl/predictions/next-month'),
-        headers: {'Content-Type': 'application/json'},
-      );
+      final response = await _get('/predictions/next-month');
 
       if (response.statusCode == 200) {
         final data = json.decode(response.body);
@@ -67,10 +110,7 @@ class AIService extends ChangeNotifier {
 
   Future<void> _loadSavingsOpportunities() async {
     try {
-      final response = await http.get(
-        Uri.parse('$baseUrl/insights/savings-opportunities'),
-        headers: {'Content-Type': 'application/json'},
-      );
+      final response = await _get('/insights/savings-opportunities');
 
       if (response.statusCode == 200) {
         final data = json.decode(response.body);
@@ -85,10 +125,7 @@ class AIService extends ChangeNotifier {
 
   Future<void> _loadSpendingPatterns() async {
     try {
-      final response = await http.get(
-        Uri.parse('$baseUrl/predictions/spending-patterns'),
-        headers: {'Content-Type': 'application/json'},
-      );
+      final response = await _get('/predictions/spending-patterns');
 
       if (response.statusCode == 200) {
         final data = json.decode(response.body);
@@ -104,19 +141,10 @@ class AIService extends ChangeNotifier {
 
   Future<void> _loadWeeklyForecast() async {
     try {
-      final response = await http.get(
-        Uri.parse('$baseUrl/predictions/weekly-forecast'),
-        headers: {'Content-Type': 'application/json'},
-      );
+      final response = await _get('/predictions/weekly-forecast');
 
       if (response.statusCode == 200) {
-        final data = json.decode(response.body);
-        _weeklyForecast = List<Map<String, dynamic>>.from(
-          data['weekly_forecast']?.map((item) => {
-            'day': DateTime.now().add(Duration(days: _weeklyForecast.length)).weekday,
-            'amount': item?.toDouble() ?? 0.0,
-          }) ?? []
-        );
+        _setWeeklyForecast(json.decode(response.body));
       } else {
         _setDefaultForecast();
       }
@@ -125,6 +153,15 @@ class AIService extends ChangeNotifier {
     }
   }
 
+  void _setWeeklyForecast(Map<String, dynamic> data) {
+    _weeklyForecast = List<Map<String, dynamic>>.from(
+      data['weekly_forecast']?.map((item) => {
+        'day': DateTime.now().add(Duration(days: _weeklyForecast.length)).weekday,
+        'amount': item?.toDouble() ?? 0.0,
+      }) ?? []
+    );
+  }
+
   void _setDefaultValues() {
     _nextMonthPrediction = 1200.0;
     _savingsOpportunity = 150.0;
@@ -170,10 +207,7 @@ class AIService extends ChangeNotifier {
 
   Future<Map<String, dynamic>> getCategoryPrediction(String category) async {
     try {
-      final response = await http.get(
-        Uri.parse('$baseUrl/predictions/category/$category'),
-        headers: {'Content-Type': 'application/json'},
-      );
+      final response = await _get('/predictions/category/$category');
 
       if (response.statusCode == 200) {
         return json.decode(response.body);
@@ -194,10 +228,7 @@ class AIService extends ChangeNotifier {
 
   Future<Map<String, dynamic>> getSpendingInsights() async {
     try {
-      final response = await http.get(
-        Uri.parse('$baseUrl/insights/spending-summary'),
-        headers: {'Content-Type': 'application/json'},
-      );
+      final response = await _get('/insights/spending-summary');
 
       if (response.statusCode == 200) {
         return json.decode(response.body);
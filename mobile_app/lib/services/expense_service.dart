@@ -8,6 +8,7 @@ class ExpenseService extends ChangeNotifier {
   
   List<Expense> _expenses = [];
   bool _isLoading = false;
+  String? _expensesEtag;
 
   List<Expense> get expenses => _expenses;
   bool get isLoading => _isLoading;
@@ -29,12 +30,18 @@ class ExpenseService extends ChangeNotifier {
     try {
       final response = await http.get(
         Uri.parse('$baseUrl/expenses'),
-        headers: {'Content-Type': 'application/json'},
+        headers: {
+          'Content-Type': 'application/json',
+          if (_expensesEtag != null) 'If-None-Match': _expensesEtag!,
+        },
       );
 
-      if (response.statusCode == 200) {
+      if (response.statusCode == 304) {
+        // Nothing changed since the last load; keep the current list
+      } else if (response.statusCode == 200) {
         final List<dynamic> data = json.decode(response.body);
         _expenses = data.map((json) => Expense.fromJson(json)).toList();
+        _expensesEtag = response.headers['etag'];
       } else {
         _loadSampleData();
       }